@@ -0,0 +1,151 @@
+"""
+Calendrier des absences d'un service (matrice jour x employé)
+
+Un mois de calendrier est construit à partir de la liste des employés et de
+deux requêtes : les demandes de congé approuvées qui chevauchent le mois
+(index status/start_date/end_date) et les pointages du mois. Chaque jour est codé sur un caractère. Le résultat
+est mis en cache par service et par mois ; le cache d'un service est invalidé
+à chaque modification d'une demande de congé ou d'un pointage de ses employés
+(voir signals.py).
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.core.cache import cache
+
+from .analytics import _bump_versions, _versions
+from .models import Employee, LeaveRequest, PresenceTracking
+
+
+CACHE_TIMEOUT = 6 * 60 * 60
+MAX_RANGE_DAYS = 93
+
+# Congés approuvés par RH en majuscule, en attente de validation RH en minuscule
+LEAVE_CODES = {
+    'ANNUAL': 'A',
+    'SICK': 'S',
+    'PERSONAL': 'P',
+    'MATERNITY': 'M',
+    'PATERNITY': 'T',
+    'UNPAID': 'U',
+}
+PRESENCE_CODES = {
+    'PRESENT': 'p',
+    'LATE': 'r',
+    'EARLY_LEAVE': 'e',
+    'ABSENT': 'x',
+    'ON_LEAVE': 'c',
+}
+NO_DATA = '.'
+WEEKEND = '-'
+
+LEGEND = {NO_DATA: 'Aucune information', WEEKEND: 'Week-end'}
+for _key, _label in LeaveRequest.TYPE_CHOICES:
+    LEGEND[LEAVE_CODES[_key]] = _label
+    LEGEND[LEAVE_CODES[_key].lower()] = f'{_label} (en attente RH)'
+for _key, _label in PresenceTracking.STATUS_CHOICES:
+    LEGEND[PRESENCE_CODES[_key]] = _label
+
+
+def _version_key(service_id):
+    return f'leave_calendar_version:{service_id or "all"}'
+
+
+def invalidate_leave_calendar(service_id):
+    """Invalide les mois en cache du service (et la vue tous services confondus)"""
+    _bump_versions(*{_version_key(service_id), _version_key(None)})
+
+
+def _build_month(service_id, year, month):
+    first = date(year, month, 1)
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    size = last.day
+
+    employees = Employee.objects.filter(is_active=True)
+    leaves = LeaveRequest.objects.filter(
+        status__in=['RH_APPROVED', 'MANAGER_APPROVED'],
+        start_date__lte=last,
+        end_date__gte=first,
+    )
+    presences = PresenceTracking.objects.filter(date__range=(first, last))
+    if service_id:
+        employees = employees.filter(service_id=service_id)
+        leaves = leaves.filter(employee__service_id=service_id)
+        presences = presences.filter(employee__service_id=service_id)
+
+    base = [WEEKEND if date(year, month, day).weekday() >= 5 else NO_DATA for day in range(1, size + 1)]
+    rows = {
+        employee_id: {'id': employee_id, 'name': f'{first_name} {last_name}', 'position': position, 'days': list(base)}
+        for employee_id, first_name, last_name, position in employees.order_by('last_name', 'first_name').values_list(
+            'id', 'first_name', 'last_name', 'position'
+        )
+    }
+
+    # Les pointages d'abord, les congés ensuite : un congé prime sur le pointage
+    for employee_id, day, presence_status in presences.order_by().values_list('employee_id', 'date', 'status'):
+        if employee_id in rows:
+            rows[employee_id]['days'][day.day - 1] = PRESENCE_CODES.get(presence_status, NO_DATA)
+
+    for employee_id, leave_type, leave_status, start, end in leaves.order_by('status').values_list(
+        'employee_id', 'leave_type', 'status', 'start_date', 'end_date'
+    ):
+        if employee_id not in rows:
+            continue
+        code = LEAVE_CODES.get(leave_type, 'P')
+        if leave_status != 'RH_APPROVED':
+            code = code.lower()
+        days = rows[employee_id]['days']
+        for index in range(max(start, first).day - 1, min(end, last).day):
+            if days[index] != WEEKEND:
+                days[index] = code
+
+    for row in rows.values():
+        row['days'] = ''.join(row['days'])
+    return list(rows.values())
+
+
+def month_calendar(service_id, year, month):
+    """Matrice d'un mois pour un service (None : tous les services), mise en cache"""
+    version_key = _version_key(service_id)
+    version = _versions(version_key)[version_key]
+    cache_key = f'leave_calendar:{service_id or "all"}:{year}:{month}:v{version}'
+    rows = cache.get(cache_key)
+    if rows is None:
+        rows = _build_month(service_id, year, month)
+        cache.set(cache_key, rows, CACHE_TIMEOUT)
+    return rows
+
+
+def team_calendar(service_id, start, end):
+    """
+    Calendrier des absences entre start et end inclus : une chaîne d'un
+    caractère par jour et par employé (voir LEGEND).
+    """
+    if end < start:
+        raise ValueError('La date de fin doit être postérieure à la date de début')
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'La période ne peut pas dépasser {MAX_RANGE_DAYS} jours')
+
+    employees = {}
+    length = 0
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        size = calendar.monthrange(current.year, current.month)[1]
+        offset = (start - current).days if current < start else 0
+        stop = min((end - current).days + 1, size)
+        for row in month_calendar(service_id, current.year, current.month):
+            # Un employé absent des mois précédents (embauche, changement de service) est complété par NO_DATA
+            entry = employees.setdefault(row['id'], {**row, 'days': NO_DATA * length})
+            entry['days'] += row['days'][offset:stop]
+        length += stop - offset
+        for entry in employees.values():
+            entry['days'] = entry['days'].ljust(length, NO_DATA)
+        current = date(current.year, current.month, size) + timedelta(days=1)
+
+    return {
+        'service': service_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'legend': LEGEND,
+        'employees': list(employees.values()),
+    }
@@ -0,0 +1,265 @@
+"""
+Acquisition mensuelle des congés annuels
+
+La règle en vigueur (LeaveAccrualRule) donne les jours acquis par mois et les
+paliers d'ancienneté (calculée depuis Employee.date_of_hire). Une période est
+calculée pour tous les employés en une passe vectorisée NumPy : les mois
+d'embauche et de départ sont proratisés. Au calcul de janvier, les jours non
+pris de l'année précédente sont reportés (mois 0) dans la limite du plafond.
+
+Une période peut être recalculée à tout moment (correction d'une date
+d'embauche, d'une règle...) : les acquisitions existantes sont mises à jour,
+et LeaveBalance.annual_leave de l'année courante reprend le total acquis dès
+que toutes les périodes de l'année (depuis janvier ou l'embauche) sont calculées.
+
+Une année passée est clôturée par close_year : jours utilisés de l'année et
+report sur l'année suivante, sans toucher aux soldes de l'année en cours.
+"""
+import calendar
+import time
+from datetime import date
+from decimal import Decimal, ROUND_DOWN
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import Employee, LeaveRequest, LeaveBalance, LeaveAccrual, LeaveAccrualRule
+
+
+CARRY_OVER_MONTH = 0
+
+
+def rule_in_effect(period_date):
+    """Règle d'acquisition active la plus récente à une date"""
+    return (
+        LeaveAccrualRule.objects.filter(is_active=True, effective_from__lte=period_date)
+        .prefetch_related('seniority_tiers')
+        .order_by('-effective_from')
+        .first()
+    )
+
+
+def _seniority_years(hire_dates, on_date):
+    """Ancienneté en années révolues à une date"""
+    hire_years = np.array([hired.year for hired in hire_dates])
+    hire_days = np.array([hired.month * 100 + hired.day for hired in hire_dates])
+    return on_date.year - hire_years - (on_date.month * 100 + on_date.day < hire_days)
+
+
+def _accrual_days(rule, hire_dates, exit_dates, first, last):
+    """Jours acquis sur le mois et part due à l'ancienneté, pour tous les employés"""
+    size = last.day
+    hired = np.array([hired.toordinal() for hired in hire_dates])
+    left = np.array([left.toordinal() if left else last.toordinal() for left in exit_dates])
+    employed = np.clip(np.minimum(left, last.toordinal()) - np.maximum(hired, first.toordinal()) + 1, 0, size)
+    ratio = employed / size
+
+    extra_per_year = np.zeros(len(hire_dates))
+    tiers = sorted(rule.seniority_tiers.all(), key=lambda tier: tier.min_years)
+    if tiers:
+        thresholds = np.array([tier.min_years for tier in tiers])
+        extras = np.array([float(tier.extra_days) for tier in tiers])
+        reached = np.searchsorted(thresholds, _seniority_years(hire_dates, last), side='right') - 1
+        extra_per_year = np.where(reached >= 0, extras[np.clip(reached, 0, None)], 0.0)
+
+    seniority = np.round(extra_per_year / 12 * ratio, 2)
+    days = np.round(float(rule.monthly_days) * ratio, 2) + seniority
+    return days, seniority
+
+
+def _carry_over(rule, employee_ids, year):
+    """Jours non pris de l'année précédente, plafonnés (employés ayant des acquisitions cette année-là)"""
+    acquired = dict(
+        LeaveAccrual.objects.filter(year=year - 1, employee_id__in=employee_ids)
+        .values_list('employee_id').annotate(total=Sum('days')).order_by()
+    )
+    if not acquired:
+        return {}
+    used = dict(
+        LeaveRequest.objects.filter(
+            employee_id__in=acquired, leave_type='ANNUAL', status='RH_APPROVED', start_date__year=year - 1
+        ).values_list('employee_id').annotate(total=Sum('days')).order_by()
+    )
+    remaining = np.array([float(acquired[employee_id]) - (used.get(employee_id) or 0) for employee_id in acquired])
+    remaining = np.clip(remaining, 0, None)
+    if rule.carry_over_cap is not None:
+        remaining = np.minimum(remaining, float(rule.carry_over_cap))
+    return {employee_id: round(float(days), 2) for employee_id, days in zip(acquired, remaining)}
+
+
+def sync_annual_leave(year):
+    """
+    Reporte le total acquis de l'année (jours entiers) dans LeaveBalance.annual_leave,
+    pour les seuls employés dont chaque mois depuis janvier (ou le mois d'embauche)
+    jusqu'au dernier mois calculé a une acquisition : le calcul isolé d'un mois
+    n'écrase pas le droit annuel par l'acquis de ce seul mois.
+    Retourne le nombre de soldes modifiés.
+    """
+    rows = (
+        LeaveAccrual.objects.filter(year=year)
+        .values('employee_id', 'employee__date_of_hire')
+        .annotate(
+            total=Sum('days'),
+            first=Min('month', filter=Q(month__gt=CARRY_OVER_MONTH)),
+            last=Max('month'),
+            months=Count('month', filter=Q(month__gt=CARRY_OVER_MONTH)),
+        )
+        .order_by()
+    )
+    acquired = {}
+    for row in rows:
+        hired = row['employee__date_of_hire']
+        start = hired.month if hired.year == year else 1
+        if row['first'] == start and row['months'] == row['last'] - start + 1:
+            acquired[row['employee_id']] = row['total']
+
+    LeaveBalance.objects.bulk_create(
+        [LeaveBalance(employee_id=employee_id) for employee_id in acquired], ignore_conflicts=True
+    )
+    now = timezone.now()
+    changed = []
+    for balance in LeaveBalance.objects.filter(employee_id__in=acquired).only('id', 'employee_id', 'annual_leave'):
+        annual_leave = int(acquired[balance.employee_id].quantize(Decimal('1'), rounding=ROUND_DOWN))
+        if balance.annual_leave != annual_leave:
+            balance.annual_leave = annual_leave
+            balance.updated_at = now
+            changed.append(balance)
+    LeaveBalance.objects.bulk_update(changed, ['annual_leave', 'updated_at'], batch_size=500)
+    return len(changed)
+
+
+def compute_accruals(year, month, dry_run=False):
+    """
+    Calcule les acquisitions de congés d'une période pour tous les employés
+    présents sur le mois, et le report de l'année précédente en janvier.
+    Les lignes existantes de la période sont mises à jour (bulk_update), les
+    nouvelles créées et celles des employés qui ne sont plus concernés supprimées.
+    """
+    started = time.perf_counter()
+    first = date(year, month, 1)
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    rule = rule_in_effect(first)
+
+    result = {
+        'period': {'month': month, 'year': year},
+        'rule': str(rule) if rule else None,
+        'employees': 0,
+        'created': 0,
+        'updated': 0,
+        'deleted': 0,
+        'total_days': 0.0,
+        'carried_over': 0.0,
+        'balances_updated': 0,
+        'dry_run': dry_run,
+    }
+    if rule is None:
+        return result
+
+    rows = list(
+        Employee.objects.filter(date_of_hire__lte=last)
+        .filter(Q(date_of_exit__isnull=True, is_active=True) | Q(date_of_exit__gte=first))
+        .values_list('id', 'date_of_hire', 'date_of_exit')
+    )
+    targets = {}
+    if rows:
+        employee_ids = [row[0] for row in rows]
+        days, seniority = _accrual_days(rule, [row[1] for row in rows], [row[2] for row in rows], first, last)
+        for employee_id, accrued, extra in zip(employee_ids, days, seniority):
+            targets[(employee_id, month)] = (Decimal(str(round(float(accrued), 2))), Decimal(str(round(float(extra), 2))))
+        result['total_days'] = round(float(days.sum()), 2)
+
+        if month == 1:
+            carried = _carry_over(rule, employee_ids, year)
+            for employee_id, carried_days in carried.items():
+                targets[(employee_id, CARRY_OVER_MONTH)] = (Decimal(str(carried_days)), Decimal('0'))
+            result['carried_over'] = round(sum(carried.values()), 2)
+    result['employees'] = len(rows)
+
+    months = [month, CARRY_OVER_MONTH] if month == 1 else [month]
+    existing = {
+        (accrual.employee_id, accrual.month): accrual
+        for accrual in LeaveAccrual.objects.filter(year=year, month__in=months)
+    }
+    now = timezone.now()
+    to_update, to_create = [], []
+    for key, (accrued, extra) in targets.items():
+        accrual = existing.pop(key, None)
+        if accrual is None:
+            to_create.append(LeaveAccrual(
+                employee_id=key[0], rule=rule, year=year, month=key[1], days=accrued, seniority_days=extra
+            ))
+        elif (accrual.days, accrual.seniority_days, accrual.rule_id) != (accrued, extra, rule.pk):
+            accrual.days, accrual.seniority_days, accrual.rule, accrual.updated_at = accrued, extra, rule, now
+            to_update.append(accrual)
+    result.update(created=len(to_create), updated=len(to_update), deleted=len(existing))
+
+    if not dry_run:
+        with transaction.atomic():
+            LeaveAccrual.objects.bulk_update(to_update, ['days', 'seniority_days', 'rule', 'updated_at'], batch_size=500)
+            LeaveAccrual.objects.bulk_create(to_create, batch_size=500)
+            LeaveAccrual.objects.filter(pk__in=[accrual.pk for accrual in existing.values()]).delete()
+            if year == timezone.now().year:
+                result['balances_updated'] = sync_annual_leave(year)
+
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def close_year(year, dry_run=False):
+    """
+    Clôture d'une année passée : jours utilisés par employé (demandes approuvées
+    par RH commençant dans l'année) et report plafonné des jours non pris sur
+    l'année suivante (mois 0, même calcul que l'acquisition de janvier).
+    Les soldes LeaveBalance, qui portent sur l'année en cours, ne sont pas modifiés.
+    """
+    started = time.perf_counter()
+    if year >= timezone.now().year:
+        raise ValueError(f'Seule une année passée peut être clôturée ({year} demandé)')
+
+    used = {}
+    for employee_id, leave_type, total in (
+        LeaveRequest.objects.filter(status='RH_APPROVED', start_date__year=year, leave_type__in=['ANNUAL', 'SICK'])
+        .values_list('employee_id', 'leave_type').annotate(total=Sum('days')).order_by()
+    ):
+        used.setdefault(employee_id, {'ANNUAL': 0, 'SICK': 0})[leave_type] = total
+
+    rule = rule_in_effect(date(year + 1, 1, 1))
+    employee_ids = list(LeaveAccrual.objects.filter(year=year).values_list('employee_id', flat=True).distinct())
+    carried = _carry_over(rule, employee_ids, year + 1) if rule else {}
+
+    existing = {
+        accrual.employee_id: accrual
+        for accrual in LeaveAccrual.objects.filter(year=year + 1, month=CARRY_OVER_MONTH, employee_id__in=carried)
+    }
+    now = timezone.now()
+    to_update, to_create = [], []
+    for employee_id, carried_days in carried.items():
+        days = Decimal(str(carried_days))
+        accrual = existing.get(employee_id)
+        if accrual is None:
+            to_create.append(LeaveAccrual(
+                employee_id=employee_id, rule=rule, year=year + 1, month=CARRY_OVER_MONTH, days=days, seniority_days=Decimal('0')
+            ))
+        elif (accrual.days, accrual.rule_id) != (days, rule.pk):
+            accrual.days, accrual.rule, accrual.updated_at = days, rule, now
+            to_update.append(accrual)
+
+    if not dry_run:
+        with transaction.atomic():
+            LeaveAccrual.objects.bulk_update(to_update, ['days', 'rule', 'updated_at'], batch_size=500)
+            LeaveAccrual.objects.bulk_create(to_create, batch_size=500)
+
+    return {
+        'year': year,
+        'rule': str(rule) if rule else None,
+        'employees': len(used),
+        'used_annual': sum(row['ANNUAL'] for row in used.values()),
+        'used_sick': sum(row['SICK'] for row in used.values()),
+        'carried_over': round(sum(carried.values()), 2),
+        'created': len(to_create),
+        'updated': len(to_update),
+        'dry_run': dry_run,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -4,7 +4,9 @@ from .models import (
     User, Employee, Service, EmployeeHistory, JobOffer, Candidate, Interview,
     LeaveRequest, LeaveBalance, Attendance, Contract, Payslip, PayslipBonus,
     PayslipDeduction, PaymentHistory, Document, PresenceTracking,
-    TrainingPlan, Training, TrainingSession, Evaluation
+    TrainingPlan, Training, TrainingSession, Evaluation,
+    ContributionRate, ContributionBracket, PayslipContribution, LeaveTransaction,
+    LeaveAccrualRule, LeaveSeniorityTier, LeaveAccrual, IdSequence
 )
 
 
@@ -18,7 +20,7 @@ class UserAdmin(admin.ModelAdmin):
 
 @admin.register(Service)
 class ServiceAdmin(admin.ModelAdmin):
-    list_display = ['name', 'manager', 'employee_count', 'created_at']
+    list_display = ['name', 'manager', 'min_staff_present', 'employee_count', 'created_at']
     list_filter = ['created_at']
     search_fields = ['name', 'description']
     
@@ -178,6 +180,36 @@ class LeaveBalanceAdmin(admin.ModelAdmin):
     remaining_sick.short_description = 'Congés maladie restants'
 
 
+@admin.register(LeaveTransaction)
+class LeaveTransactionAdmin(admin.ModelAdmin):
+    list_display = ['employee', 'leave_type', 'transaction_type', 'days', 'year', 'leave_request', 'created_by', 'created_at']
+    list_filter = ['transaction_type', 'leave_type', 'year']
+    search_fields = ['employee__first_name', 'employee__last_name', 'employee__employee_id', 'description']
+    readonly_fields = ['created_at']
+
+
+class LeaveSeniorityTierInline(admin.TabularInline):
+    model = LeaveSeniorityTier
+    extra = 0
+    fields = ['min_years', 'extra_days']
+
+
+@admin.register(LeaveAccrualRule)
+class LeaveAccrualRuleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'monthly_days', 'carry_over_cap', 'effective_from', 'is_active']
+    list_filter = ['is_active']
+    search_fields = ['name']
+    inlines = [LeaveSeniorityTierInline]
+
+
+@admin.register(LeaveAccrual)
+class LeaveAccrualAdmin(admin.ModelAdmin):
+    list_display = ['employee', 'year', 'month', 'days', 'seniority_days', 'rule', 'updated_at']
+    list_filter = ['year', 'month', 'rule']
+    search_fields = ['employee__first_name', 'employee__last_name', 'employee__employee_id']
+    readonly_fields = ['created_at', 'updated_at']
+
+
 @admin.register(Attendance)
 class AttendanceAdmin(admin.ModelAdmin):
     list_display = ['employee', 'date', 'check_in', 'check_out', 'is_present', 'is_late', 'overtime_hours']
@@ -270,6 +302,28 @@ class PaymentHistoryAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
 
 
+class ContributionBracketInline(admin.TabularInline):
+    model = ContributionBracket
+    extra = 0
+    fields = ['lower_bound', 'upper_bound', 'rate']
+
+
+@admin.register(ContributionRate)
+class ContributionRateAdmin(admin.ModelAdmin):
+    list_display = ['code', 'name', 'deduction_type', 'employee_rate', 'employer_rate', 'ceiling', 'is_progressive', 'effective_from', 'effective_to', 'is_active']
+    list_filter = ['deduction_type', 'is_progressive', 'is_active']
+    search_fields = ['code', 'name']
+    inlines = [ContributionBracketInline]
+
+
+@admin.register(PayslipContribution)
+class PayslipContributionAdmin(admin.ModelAdmin):
+    list_display = ['payslip', 'contribution_rate', 'base_amount', 'employee_amount', 'employer_amount', 'created_at']
+    list_filter = ['contribution_rate', 'payslip__year', 'payslip__month']
+    search_fields = ['payslip__employee__first_name', 'payslip__employee__last_name', 'payslip__employee__employee_id']
+    readonly_fields = ['created_at']
+
+
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
     list_display = ['document_type', 'employee', 'uploaded_by', 'created_at']
@@ -364,3 +418,9 @@ class EvaluationAdmin(admin.ModelAdmin):
         avg = obj.average_score
         return f"{avg:.2f}" if avg else "-"
     average_score.short_description = 'Moyenne'
+
+
+@admin.register(IdSequence)
+class IdSequenceAdmin(admin.ModelAdmin):
+    list_display = ['name', 'last_value', 'updated_at']
+    readonly_fields = ['updated_at']
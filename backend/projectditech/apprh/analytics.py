@@ -0,0 +1,223 @@
+"""
+Analyses de la distribution des salaires (percentiles, histogrammes, bandes)
+
+Les salaires d'une période sont chargés en une seule requête puis traités de
+façon vectorisée avec NumPy. Les résultats sont mis en cache par période ; le
+cache est invalidé à chaque modification d'une fiche de paie, et pour toutes
+les années quand le service ou le poste d'un employé change ou qu'un service
+est renommé (regroupements par poste et par service, voir signals.py).
+"""
+import time
+
+import numpy as np
+from django.core.cache import cache
+
+from .models import Payslip
+
+
+PERCENTILES = [10, 25, 50, 75, 90]
+CACHE_TIMEOUT = 6 * 60 * 60
+
+# Champs de l'employé repris dans les regroupements par poste et par service
+GROUPING_FIELDS = {'service_id', 'position'}
+
+
+def _version_key(year=None):
+    return f'salary_analytics_version:{year or "all"}'
+
+
+def _new_version():
+    """
+    Version initiale d'une clé absente : toujours nouvelle, pour qu'une clé
+    de version évincée du cache ne ramène pas d'anciennes entrées.
+    """
+    return time.time_ns()
+
+
+def _versions(*keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = _new_version()
+            # Un autre processus a pu initialiser la clé entre-temps
+            versions[key] = version if cache.add(key, version, None) else cache.get(key, version)
+    return versions
+
+
+def _bump_versions(*keys):
+    """Passe chaque clé de version à une nouvelle valeur (jamais une valeur déjà servie)"""
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def invalidate_salary_analytics(year=None):
+    """
+    Invalide les analyses de l'année (et la comparaison N+1 qui s'appuie
+    dessus), de toutes les années si year est None.
+    """
+    keys = [_version_key()] if year is None else [_version_key(year), _version_key(year + 1)]
+    _bump_versions(*keys)
+
+
+def grouping_changed(employee, update_fields=None):
+    """Vrai si le service ou le poste diffère de l'état chargé (ou si cet état est inconnu)"""
+    if update_fields is not None and not {'service', 'service_id', 'position'} & set(update_fields):
+        return False
+    loaded = getattr(employee, '_loaded_values', {})
+    return any(name not in loaded or loaded[name] != getattr(employee, name) for name in GROUPING_FIELDS)
+
+
+def _round(value):
+    return round(float(value), 2)
+
+
+def _distribution(values):
+    """Statistiques descriptives d'un tableau de salaires"""
+    if values.size == 0:
+        return None
+    percentiles = np.percentile(values, PERCENTILES)
+    return {
+        'count': int(values.size),
+        'mean': _round(values.mean()),
+        'min': _round(values.min()),
+        'max': _round(values.max()),
+        'percentiles': {f'p{p}': _round(v) for p, v in zip(PERCENTILES, percentiles)},
+        # Bande salariale : intervalle interquartile autour de la médiane
+        'band': {
+            'low': _round(percentiles[1]),
+            'mid': _round(percentiles[2]),
+            'high': _round(percentiles[3]),
+        },
+    }
+
+
+def _load_period(year, month=None, service_id=None):
+    """
+    Charge les salaires de la période en une requête et les ramène à une
+    valeur par employé (moyenne mensuelle si la période couvre l'année).
+    """
+    queryset = Payslip.objects.filter(year=year)
+    if month:
+        queryset = queryset.filter(month=month)
+    if service_id:
+        queryset = queryset.filter(employee__service_id=service_id)
+
+    rows = list(queryset.values_list(
+        'employee_id', 'net_salary', 'gross_salary',
+        'employee__position', 'employee__service__name',
+    ))
+    if not rows:
+        return None
+
+    employee_ids, net, gross, positions, service_names = zip(*rows)
+    _, first, index = np.unique(np.array(employee_ids), return_index=True, return_inverse=True)
+    months = np.bincount(index)
+    net = np.bincount(index, weights=np.array(net, dtype=float)) / months
+    gross = np.bincount(index, weights=np.array(gross, dtype=float)) / months
+
+    return {
+        'net': net,
+        'gross': gross,
+        'position': np.array([positions[i] or 'Non renseigné' for i in first], dtype=object),
+        'service': np.array([service_names[i] or 'Sans service' for i in first], dtype=object),
+    }
+
+
+def _by_group(data, key):
+    """Distribution par poste ou par service, indexée par libellé"""
+    groups = {}
+    labels, index = np.unique(data[key], return_inverse=True)
+    for i, label in enumerate(labels):
+        mask = index == i
+        groups[label] = {
+            'net': _distribution(data['net'][mask]),
+            'gross': _distribution(data['gross'][mask]),
+        }
+    return groups
+
+
+def _delta(current, previous):
+    if current is None or previous is None:
+        return None
+    result = {}
+    for name, now, before in (
+        ('mean', current['mean'], previous['mean']),
+        ('p50', current['percentiles']['p50'], previous['percentiles']['p50']),
+    ):
+        result[name] = {
+            'previous': before,
+            'current': now,
+            'delta': _round(now - before),
+            'delta_pct': _round((now - before) / before * 100) if before else None,
+        }
+    return result
+
+
+def _analyse(year, month, service_id, bins):
+    data = _load_period(year, month, service_id)
+    if data is None:
+        return None
+
+    counts, edges = np.histogram(data['net'], bins=bins)
+    return {
+        'overall': {
+            'net': _distribution(data['net']),
+            'gross': _distribution(data['gross']),
+        },
+        'histogram': {
+            'field': 'net_salary',
+            'counts': counts.tolist(),
+            'edges': [_round(e) for e in edges],
+        },
+        'by_position': _by_group(data, 'position'),
+        'by_service': _by_group(data, 'service'),
+    }
+
+
+def salary_analytics(year, month=None, service_id=None, bins=10):
+    """
+    Distribution des salaires d'une période avec comparaison sur un an.
+    Résultat mis en cache par période et paramètres.
+    """
+    year_key, all_key = _version_key(year), _version_key()
+    versions = _versions(year_key, all_key)
+    cache_key = (
+        f'salary_analytics:{year}:{month or "all"}:{service_id or "all"}:{bins}'
+        f':v{versions[year_key]}.{versions[all_key]}'
+    )
+    result = cache.get(cache_key)
+    if result is not None:
+        return result
+
+    current = _analyse(year, month, service_id, bins)
+    previous = _analyse(year - 1, month, service_id, bins)
+
+    result = {
+        'period': {'year': year, 'month': month},
+        'service': service_id,
+        'percentiles': [f'p{p}' for p in PERCENTILES],
+        'current': current,
+        'previous_year': previous and previous['overall'],
+        'year_over_year': None,
+    }
+    if current and previous:
+        result['year_over_year'] = {
+            'net': _delta(current['overall']['net'], previous['overall']['net']),
+            'gross': _delta(current['overall']['gross'], previous['overall']['gross']),
+            'by_position': {
+                label: _delta(group['net'], previous['by_position'][label]['net'])
+                for label, group in current['by_position'].items()
+                if label in previous['by_position']
+            },
+            'by_service': {
+                label: _delta(group['net'], previous['by_service'][label]['net'])
+                for label, group in current['by_service'].items()
+                if label in previous['by_service']
+            },
+        }
+
+    cache.set(cache_key, result, CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,172 @@
+"""
+Suivi des échéances de contrats (CDD, stage, intérim)
+
+Les contrats expirés et ceux qui arrivent à échéance sont mis à jour par des
+update() ensemblistes, sans passer par Contract.save ; les renouvellements
+automatiques sont créés en un seul bulk_create. Les écrans d'alerte
+s'appuient sur with_expiry(), qui calcule l'échéance et le niveau d'alerte
+dans la requête plutôt que par les propriétés Python du modèle.
+"""
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import (
+    BooleanField, Case, CharField, Count, DurationField, Exists, ExpressionWrapper, F, OuterRef, Q, Subquery,
+    Value, When
+)
+from django.db.models.functions import Coalesce, Concat
+from django.utils import timezone
+
+from .models import Contract
+
+
+# Types de contrats à durée limitée (les CDI n'ont pas d'échéance)
+FIXED_TERM_TYPES = ['CDD', 'STAGE', 'INTERIM']
+
+# Seuils des niveaux d'alerte en jours avant l'échéance (mêmes que Contract.alert_level)
+ALERT_THRESHOLDS = [(7, 'critical'), (30, 'warning'), (60, 'info')]
+
+
+def with_expiry(queryset, today=None):
+    """
+    Annote les contrats avec leur échéance calculée en SQL :
+    days_left (durée end_date - aujourd'hui), alert, expires_soon et
+    has_expired (équivalents SQL des propriétés alert_level, is_expiring_soon
+    et is_expired), ainsi que employee_name et service_name pour les écrans
+    d'alerte. Un contrat au statut EXPIRED est considéré comme expiré.
+    """
+    today = today or timezone.now().date()
+    signed = Q(status='SIGNED', end_date__isnull=False)
+    expired = Q(status__in=['SIGNED', 'EXPIRED'], end_date__lt=today)
+    days_left = ExpressionWrapper(F('end_date') - Value(today), output_field=DurationField())
+    notice = ExpressionWrapper(F('renewal_notice_days') * Value(timedelta(days=1)), output_field=DurationField())
+
+    return queryset.annotate(
+        employee_name=Concat('employee__first_name', Value(' '), 'employee__last_name'),
+        service_name=F('employee__service__name'),
+        days_left=days_left,
+        has_expired=Case(When(expired, then=Value(True)), default=Value(False), output_field=BooleanField()),
+        alert=Case(
+            When(expired, then=Value('critical')),
+            *[
+                When(signed, end_date__lte=today + timedelta(days=days), then=Value(level))
+                for days, level in ALERT_THRESHOLDS
+            ],
+            default=None,
+            output_field=CharField(),
+        ),
+    ).annotate(
+        expires_soon=Case(
+            When(signed, end_date__gte=today, days_left__lte=notice, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+    )
+
+
+def with_renewal_count(queryset):
+    """Annote renewals_total (nombre de renouvellements), lu par ContractSerializer.renewal_count"""
+    renewals = Contract.objects.filter(parent_contract=OuterRef('pk')).order_by().values(
+        'parent_contract'
+    ).annotate(total=Count('id')).values('total')
+    return queryset.annotate(renewals_total=Coalesce(Subquery(renewals), 0))
+
+
+def _renewal_for(contract):
+    """Contrat de renouvellement en brouillon, mêmes règles que Contract.create_renewal"""
+    new_start_date = contract.end_date + timedelta(days=1)
+    new_end_date = None
+    if contract.start_date:
+        new_end_date = new_start_date + timedelta(days=(contract.end_date - contract.start_date).days)
+    return Contract(
+        employee_id=contract.employee_id,
+        contract_type=contract.contract_type,
+        start_date=new_start_date,
+        end_date=new_end_date,
+        salary=contract.salary,
+        position=contract.position,
+        status='DRAFT',
+        parent_contract=contract,
+        auto_renewal=contract.auto_renewal,
+        renewal_notice_days=contract.renewal_notice_days,
+        notes=f'Renouvellement automatique du contrat {contract.id}'
+    )
+
+
+def check_contracts(days_ahead=30, auto_renew=False, dry_run=False):
+    """
+    Marque les contrats expirés (EXPIRED), signale ceux qui expirent dans les
+    days_ahead prochains jours (needs_renewal) et, si auto_renew, crée les
+    renouvellements des contrats en renouvellement automatique.
+    En dry_run, rien n'est écrit : les compteurs indiquent ce qui serait fait.
+    """
+    started = time.perf_counter()
+    today = timezone.now().date()
+    future_date = today + timedelta(days=days_ahead)
+    now = timezone.now()
+
+    signed = Contract.objects.filter(status='SIGNED', contract_type__in=FIXED_TERM_TYPES)
+    expired = signed.filter(end_date__lt=today)
+    expiring = signed.filter(end_date__gte=today, end_date__lte=future_date)
+    has_renewal = Contract.objects.filter(parent_contract=OuterRef('pk'))
+    # Un contrat déjà renouvelé n'est plus à signaler
+    to_flag = expiring.filter(needs_renewal=False).exclude(Exists(has_renewal))
+
+    result = {
+        'date': today.isoformat(),
+        'days_ahead': days_ahead,
+        'until': future_date.isoformat(),
+        'dry_run': dry_run,
+        'expiring': expiring.count(),
+        'flagged': [],
+        'expired': 0,
+        'renewed': 0,
+        'already_renewed': 0,
+    }
+    # Liste des contrats nouvellement signalés (une requête, sans chargement paresseux de l'employé)
+    result['flagged'] = [
+        {
+            'id': contract_id,
+            'employee': f'{first_name} {last_name}',
+            'end_date': end_date.isoformat(),
+            'days_until_expiry': (end_date - today).days,
+        }
+        for contract_id, first_name, last_name, end_date in to_flag.order_by('end_date').values_list(
+            'id', 'employee__first_name', 'employee__last_name', 'end_date'
+        )
+    ]
+
+    flagged_ids = [contract['id'] for contract in result['flagged']]
+
+    with transaction.atomic():
+        if dry_run:
+            result['expired'] = expired.count()
+        else:
+            result['expired'] = expired.update(status='EXPIRED', needs_renewal=True, updated_at=now)
+            Contract.objects.filter(pk__in=flagged_ids).update(needs_renewal=True, updated_at=now)
+
+        if auto_renew:
+            # Les contrats signalés à l'instant sont candidats (y compris en simulation)
+            candidates = signed.filter(auto_renewal=True, end_date__gte=today).filter(
+                Q(needs_renewal=True) | Q(pk__in=flagged_ids)
+            )
+            candidates = candidates.annotate(already_renewed=Exists(has_renewal))
+            result['already_renewed'] = candidates.filter(already_renewed=True).count()
+            to_renew = list(candidates.filter(already_renewed=False))
+            result['renewed'] = len(to_renew)
+
+            if not dry_run and to_renew:
+                Contract.objects.bulk_create([_renewal_for(contract) for contract in to_renew], batch_size=500)
+                Contract.objects.filter(pk__in=[contract.pk for contract in to_renew]).update(
+                    needs_renewal=False, updated_at=now
+                )
+
+    if not dry_run:
+        # Mises à jour par lots, sans signaux : sections contrats de tous les dossiers
+        from .dossier import invalidate_dossier
+        invalidate_dossier(sections=['active_contract', 'all_contracts'])
+
+    result['attention'] = result['expiring'] + result['expired']
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
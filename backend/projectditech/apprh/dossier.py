@@ -0,0 +1,218 @@
+"""
+Dossier d'un employé par sections (informations, contrats, documents, historique...)
+
+Le client choisit les sections (?include=contracts,history) ; les sections
+de type liste sont limitées et paginées par curseur (date de tri + id), sans
+OFFSET. Chaque section est mise en cache par employé ; le cache d'une section
+est invalidé par les écritures sur les lignes correspondantes de l'employé,
+de son service ou de son compte utilisateur (voir signals.py), ou pour tous
+les employés par les traitements de masse.
+Les lignes reprennent l'employé déjà chargé : aucune jointure par ligne.
+"""
+import base64
+import json
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .analytics import _bump_versions, _versions
+from .contracts import with_renewal_count
+from .models import Contract, Document, EmployeeHistory, Evaluation, LeaveRequest, PresenceTracking
+from .serializers import (
+    EmployeeSerializer, ContractCompactSerializer, DocumentSerializer, EmployeeHistorySerializer,
+    EvaluationCompactSerializer, LeaveRequestCompactSerializer, PresenceTrackingCompactSerializer,
+)
+
+
+CACHE_TIMEOUT = 10 * 60
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+RECENT_ATTENDANCE_DAYS = 30
+
+
+class DossierParameterError(ValueError):
+    """Section, limite ou curseur invalide"""
+
+
+# queryset : lignes de l'employé ; order_field : tri décroissant (puis id) servant de curseur
+ListSection = namedtuple('ListSection', ['queryset', 'serializer', 'order_field'])
+
+LIST_SECTIONS = {
+    'all_contracts': ListSection(
+        lambda employee: with_renewal_count(Contract.objects.filter(employee=employee).select_related('parent_contract')),
+        ContractCompactSerializer,
+        'start_date',
+    ),
+    'documents': ListSection(
+        lambda employee: Document.objects.filter(employee=employee).select_related('uploaded_by'),
+        DocumentSerializer,
+        'created_at',
+    ),
+    'history': ListSection(
+        lambda employee: EmployeeHistory.objects.filter(employee=employee).select_related('changed_by'),
+        EmployeeHistorySerializer,
+        'changed_at',
+    ),
+    'evaluations': ListSection(
+        lambda employee: Evaluation.objects.filter(employee=employee).select_related('evaluated_by', 'approved_by'),
+        EvaluationCompactSerializer,
+        'evaluation_date',
+    ),
+    'leave_requests': ListSection(
+        lambda employee: LeaveRequest.objects.filter(employee=employee),
+        LeaveRequestCompactSerializer,
+        'created_at',
+    ),
+    'recent_attendances': ListSection(
+        lambda employee: PresenceTracking.objects.filter(
+            employee=employee, date__gte=timezone.now().date() - timedelta(days=RECENT_ATTENDANCE_DAYS)
+        ),
+        PresenceTrackingCompactSerializer,
+        'date',
+    ),
+}
+
+SECTIONS = ['employee', 'active_contract', *LIST_SECTIONS]
+
+# Noms courts acceptés dans ?include=
+ALIASES = {
+    'info': ['employee'],
+    'contracts': ['active_contract', 'all_contracts'],
+    'leaves': ['leave_requests'],
+    'attendances': ['recent_attendances'],
+}
+
+# Sections à invalider quand une ligne du modèle change
+MODEL_SECTIONS = {
+    Contract: ['active_contract', 'all_contracts'],
+    Document: ['documents'],
+    EmployeeHistory: ['history'],
+    Evaluation: ['evaluations'],
+    LeaveRequest: ['leave_requests'],
+    PresenceTracking: ['recent_attendances'],
+}
+
+
+def _version_key(employee_id, section):
+    return f'dossier_version:{employee_id or "all"}:{section}'
+
+
+def invalidate_dossier(employee_id=None, sections=None):
+    """
+    Invalide des sections du dossier d'un employé, ou de tous les employés si
+    employee_id est None (traitements de masse sans signaux). Toutes les
+    sections par défaut.
+    """
+    _bump_versions(*[_version_key(employee_id, section) for section in sections or SECTIONS])
+
+
+def parse_sections(include):
+    """Sections demandées par ?include= (toutes si vide)"""
+    if not include:
+        return list(SECTIONS)
+    sections = []
+    for name in (part.strip().lower() for part in include.split(',')):
+        if not name:
+            continue
+        expanded = ALIASES.get(name, [name])
+        if any(section not in SECTIONS for section in expanded):
+            raise DossierParameterError(
+                f'Section "{name}" inconnue, valeurs possibles : {", ".join([*SECTIONS, *ALIASES])}'
+            )
+        sections.extend(section for section in expanded if section not in sections)
+    return sections
+
+
+def parse_limit(value, default=DEFAULT_LIMIT):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise DossierParameterError(f'Limite invalide : {value}')
+    if limit < 1:
+        raise DossierParameterError('La limite doit être au moins 1')
+    return min(limit, MAX_LIMIT)
+
+
+def _encode_cursor(value, pk):
+    payload = json.dumps([value.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, field):
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return field.to_python(value), int(pk)
+    except Exception:
+        raise DossierParameterError('Curseur invalide')
+
+
+def _list_page(employee, section, limit, cursor, request):
+    spec = LIST_SECTIONS[section]
+    queryset = spec.queryset(employee)
+    order = spec.order_field
+    if cursor:
+        value, pk = _decode_cursor(cursor, queryset.model._meta.get_field(order))
+        queryset = queryset.filter(**{f'{order}__lt': value}) | queryset.filter(**{order: value, 'pk__lt': pk})
+    rows = list(queryset.order_by(f'-{order}', '-pk')[:limit + 1])
+    for row in rows:
+        # L'employé est déjà chargé : pas de jointure ni de requête par ligne
+        row.employee = employee
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(getattr(rows[-1], order), rows[-1].pk)
+    data = spec.serializer(rows, many=True, context={'request': request}).data
+    return {'results': data, 'next_cursor': next_cursor}
+
+
+def _build_section(employee, section, limit, cursor, request):
+    if section == 'employee':
+        return EmployeeSerializer(employee, context={'request': request}).data
+    if section == 'active_contract':
+        contract = with_renewal_count(
+            Contract.objects.filter(employee=employee, status='SIGNED').select_related('parent_contract')
+        ).order_by('-start_date').first()
+        if contract is None:
+            return None
+        contract.employee = employee
+        return ContractCompactSerializer(contract).data
+    return _list_page(employee, section, limit, cursor, request)
+
+
+def build_dossier(employee, sections, limits, cursors, request):
+    """
+    Sections du dossier, lues en cache quand c'est possible.
+    limits / cursors : {section: valeur} pour les sections de type liste.
+    Retourne {section: données} ; une section liste vaut {'results', 'next_cursor'}.
+    """
+    version_keys = [_version_key(key, section) for section in sections for key in (employee.pk, None)]
+    versions = _versions(*version_keys)
+    today = timezone.now().date().isoformat()
+
+    cache_keys = {}
+    for section in sections:
+        employee_version = versions[_version_key(employee.pk, section)]
+        global_version = versions[_version_key(None, section)]
+        parts = [f'dossier:{employee.pk}:{section}:v{employee_version}.{global_version}', request.get_host()]
+        if section in LIST_SECTIONS:
+            parts += [str(limits[section]), cursors.get(section) or '']
+        if section == 'recent_attendances':
+            parts.append(today)
+        cache_keys[section] = ':'.join(parts)
+
+    cached = cache.get_many(cache_keys.values())
+    result, missing = {}, {}
+    for section in sections:
+        key = cache_keys[section]
+        if key in cached:
+            result[section] = cached[key]
+        else:
+            result[section] = _build_section(employee, section, limits.get(section), cursors.get(section), request)
+            missing[key] = result[section]
+    if missing:
+        cache.set_many(missing, CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,125 @@
+"""
+Rendu des emails de fiche de paie
+
+Le template HTML est compilé une seule fois au chargement du module ; le rendu
+d'un lot de fiches ne fait ensuite que construire le contexte de chaque fiche.
+L'envoi en masse (send_payslip_emails) rend le lot avec render_payslip_emails
+et réutilise une seule connexion SMTP.
+"""
+import logging
+import os
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import get_template
+from django.utils import timezone
+
+
+MONTH_NAMES = ['', 'Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin',
+               'Juillet', 'Août', 'Septembre', 'Octobre', 'Novembre', 'Décembre']
+
+PAYSLIP_EMAIL_TEMPLATE = get_template('apprh/emails/payslip_email.html')
+
+logger = logging.getLogger(__name__)
+
+
+def month_name(month):
+    return MONTH_NAMES[month] if 1 <= month <= 12 else str(month)
+
+
+def default_from_email():
+    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@ditech.com')
+    if not from_email or from_email == 'noreply@votredomaine.com':
+        from_email = getattr(settings, 'EMAIL_HOST_USER', 'noreply@ditech.com')
+    return from_email
+
+
+def _amount(value):
+    return f"{float(value or 0):,.0f}"
+
+
+def render_payslip_email(payslip, current_year=None):
+    """Retourne (sujet, corps HTML) de l'email d'une fiche de paie"""
+    employee = payslip.employee
+    period = month_name(payslip.month)
+    context = {
+        'employee_first_name': employee.first_name or '',
+        'employee_last_name': employee.last_name or '',
+        'employee_id': employee.employee_id or '',
+        'month_name': period,
+        'payslip_year': payslip.year or timezone.now().year,
+        'base_salary_formatted': _amount(payslip.base_salary),
+        'bonuses_formatted': _amount(payslip.bonuses),
+        'deductions_formatted': _amount(payslip.deductions),
+        'net_salary_formatted': _amount(payslip.net_salary),
+        'current_year': current_year or timezone.now().year,
+    }
+    return f"Fiche de Paie - {period} {payslip.year}", PAYSLIP_EMAIL_TEMPLATE.render(context)
+
+
+def render_payslip_emails(payslips):
+    """
+    Rend les emails d'un lot de fiches de paie.
+    Les fiches doivent être chargées avec select_related('employee').
+    Génère des tuples (fiche, sujet, corps HTML).
+    """
+    current_year = timezone.now().year
+    for payslip in payslips:
+        subject, body = render_payslip_email(payslip, current_year=current_year)
+        yield payslip, subject, body
+
+
+def build_payslip_email(payslip, subject=None, body=None, from_email=None):
+    """Construit l'EmailMessage HTML d'une fiche de paie, avec le PDF en pièce jointe s'il existe"""
+    if subject is None or body is None:
+        subject, body = render_payslip_email(payslip)
+
+    email = EmailMessage(
+        subject=subject,
+        body=body,
+        from_email=from_email or default_from_email(),
+        to=[payslip.employee.email],
+    )
+    email.content_subtype = "html"
+
+    # Attacher le PDF si disponible
+    try:
+        if payslip.pdf_file and hasattr(payslip.pdf_file, 'path'):
+            pdf_path = payslip.pdf_file.path
+            if os.path.exists(pdf_path):
+                with open(pdf_path, 'rb') as pdf:
+                    email.attach(
+                        f'Fiche_Paie_{month_name(payslip.month)}_{payslip.year}.pdf',
+                        pdf.read(),
+                        'application/pdf'
+                    )
+    except Exception as pdf_error:
+        # Si le PDF ne peut pas être attaché, on continue quand même
+        logger.warning('Could not attach PDF of payslip %s: %s', payslip.pk, pdf_error)
+
+    return email
+
+
+def send_payslip_emails(payslips, connection=None):
+    """
+    Envoie les emails d'un lot de fiches de paie (chargées avec
+    select_related('employee')) sur une seule connexion. Une fiche en échec
+    n'empêche pas l'envoi des autres.
+    Retourne (identifiants des fiches envoyées, [(identifiant, erreur)]).
+    """
+    connection = connection or get_connection()
+    from_email = default_from_email()
+    sent, failed = [], []
+    with connection:
+        for payslip, subject, body in render_payslip_emails(payslips):
+            if not payslip.employee.email:
+                failed.append((payslip.pk, 'Adresse email de l\'employé manquante'))
+                continue
+            try:
+                connection.send_messages([build_payslip_email(payslip, subject, body, from_email)])
+            except Exception as e:
+                logger.error('Failed to send payslip email %s: %s', payslip.pk, e)
+                failed.append((payslip.pk, str(e)))
+            else:
+                sent.append(payslip.pk)
+    return sent, failed
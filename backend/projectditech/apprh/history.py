@@ -0,0 +1,204 @@
+"""
+Historique des modifications des employés (EmployeeHistory)
+
+L'état avant modification est celui chargé depuis la base (instantané pris
+par Employee.from_db) : la sauvegarde d'un employé ne relit pas sa ligne, et
+les lignes d'historique sont écrites en un seul bulk_create. Les champs suivis
+et la façon de les décrire sont déclarés dans TRACKED_FIELDS.
+
+Les traitements de masse peuvent désactiver l'historique (suppress_history)
+ou l'écrire par lots avec bulk_update_employees.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+
+from .absences import invalidate_leave_calendar
+from .dossier import invalidate_dossier
+from .models import Employee, EmployeeHistory, Service
+from .search import index_objects
+
+
+NOT_ASSIGNED = 'Non assigné'
+
+
+def _text(value):
+    return str(value) if value else ''
+
+
+def _status(value):
+    return 'Actif' if value else 'Inactif'
+
+
+# name : nom enregistré dans field_name ; attname : attribut comparé (clé étrangère : identifiant)
+# display : valeur affichée (None pour un service : son nom, résolu en une requête)
+TrackedField = namedtuple('TrackedField', ['name', 'attname', 'change_type', 'display', 'description'])
+
+TRACKED_FIELDS = [
+    TrackedField('position', 'position', 'POSITION', str, 'Changement de poste de "{old}" à "{new}"'),
+    TrackedField('salary', 'salary', 'SALARY', str, 'Changement de salaire de {old_value:,.0f} FCFA à {new_value:,.0f} FCFA'),
+    TrackedField('service', 'service_id', 'SERVICE', None, 'Changement de service de "{old}" à "{new}"'),
+    TrackedField('is_active', 'is_active', 'STATUS', _status, 'Changement de statut de "{old}" à "{new}"'),
+] + [
+    TrackedField(field, field, 'INFO', _text, 'Modification de {name}: "{old_value}" → "{new_value}"')
+    for field in ['first_name', 'last_name', 'email', 'phone', 'address', 'date_of_birth', 'date_of_hire', 'date_of_exit']
+]
+
+TRACKED_ATTNAMES = [field.attname for field in TRACKED_FIELDS]
+
+_suppressed = ContextVar('employee_history_suppressed', default=False)
+
+
+@contextmanager
+def suppress_history():
+    """Désactive l'historique des employés dans le bloc (imports, reprises de données...)"""
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+def history_suppressed():
+    return _suppressed.get()
+
+
+def take_snapshot(instance, values=None):
+    """
+    Mémorise les valeurs suivies comme état de référence de l'instance
+    (values : valeurs chargées depuis la base, sinon celles de l'instance)
+    """
+    if values is None:
+        deferred = instance.get_deferred_fields()
+        values = {attname: getattr(instance, attname) for attname in TRACKED_ATTNAMES if attname not in deferred}
+    else:
+        values = {attname: values[attname] for attname in TRACKED_ATTNAMES if attname in values}
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}), **values}
+
+
+def _previous_values(instances, attnames=TRACKED_ATTNAMES):
+    """
+    État de référence de chaque employé déjà enregistré : l'instantané, complété
+    par une seule requête pour les champs absents (instance construite à la main,
+    champs différés). Les employés introuvables en base sont ignorés.
+    """
+    previous, missing = {}, {}
+    for instance in instances:
+        if instance.pk is None:
+            continue
+        loaded = getattr(instance, '_loaded_values', {})
+        if all(attname in loaded for attname in attnames):
+            previous[instance.pk] = loaded
+        else:
+            missing[instance.pk] = loaded
+    if missing:
+        for row in Employee.objects.filter(pk__in=missing).values('pk', *attnames):
+            pk = row.pop('pk')
+            previous[pk] = {**row, **missing[pk]}
+    return previous
+
+
+def _service_names(service_ids):
+    service_ids = {service_id for service_id in service_ids if service_id is not None}
+    if not service_ids:
+        return {}
+    return dict(Service.objects.filter(pk__in=service_ids).values_list('id', 'name'))
+
+
+def _tracked(fields=None):
+    """Champs suivis, limités à fields (noms ou attnames) si fourni"""
+    if fields is None:
+        return TRACKED_FIELDS
+    return [field for field in TRACKED_FIELDS if field.name in fields or field.attname in fields]
+
+
+def diff_employees(instances, changed_by=None, fields=None):
+    """
+    Lignes d'historique (non enregistrées) décrivant les changements de chaque
+    instance par rapport à son état de référence, et services quittés.
+    changed_by : auteur par défaut si l'instance n'a pas d'attribut _changed_by ;
+    fields : limite la comparaison aux champs réellement enregistrés.
+    """
+    tracked = _tracked(fields)
+    previous = _previous_values(instances, [field.attname for field in tracked])
+    changes = []
+    for instance in instances:
+        old_values = previous.get(instance.pk)
+        if old_values is None:
+            continue
+        for field in tracked:
+            old, new = old_values[field.attname], getattr(instance, field.attname)
+            if old != new:
+                changes.append((instance, field, old, new))
+    if not changes:
+        return [], set()
+
+    services = _service_names(
+        value for _, field, old, new in changes if field.display is None for value in (old, new)
+    )
+    rows, left_services = [], set()
+    for instance, field, old, new in changes:
+        if field.display is None:
+            old_display, new_display = services.get(old, NOT_ASSIGNED), services.get(new, NOT_ASSIGNED)
+            left_services.add(old)
+        else:
+            old_display, new_display = field.display(old), field.display(new)
+        rows.append(EmployeeHistory(
+            employee=instance,
+            change_type=field.change_type,
+            field_name=field.name,
+            old_value=old_display,
+            new_value=new_display,
+            description=field.description.format(
+                name=field.name, old=old_display, new=new_display, old_value=old, new_value=new
+            ),
+            changed_by=getattr(instance, '_changed_by', changed_by),
+        ))
+    return rows, left_services
+
+
+def record_changes(instances, changed_by=None, fields=None):
+    """Écrit l'historique des instances en un seul bulk_create ; retourne les services quittés"""
+    if history_suppressed():
+        # Sans historique, les services quittés sont déduits des seuls instantanés (sans requête)
+        return {
+            instance._loaded_values['service_id']
+            for instance in instances
+            if 'service_id' in getattr(instance, '_loaded_values', {})
+            and instance._loaded_values['service_id'] != instance.service_id
+            and (fields is None or {'service', 'service_id'} & set(fields))
+        }
+    rows, left_services = diff_employees(instances, changed_by=changed_by, fields=fields)
+    EmployeeHistory.objects.bulk_create(rows, batch_size=500)
+    return left_services
+
+
+def bulk_update_employees(employees, fields, changed_by=None, batch_size=500):
+    """
+    Enregistre des employés modifiés en masse (bulk_update, sans signaux) et
+    écrit leur historique par lots, dans la même transaction. Les calendriers
+    d'absences des services concernés sont invalidés, l'index de recherche
+    et les périodes d'emploi mis à jour.
+    """
+    from .analytics import invalidate_salary_analytics
+    from .workforce import INTERVAL_FIELDS, rebuild_intervals
+
+    employees = list(employees)
+    with transaction.atomic():
+        left_services = record_changes(employees, changed_by=changed_by, fields=fields)
+        updated = Employee.objects.bulk_update(employees, fields, batch_size=batch_size)
+    for service_id in left_services | {employee.service_id for employee in employees}:
+        invalidate_leave_calendar(service_id)
+    index_objects(employees)
+    # Une invalidation globale plutôt qu'une par employé modifié
+    invalidate_dossier(sections=['employee', 'history'])
+    if fields is None or INTERVAL_FIELDS & set(fields):
+        rebuild_intervals([employee.pk for employee in employees])
+    if fields is None or {'service', 'service_id', 'position'} & set(fields):
+        invalidate_salary_analytics()
+    tracked = _tracked(fields)
+    for employee in employees:
+        take_snapshot(employee, {field.attname: getattr(employee, field.attname) for field in tracked})
+    return updated
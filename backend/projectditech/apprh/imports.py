@@ -0,0 +1,76 @@
+"""
+Lecture des fichiers d'import tabulaires (CSV / XLSX)
+
+Les lignes sont lues au fil de l'eau : chaque ligne est renvoyée sous forme de
+dictionnaire dont les clés sont les en-têtes normalisés (minuscules, espaces
+remplacés par des "_").
+"""
+import csv
+import io
+
+
+class ImportFileError(ValueError):
+    """Fichier d'import illisible ou dans un format non supporté"""
+
+
+def normalize_header(value):
+    """Normalise un en-tête de colonne ('Employee ID' -> 'employee_id')"""
+    return str(value or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def _read_csv(uploaded_file):
+    stream = io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', newline='')
+    sample = stream.read(4096)
+    stream.seek(0)
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=',;\t').delimiter
+    except csv.Error:
+        # Les exports Excel en français utilisent le point-virgule
+        delimiter = ';' if sample.count(';') > sample.count(',') else ','
+
+    reader = csv.reader(stream, delimiter=delimiter)
+    headers = [normalize_header(h) for h in next(reader, [])]
+    if not any(headers):
+        raise ImportFileError('Le fichier est vide ou ne contient pas de ligne d\'en-tête')
+
+    for line_number, values in enumerate(reader, start=2):
+        if not any(v.strip() for v in values):
+            continue
+        yield line_number, dict(zip(headers, (v.strip() for v in values)))
+
+
+def _read_xlsx(uploaded_file):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [normalize_header(h) for h in next(rows, ())]
+        if not any(headers):
+            raise ImportFileError('Le fichier est vide ou ne contient pas de ligne d\'en-tête')
+
+        for line_number, values in enumerate(rows, start=2):
+            if all(v is None or str(v).strip() == '' for v in values):
+                continue
+            yield line_number, {
+                header: value.strip() if isinstance(value, str) else value
+                for header, value in zip(headers, values)
+            }
+    finally:
+        workbook.close()
+
+
+def iter_import_rows(uploaded_file):
+    """
+    Itère sur les lignes d'un fichier CSV ou XLSX uploadé.
+    Retourne des tuples (numéro de ligne, dictionnaire des valeurs).
+
+    Lève ImportFileError si le format n'est pas supporté et ImportError si
+    openpyxl n'est pas installé pour un fichier XLSX.
+    """
+    file_name = (uploaded_file.name or '').lower()
+    if file_name.endswith('.xlsx'):
+        return _read_xlsx(uploaded_file)
+    if file_name.endswith(('.csv', '.txt')):
+        return _read_csv(uploaded_file)
+    raise ImportFileError('Format de fichier non supporté (CSV ou XLSX attendu)')
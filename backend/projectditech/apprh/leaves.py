@@ -0,0 +1,451 @@
+"""
+Workflow des demandes de congé et registre des soldes
+
+Chaque transition verrouille la demande (select_for_update) et, si le solde
+est concerné, la ligne LeaveBalance de l'employé. Le solde est ajusté par un
+incrément F() et le mouvement est tracé dans LeaveTransaction, sans relire
+l'ensemble des demandes de l'année.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q, Sum, FilteredRelation
+from django.utils import timezone
+
+from .models import Employee, Service, LeaveRequest, LeaveBalance, LeaveTransaction
+from .absences import invalidate_leave_calendar
+from .dossier import invalidate_dossier
+
+
+# Types de congés décomptés du solde, et champ "utilisé" correspondant
+BALANCE_FIELDS = {
+    'ANNUAL': 'used_annual',
+    'SICK': 'used_sick',
+}
+
+
+# Demandes qui rendent l'employé absent pour le contrôle d'effectif
+STAFFING_STATUSES = ['MANAGER_APPROVED', 'RH_APPROVED']
+
+
+class LeaveWorkflowError(Exception):
+    """Transition de demande de congé impossible (statut, solde insuffisant...)"""
+
+
+class StaffingConflictError(LeaveWorkflowError):
+    """L'absence ferait passer le service sous son effectif minimum présent"""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__(staffing_message(conflicts))
+
+
+def counts_in_balance(leave_request, year=None):
+    """
+    Le solde LeaveBalance porte sur l'année en cours : seules les demandes
+    commençant cette année-là y sont décomptées (même règle que
+    LeaveBalance.recalculate_used_days).
+    """
+    year = year or timezone.now().year
+    return leave_request.leave_type in BALANCE_FIELDS and leave_request.start_date.year == year
+
+
+def lock_balance(employee_id):
+    """Retourne le solde de l'employé (créé au besoin) verrouillé pour la transaction en cours"""
+    balances = LeaveBalance.objects.select_for_update()
+    try:
+        return balances.get(employee_id=employee_id)
+    except LeaveBalance.DoesNotExist:
+        # Création concurrente possible : la ligne est relue sous verrou dans tous les cas
+        LeaveBalance.objects.bulk_create([LeaveBalance(employee_id=employee_id)], ignore_conflicts=True)
+        return balances.get(employee_id=employee_id)
+
+
+def check_balance(balance, leave_type, days):
+    """Lève LeaveWorkflowError si le solde ne couvre pas la demande"""
+    if leave_type == 'ANNUAL' and balance.remaining_annual < days:
+        raise LeaveWorkflowError(
+            f'Solde insuffisant. Disponible: {balance.remaining_annual} jours, Demandé: {days} jours'
+        )
+    if leave_type == 'SICK' and balance.remaining_sick < days:
+        raise LeaveWorkflowError(
+            f'Solde maladie insuffisant. Disponible: {balance.remaining_sick} jours, Demandé: {days} jours'
+        )
+
+
+def _apply_delta(balance, leave_type, days):
+    """Incrémente atomiquement le compteur "utilisé" du solde"""
+    field = BALANCE_FIELDS[leave_type]
+    LeaveBalance.objects.filter(pk=balance.pk).update(**{field: F(field) + days, 'updated_at': timezone.now()})
+    balance.refresh_from_db(fields=[field, 'updated_at'])
+
+
+def _lock_request(leave_request_id, expected_statuses, message):
+    leave_request = LeaveRequest.objects.select_for_update().get(pk=leave_request_id)
+    if leave_request.status not in expected_statuses:
+        raise LeaveWorkflowError(message)
+    return leave_request
+
+
+def lock_services(employee_ids):
+    """
+    Verrouille (select_for_update, par ordre de clé) les services à effectif
+    minimum des employés, pour la transaction en cours : deux approbations
+    concurrentes dans un même service comptent les absences l'une après l'autre.
+    """
+    return list(
+        Service.objects.select_for_update()
+        .filter(pk__in=Employee.objects.filter(pk__in=employee_ids).values('service_id'), min_staff_present__isnull=False)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def staffing_conflicts(employee_id, start_date, end_date, exclude_request_id=None, pending=()):
+    """
+    Jours ouvrés de la période où l'absence de l'employé ferait passer son
+    service sous Service.min_staff_present.
+
+    Une seule requête : les employés actifs du service de l'employé, joints
+    (LEFT JOIN) aux congés approuvés qui chevauchent la période. pending :
+    absences [(employé, début, fin)] pas encore enregistrées (approbations
+    d'un même lot) ; seules celles des collègues du service sont comptées.
+    Retourne une liste vide si le service n'a pas de minimum défini.
+    """
+    overlapping = Q(
+        leave_requests__status__in=STAFFING_STATUSES,
+        leave_requests__start_date__lte=end_date,
+        leave_requests__end_date__gte=start_date,
+    )
+    if exclude_request_id:
+        overlapping &= ~Q(leave_requests__id=exclude_request_id)
+
+    rows = Employee.objects.filter(
+        is_active=True,
+        service__employees__id=employee_id,
+        service__min_staff_present__isnull=False,
+    ).annotate(
+        overlap=FilteredRelation('leave_requests', condition=overlapping)
+    ).values_list(
+        'id', 'first_name', 'last_name', 'service__min_staff_present', 'overlap__start_date', 'overlap__end_date'
+    ).order_by()
+
+    names = {}
+    absences = []
+    minimum = None
+    for colleague_id, first_name, last_name, minimum, leave_start, leave_end in rows:
+        names[colleague_id] = f'{first_name} {last_name}'
+        if leave_start and colleague_id != employee_id:
+            absences.append((colleague_id, max(leave_start, start_date), min(leave_end, end_date)))
+    if minimum is None:
+        return []
+    for colleague_id, leave_start, leave_end in pending:
+        if colleague_id in names and colleague_id != employee_id and leave_start <= end_date and leave_end >= start_date:
+            absences.append((colleague_id, max(leave_start, start_date), min(leave_end, end_date)))
+
+    # L'employé lui-même compte dans l'effectif mais sera absent
+    staff = len(set(names) | {employee_id})
+    conflicts = []
+    day = start_date
+    while day <= end_date:
+        if day.weekday() < 5:
+            # Absences comptées par collègue (homonymes distincts, congés qui se chevauchent)
+            absent = {colleague_id for colleague_id, first, last in absences if first <= day <= last}
+            present = staff - len(absent) - 1
+            if present < minimum:
+                conflicts.append({
+                    'date': day.isoformat(),
+                    'present': present,
+                    'minimum': minimum,
+                    'absent': sorted(names[colleague_id] for colleague_id in absent),
+                })
+        day += timedelta(days=1)
+    return conflicts
+
+
+def staffing_message(conflicts):
+    first = conflicts[0]
+    return (
+        f'Effectif minimum du service non respecté sur {len(conflicts)} jour(s) ouvré(s) '
+        f'(le {first["date"]}: {first["present"]} présent(s) pour un minimum de {first["minimum"]})'
+    )
+
+
+def check_staffing(leave_request, pending=()):
+    """
+    Lève StaffingConflictError si la demande laisse le service en sous-effectif
+    (pending : absences déjà accordées mais pas encore enregistrées)
+    """
+    conflicts = staffing_conflicts(
+        leave_request.employee_id, leave_request.start_date, leave_request.end_date, leave_request.pk, pending
+    )
+    if conflicts:
+        raise StaffingConflictError(conflicts)
+
+
+def approve_by_manager(leave_request_id, user, force=False):
+    """Approbation manager ; force=True passe outre le contrôle d'effectif minimum"""
+    with transaction.atomic():
+        leave_request = _lock_request(leave_request_id, ['PENDING'], 'Cette demande n\'est pas en attente')
+        if not force:
+            lock_services([leave_request.employee_id])
+            check_staffing(leave_request)
+        leave_request.status = 'MANAGER_APPROVED'
+        leave_request.manager_approval = user
+        leave_request.manager_approval_date = timezone.now()
+        leave_request.save()
+    return leave_request
+
+
+def reject(leave_request_id, level, rejection_reason=''):
+    """Rejet par le manager (level='manager') ou par RH (level='rh')"""
+    with transaction.atomic():
+        if level == 'manager':
+            leave_request = _lock_request(leave_request_id, ['PENDING'], 'Cette demande n\'est pas en attente')
+            leave_request.manager_rejection_reason = rejection_reason
+        else:
+            leave_request = _lock_request(
+                leave_request_id, ['MANAGER_APPROVED'], 'La demande doit être approuvée par le manager d\'abord'
+            )
+            leave_request.rh_rejection_reason = rejection_reason
+        leave_request.status = 'REJECTED'
+        leave_request.save()
+    return leave_request
+
+
+def approve_by_rh(leave_request_id, user):
+    """
+    Approbation RH : vérifie le solde et le débite dans la même transaction.
+    Le registre enregistre les jours effectivement débités (0 si la demande
+    n'est pas décomptée du solde). Retourne (demande, solde).
+    """
+    with transaction.atomic():
+        leave_request = _lock_request(
+            leave_request_id, ['MANAGER_APPROVED'], 'La demande doit être approuvée par le manager d\'abord'
+        )
+        balance = lock_balance(leave_request.employee_id)
+
+        debited = leave_request.days if counts_in_balance(leave_request) else 0
+        if debited:
+            check_balance(balance, leave_request.leave_type, debited)
+            _apply_delta(balance, leave_request.leave_type, debited)
+
+        leave_request.status = 'RH_APPROVED'
+        leave_request.rh_approval = user
+        leave_request.rh_approval_date = timezone.now()
+        leave_request.save()
+
+        LeaveTransaction.objects.create(
+            employee_id=leave_request.employee_id,
+            leave_request=leave_request,
+            leave_type=leave_request.leave_type,
+            transaction_type='APPROVAL',
+            days=debited,
+            year=leave_request.start_date.year,
+            created_by=user,
+        )
+    return leave_request, balance
+
+
+def cancel(leave_request_id, user=None):
+    """
+    Annulation : si la demande était approuvée par RH, les jours débités
+    (somme de ses mouvements du registre) sont restitués.
+    """
+    with transaction.atomic():
+        leave_request = LeaveRequest.objects.select_for_update().get(pk=leave_request_id)
+        if leave_request.status == 'CANCELLED':
+            raise LeaveWorkflowError('Cette demande est déjà annulée')
+
+        if leave_request.status == 'RH_APPROVED':
+            # Jours effectivement débités ; demandes approuvées avant la mise en place du
+            # registre : days, si la demande est décomptée du solde (recalculate_used_days)
+            debited = leave_request.transactions.aggregate(total=Sum('days'))['total']
+            if debited is None:
+                debited = leave_request.days if counts_in_balance(leave_request) else 0
+
+            if debited:
+                balance = lock_balance(leave_request.employee_id)
+                _apply_delta(balance, leave_request.leave_type, -debited)
+                LeaveTransaction.objects.create(
+                    employee_id=leave_request.employee_id,
+                    leave_request=leave_request,
+                    leave_type=leave_request.leave_type,
+                    transaction_type='CANCELLATION',
+                    days=-debited,
+                    year=leave_request.start_date.year,
+                    created_by=user,
+                )
+
+        leave_request.status = 'CANCELLED'
+        leave_request.save()
+    return leave_request
+
+
+# Transitions disponibles en masse : statut attendu, nouveau statut, message si statut incorrect
+BULK_TRANSITIONS = {
+    ('approve', 'manager'): (['PENDING'], 'MANAGER_APPROVED', 'Cette demande n\'est pas en attente'),
+    ('reject', 'manager'): (['PENDING'], 'REJECTED', 'Cette demande n\'est pas en attente'),
+    ('approve', 'rh'): (['MANAGER_APPROVED'], 'RH_APPROVED', 'La demande doit être approuvée par le manager d\'abord'),
+    ('reject', 'rh'): (['MANAGER_APPROVED'], 'REJECTED', 'La demande doit être approuvée par le manager d\'abord'),
+}
+
+
+def bulk_transition(leave_request_ids, decision, level, user, rejection_reason='', force=False):
+    """
+    Approuve ou rejette (decision) au niveau manager ou RH (level) un lot de
+    demandes dans une seule transaction.
+
+    Les demandes et, pour l'approbation RH, les soldes des employés concernés
+    sont verrouillés en deux requêtes ; les soldes sont vérifiés en mémoire
+    (plusieurs demandes d'un même employé se cumulent) puis les statuts, les
+    soldes et le registre sont écrits par bulk_update / bulk_create.
+    Une demande refusée n'empêche pas le traitement des autres. Le contrôle
+    d'effectif de l'approbation manager reste fait demande par demande, en
+    comptant les absences déjà accordées plus tôt dans le lot.
+    Retourne la liste des résultats par demande.
+    """
+    expected, new_status, status_message = BULK_TRANSITIONS[(decision, level)]
+    ids = []
+    for value in leave_request_ids:
+        if value not in ids:
+            ids.append(value)
+    now = timezone.now()
+    year = now.year
+    results = []
+
+    with transaction.atomic():
+        requests = {
+            leave_request.pk: leave_request
+            for leave_request in LeaveRequest.objects.select_for_update().filter(pk__in=ids).order_by('pk')
+        }
+
+        if (decision, level) == ('approve', 'manager') and not force:
+            lock_services({leave_request.employee_id for leave_request in requests.values()})
+
+        balances = {}
+        if (decision, level) == ('approve', 'rh'):
+            employee_ids = {leave_request.employee_id for leave_request in requests.values()}
+            LeaveBalance.objects.bulk_create(
+                [LeaveBalance(employee_id=employee_id) for employee_id in employee_ids], ignore_conflicts=True
+            )
+            balances = {
+                balance.employee_id: balance
+                for balance in LeaveBalance.objects.select_for_update().filter(employee_id__in=employee_ids).order_by('pk')
+            }
+
+        updated, changed_balances, ledger = [], {}, []
+        # Absences approuvées dans ce lot, pas encore visibles en base pour le contrôle d'effectif
+        approved_absences = []
+        for leave_request_id in ids:
+            leave_request = requests.get(leave_request_id)
+            if leave_request is None:
+                results.append({'id': leave_request_id, 'success': False, 'error': 'Demande introuvable'})
+                continue
+            try:
+                if leave_request.status not in expected:
+                    raise LeaveWorkflowError(status_message)
+
+                if (decision, level) == ('approve', 'manager'):
+                    if not force:
+                        check_staffing(leave_request, approved_absences)
+                    approved_absences.append((leave_request.employee_id, leave_request.start_date, leave_request.end_date))
+                    leave_request.manager_approval = user
+                    leave_request.manager_approval_date = now
+                elif (decision, level) == ('approve', 'rh'):
+                    debited = leave_request.days if counts_in_balance(leave_request, year) else 0
+                    if debited:
+                        balance = balances[leave_request.employee_id]
+                        check_balance(balance, leave_request.leave_type, debited)
+                        field = BALANCE_FIELDS[leave_request.leave_type]
+                        setattr(balance, field, getattr(balance, field) + debited)
+                        balance.updated_at = now
+                        changed_balances[balance.pk] = balance
+                    leave_request.rh_approval = user
+                    leave_request.rh_approval_date = now
+                    ledger.append(LeaveTransaction(
+                        employee_id=leave_request.employee_id,
+                        leave_request=leave_request,
+                        leave_type=leave_request.leave_type,
+                        transaction_type='APPROVAL',
+                        days=debited,
+                        year=leave_request.start_date.year,
+                        created_by=user,
+                    ))
+                elif level == 'manager':
+                    leave_request.manager_rejection_reason = rejection_reason
+                else:
+                    leave_request.rh_rejection_reason = rejection_reason
+            except StaffingConflictError as e:
+                results.append({'id': leave_request_id, 'success': False, 'error': str(e), 'conflicts': e.conflicts})
+                continue
+            except LeaveWorkflowError as e:
+                results.append({'id': leave_request_id, 'success': False, 'error': str(e)})
+                continue
+
+            leave_request.status = new_status
+            leave_request.updated_at = now
+            updated.append(leave_request)
+            results.append({'id': leave_request_id, 'success': True, 'status': new_status})
+
+        LeaveRequest.objects.bulk_update(updated, [
+            'status', 'manager_approval', 'manager_approval_date', 'manager_rejection_reason',
+            'rh_approval', 'rh_approval_date', 'rh_rejection_reason', 'updated_at',
+        ], batch_size=500)
+        LeaveBalance.objects.bulk_update(
+            changed_balances.values(), ['used_annual', 'used_sick', 'updated_at'], batch_size=500
+        )
+        LeaveTransaction.objects.bulk_create(ledger, batch_size=500)
+
+    # bulk_update ne déclenche pas post_save : invalider le calendrier des services concernés
+    service_ids = set(Employee.objects.filter(
+        pk__in={leave_request.employee_id for leave_request in updated}
+    ).values_list('service_id', flat=True))
+    for service_id in service_ids:
+        invalidate_leave_calendar(service_id)
+    for employee_id in {leave_request.employee_id for leave_request in updated}:
+        invalidate_dossier(employee_id, ['leave_requests'])
+    return results
+
+
+def recalculate_balances(year=None):
+    """
+    Recalcule les jours utilisés de tous les soldes à partir des demandes
+    approuvées par RH : une requête groupée par (employé, type de congé) et un
+    seul bulk_update des soldes modifiés.
+
+    LeaveBalance n'a pas d'année : il porte sur l'année en cours, seule année
+    acceptée (ValueError sinon ; une année passée se clôture avec
+    accruals.close_year). Les soldes sont verrouillés avant la lecture
+    des demandes, pour ne pas écraser un débit ou une restitution concurrents.
+    Retourne (nombre de soldes, nombre de soldes modifiés).
+    """
+    current_year = timezone.now().year
+    year = year or current_year
+    if year != current_year:
+        raise ValueError(
+            f'Les soldes portent sur l\'année en cours ({current_year}) : recalcul impossible pour {year}'
+        )
+
+    now = timezone.now()
+    with transaction.atomic():
+        balances = list(
+            LeaveBalance.objects.select_for_update().only('id', 'employee_id', 'used_annual', 'used_sick').order_by('pk')
+        )
+        used = {
+            (row['employee'], row['leave_type']): row['total']
+            for row in LeaveRequest.objects.filter(
+                status='RH_APPROVED', start_date__year=year, leave_type__in=BALANCE_FIELDS
+            ).values('employee', 'leave_type').annotate(total=Sum('days')).order_by()
+        }
+
+        changed = []
+        for balance in balances:
+            values = {field: used.get((balance.employee_id, leave_type)) or 0 for leave_type, field in BALANCE_FIELDS.items()}
+            if any(getattr(balance, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(balance, field, value)
+                balance.updated_at = now
+                changed.append(balance)
+
+        LeaveBalance.objects.bulk_update(changed, ['used_annual', 'used_sick', 'updated_at'], batch_size=500)
+    return len(balances), len(changed)
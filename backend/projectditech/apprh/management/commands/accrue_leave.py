@@ -0,0 +1,80 @@
+"""
+Commande de management pour calculer l'acquisition mensuelle des congés annuels
+Usage: python manage.py accrue_leave [--month 10 --year 2026] [--from 2026-01] [--dry-run]
+
+Avec --from, toutes les périodes depuis le mois indiqué jusqu'à --month/--year
+sont recalculées dans l'ordre (correction rétroactive, reports de janvier inclus).
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apprh.accruals import compute_accruals
+
+
+class Command(BaseCommand):
+    help = 'Calcule les jours de congés annuels acquis par tous les employés pour une période (ou rejoue des périodes passées)'
+
+    def add_arguments(self, parser):
+        today = timezone.now().date()
+        parser.add_argument(
+            '--month',
+            type=int,
+            default=today.month,
+            help='Mois de la période (défaut: mois courant)',
+        )
+        parser.add_argument(
+            '--year',
+            type=int,
+            default=today.year,
+            help='Année de la période (défaut: année courante)',
+        )
+        parser.add_argument(
+            '--from',
+            dest='replay_from',
+            help='Rejouer toutes les périodes depuis ce mois, format AAAA-MM',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Calculer sans enregistrer les acquisitions',
+        )
+
+    def handle(self, *args, **options):
+        month, year = options['month'], options['year']
+        if not 1 <= month <= 12:
+            raise CommandError('Le mois doit être compris entre 1 et 12')
+
+        periods = [(year, month)]
+        if options['replay_from']:
+            try:
+                start = datetime.strptime(options['replay_from'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('Format de période invalide (AAAA-MM)')
+            if (start.year, start.month) > (year, month):
+                raise CommandError('La période de départ doit précéder la période de fin')
+            periods = []
+            current_year, current_month = start.year, start.month
+            while (current_year, current_month) <= (year, month):
+                periods.append((current_year, current_month))
+                current_year, current_month = (current_year + 1, 1) if current_month == 12 else (current_year, current_month + 1)
+
+        for period_year, period_month in periods:
+            result = compute_accruals(period_year, period_month, dry_run=options['dry_run'])
+            if result['rule'] is None:
+                raise CommandError(f"Aucune règle d'acquisition en vigueur pour {period_month:02d}/{period_year}")
+
+            message = (
+                f"{period_month:02d}/{period_year}: {result['employees']} employé(s), {result['total_days']:.2f} j acquis "
+                f"({result['created']} créé(s), {result['updated']} modifié(s), {result['deleted']} supprimé(s)) "
+                f"en {result['elapsed_ms']} ms"
+            )
+            if period_month == 1:
+                message += f" - report: {result['carried_over']:.2f} j"
+            self.stdout.write(self.style.SUCCESS(message))
+            if result['balances_updated']:
+                self.stdout.write(f"  {result['balances_updated']} solde(s) de congés annuels mis à jour")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Mode simulation : aucune donnée enregistrée'))
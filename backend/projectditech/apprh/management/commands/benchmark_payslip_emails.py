@@ -0,0 +1,66 @@
+"""
+Micro-benchmark du rendu des emails de fiche de paie
+Usage: python manage.py benchmark_payslip_emails [--count 5000] [--repeat 3]
+"""
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from apprh.emails import render_payslip_emails
+from apprh.models import Employee, Payslip
+
+
+class Command(BaseCommand):
+    help = 'Mesure le débit de rendu des emails de fiche de paie (sans base de données ni envoi)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=5000,
+            help='Nombre de fiches de paie à rendre par passe (défaut: 5000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Nombre de passes, la meilleure est retenue (défaut: 3)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+
+        # Fiches en mémoire uniquement : on ne mesure que le rendu
+        payslips = []
+        for i in range(count):
+            employee = Employee(
+                employee_id=f'DITECH{i + 1:04d}',
+                first_name=f'Prénom{i}',
+                last_name=f'Nom{i}',
+                email=f'employe{i}@ditech.ci',
+            )
+            base_salary = Decimal(150000 + (i % 50) * 10000)
+            payslips.append(Payslip(
+                employee=employee,
+                month=(i % 12) + 1,
+                year=2026,
+                base_salary=base_salary,
+                bonuses=Decimal('25000'),
+                deductions=Decimal('12500'),
+                net_salary=base_salary + Decimal('12500'),
+            ))
+
+        timings = []
+        total_size = 0
+        for _ in range(max(options['repeat'], 1)):
+            start = time.perf_counter()
+            total_size = sum(len(body) for _, _, body in render_payslip_emails(payslips))
+            timings.append(time.perf_counter() - start)
+
+        best = min(timings)
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} emails rendus en {best:.3f}s '
+            f'({count / best:,.0f} emails/s, {best / count * 1e6:.1f} µs/email, '
+            f'{total_size / count / 1024:.1f} Ko/email)'
+        ))
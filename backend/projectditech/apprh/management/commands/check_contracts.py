@@ -1,11 +1,18 @@
 """
 Commande de management pour vérifier et gérer les contrats expirants
-Usage: python manage.py check_contracts [--auto-renew]
+Usage: python manage.py check_contracts [--auto-renew] [--days 30] [--dry-run] [--json]
+       python manage.py check_contracts --daemon [--interval 3600]
+
+Le mode --daemon relance la vérification à intervalle régulier, pour les
+serveurs sans cron (à lancer sous un superviseur : systemd, supervisord...).
 """
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from datetime import timedelta
-from apprh.models import Contract
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from apprh.contracts import check_contracts
 
 
 class Command(BaseCommand):
@@ -23,101 +30,100 @@ class Command(BaseCommand):
             default=30,
             help='Nombre de jours à l\'avance pour vérifier les contrats expirants (défaut: 30)',
         )
-
-    def handle(self, *args, **options):
-        today = timezone.now().date()
-        days_ahead = options['days']
-        future_date = today + timedelta(days=days_ahead)
-        auto_renew = options['auto_renew']
-
-        self.stdout.write(self.style.SUCCESS(f'Vérification des contrats expirant avant le {future_date}...'))
-
-        # Contrats expirants
-        expiring_contracts = Contract.objects.filter(
-            end_date__lte=future_date,
-            end_date__gte=today,
-            status='SIGNED',
-            contract_type__in=['CDD', 'STAGE', 'INTERIM']  # Exclure les CDI
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Afficher ce qui serait fait sans rien enregistrer',
         )
-
-        # Contrats expirés
-        expired_contracts = Contract.objects.filter(
-            end_date__lt=today,
-            status='SIGNED',
-            contract_type__in=['CDD', 'STAGE', 'INTERIM']
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Écrire le résultat au format JSON (supervision, scripts)',
+        )
+        parser.add_argument(
+            '--daemon',
+            action='store_true',
+            help='Relancer la vérification en boucle (serveurs sans cron)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=3600,
+            help='Intervalle en secondes entre deux vérifications en mode --daemon (défaut: 3600)',
         )
 
-        # Mettre à jour le statut des contrats expirés
-        expired_count = expired_contracts.update(status='EXPIRED')
-        if expired_count > 0:
-            self.stdout.write(self.style.WARNING(f'{expired_count} contrat(s) marqué(s) comme expiré(s)'))
-
-        # Mettre à jour le flag needs_renewal
-        for contract in expiring_contracts:
-            if not contract.needs_renewal:
-                contract.needs_renewal = True
-                contract.save()
-                self.stdout.write(
-                    self.style.WARNING(
-                        f'Contrat {contract.id} ({contract.employee.get_full_name()}) '
-                        f'expire dans {contract.days_until_expiry} jour(s) - marqué pour renouvellement'
-                    )
-                )
-
-        # Renouvellement automatique
-        if auto_renew:
-            auto_renewal_contracts = Contract.objects.filter(
-                auto_renewal=True,
-                needs_renewal=True,
-                status='SIGNED',
-                contract_type__in=['CDD', 'STAGE', 'INTERIM']
-            )
-
-            renewed_count = 0
-            for contract in auto_renewal_contracts:
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days doit être positif')
+        if options['interval'] < 1:
+            raise CommandError('--interval doit être d\'au moins 1 seconde')
+
+        if not options['daemon']:
+            self._run(options)
+            return
+
+        if not options['json']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Mode daemon : vérification toutes les {options['interval']} s (Ctrl+C pour arrêter)"
+            ))
+        try:
+            while True:
+                # Une connexion gardée ouverte entre deux passes peut avoir été fermée par le serveur
+                close_old_connections()
                 try:
-                    # Vérifier qu'il n'y a pas déjà un renouvellement
-                    if contract.renewals.exists():
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f'Contrat {contract.id} a déjà un renouvellement - ignoré'
-                            )
-                        )
-                        continue
-
-                    # Créer le renouvellement
-                    renewal = contract.create_renewal(created_by=None)
-                    renewed_count += 1
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'Renouvellement automatique créé pour le contrat {contract.id} '
-                            f'({contract.employee.get_full_name()}) - Nouveau contrat: {renewal.id}'
-                        )
-                    )
+                    self._run(options)
                 except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f'Erreur lors du renouvellement du contrat {contract.id}: {str(e)}'
-                        )
-                    )
-
-            if renewed_count > 0:
-                self.stdout.write(
-                    self.style.SUCCESS(f'{renewed_count} contrat(s) renouvelé(s) automatiquement')
-                )
+                    self.stderr.write(self.style.ERROR(f'Erreur lors de la vérification des contrats: {e}'))
+                close_old_connections()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Arrêt du mode daemon')
+
+    def _run(self, options):
+        result = check_contracts(
+            days_ahead=options['days'],
+            auto_renew=options['auto_renew'],
+            dry_run=options['dry_run'],
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, ensure_ascii=False))
+            return
+
+        prefix = '[simulation] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Vérification des contrats expirant avant le {result['until']}..."
+        ))
+
+        if result['expired']:
+            self.stdout.write(self.style.WARNING(f"{prefix}{result['expired']} contrat(s) marqué(s) comme expiré(s)"))
+
+        for contract in result['flagged']:
+            self.stdout.write(self.style.WARNING(
+                f"{prefix}Contrat {contract['id']} ({contract['employee']}) "
+                f"expire dans {contract['days_until_expiry']} jour(s) - marqué pour renouvellement"
+            ))
+
+        if options['auto_renew']:
+            if result['already_renewed']:
+                self.stdout.write(self.style.WARNING(
+                    f"{result['already_renewed']} contrat(s) déjà renouvelé(s) - ignoré(s)"
+                ))
+            if result['renewed']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{prefix}{result['renewed']} contrat(s) renouvelé(s) automatiquement"
+                ))
             else:
                 self.stdout.write('Aucun contrat à renouveler automatiquement')
 
-        # Résumé
-        expiring_count = expiring_contracts.count()
-        expired_count = expired_contracts.count()
-
         self.stdout.write(self.style.SUCCESS('\n=== Résumé ==='))
-        self.stdout.write(f'Contrats expirants ({days_ahead} jours): {expiring_count}')
-        self.stdout.write(f'Contrats expirés: {expired_count}')
-        self.stdout.write(f'Total nécessitant attention: {expiring_count + expired_count}')
+        self.stdout.write(f"Contrats expirants ({options['days']} jours): {result['expiring']}")
+        self.stdout.write(f"Dont nouvellement marqués pour renouvellement: {len(result['flagged'])}")
+        self.stdout.write(f"Contrats expirés: {result['expired']}")
+        self.stdout.write(f"Total nécessitant attention: {result['attention']}")
+        self.stdout.write(f"Durée: {result['elapsed_ms']} ms")
 
-        if not auto_renew:
+        if not options['auto_renew']:
             self.stdout.write(
                 self.style.WARNING(
                     '\nPour créer des renouvellements automatiques, utilisez: python manage.py check_contracts --auto-renew'
@@ -0,0 +1,62 @@
+"""
+Commande de management pour calculer les cotisations (CNPS, ITS...) d'une période de paie
+Usage: python manage.py compute_contributions --month 10 --year 2026 [--dry-run]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apprh.payroll import compute_contributions, contribution_declaration
+
+
+class Command(BaseCommand):
+    help = 'Calcule en une passe les cotisations salariales et patronales de toutes les fiches de paie d\'une période'
+
+    def add_arguments(self, parser):
+        today = timezone.now().date()
+        parser.add_argument(
+            '--month',
+            type=int,
+            default=today.month,
+            help='Mois de la période (défaut: mois courant)',
+        )
+        parser.add_argument(
+            '--year',
+            type=int,
+            default=today.year,
+            help='Année de la période (défaut: année courante)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Calculer sans enregistrer les cotisations',
+        )
+
+    def handle(self, *args, **options):
+        month, year = options['month'], options['year']
+        if not 1 <= month <= 12:
+            raise CommandError('Le mois doit être compris entre 1 et 12')
+
+        result = compute_contributions(month, year, dry_run=options['dry_run'])
+        if not result['rates']:
+            raise CommandError(f'Aucun barème de cotisation en vigueur pour {month:02d}/{year}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['payslips']} fiche(s) traitée(s) pour {month:02d}/{year} en {result['elapsed_ms']} ms"
+        ))
+        if result['skipped_paid']:
+            self.stdout.write(self.style.WARNING(f"{result['skipped_paid']} fiche(s) déjà payée(s) ignorée(s)"))
+
+        for code, totals in result['totals'].items():
+            self.stdout.write(
+                f"  {code:<20} salarial: {totals['employee']:>15,.0f}  patronal: {totals['employer']:>15,.0f}"
+            )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Mode simulation : aucune donnée enregistrée'))
+            return
+
+        declaration = contribution_declaration(month, year)
+        self.stdout.write(self.style.SUCCESS(
+            f"Déclaration: {declaration['employee_total']:,.0f} (salarial) + "
+            f"{declaration['employer_total']:,.0f} (patronal) = {declaration['total']:,.0f} FCFA"
+        ))
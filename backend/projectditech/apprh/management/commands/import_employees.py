@@ -0,0 +1,63 @@
+"""
+Commande de management pour importer des employés depuis un fichier CSV ou XLSX
+Usage: python manage.py import_employees employes.xlsx [--dry-run] [--json]
+
+Toutes les lignes sont validées avant l'enregistrement : en cas d'erreur,
+aucun employé n'est créé et les erreurs sont listées par ligne.
+"""
+import json
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from apprh.imports import iter_import_rows, ImportFileError
+from apprh.onboarding import import_employees
+
+
+class Command(BaseCommand):
+    help = 'Importe des employés (et leurs comptes utilisateurs) depuis un fichier CSV ou XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Fichier CSV ou XLSX à importer')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Valider le fichier sans rien enregistrer',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Écrire le résultat au format JSON',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'Fichier introuvable : {path}')
+
+        with open(path, 'rb') as handle:
+            try:
+                result = import_employees(
+                    iter_import_rows(File(handle, name=os.path.basename(path))),
+                    dry_run=options['dry_run'],
+                )
+            except ImportFileError as e:
+                raise CommandError(str(e))
+            except ImportError:
+                raise CommandError('openpyxl n\'est pas installé. Installez-le avec: pip install openpyxl')
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, ensure_ascii=False))
+            return
+
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"Ligne {error['line']}: {' ; '.join(error['errors'])}"))
+
+        summary = f"{result['rows']} ligne(s) en {result['elapsed_ms']} ms ({result['rows_per_second']} lignes/s)"
+        if result['errors']:
+            raise CommandError(f"{len(result['errors'])} erreur(s), aucun employé créé - {summary}")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Mode simulation : fichier valide, aucune donnée enregistrée - {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{result['created']} employé(s) créé(s) - {summary}"))
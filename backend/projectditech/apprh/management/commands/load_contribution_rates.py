@@ -0,0 +1,103 @@
+"""
+Commande de management pour charger les barèmes de cotisation par défaut (Côte d'Ivoire)
+Usage: python manage.py load_contribution_rates [--effective-from 2024-01-01]
+
+Les taux et plafonds sont donnés à titre indicatif : ils doivent être vérifiés
+par le service RH et ajustés dans l'administration (une nouvelle version du
+barème avec une date d'effet postérieure remplace l'ancienne).
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apprh.models import ContributionRate, ContributionBracket
+
+
+DEFAULT_RATES = [
+    {
+        'code': 'CNPS_RETRAITE',
+        'name': 'CNPS - Retraite',
+        'deduction_type': 'RETIREMENT',
+        'employee_rate': Decimal('6.3'),
+        'employer_rate': Decimal('7.7'),
+        'ceiling': Decimal('3375000'),
+    },
+    {
+        'code': 'CNPS_PF',
+        'name': 'CNPS - Prestations familiales',
+        'deduction_type': 'SOCIAL_SECURITY',
+        'employer_rate': Decimal('5'),
+        'ceiling': Decimal('75000'),
+    },
+    {
+        'code': 'CNPS_AM',
+        'name': 'CNPS - Assurance maternité',
+        'deduction_type': 'SOCIAL_SECURITY',
+        'employer_rate': Decimal('0.75'),
+        'ceiling': Decimal('75000'),
+    },
+    {
+        'code': 'CNPS_AT',
+        'name': 'CNPS - Accidents du travail',
+        'deduction_type': 'SOCIAL_SECURITY',
+        'employer_rate': Decimal('2'),
+        'ceiling': Decimal('75000'),
+    },
+    {
+        'code': 'ITS',
+        'name': 'Impôt sur les traitements et salaires',
+        'deduction_type': 'TAX',
+        'employer_rate': Decimal('1.2'),
+        'is_progressive': True,
+        'brackets': [
+            (Decimal('0'), Decimal('75000'), Decimal('0')),
+            (Decimal('75000'), Decimal('240000'), Decimal('16')),
+            (Decimal('240000'), Decimal('800000'), Decimal('21')),
+            (Decimal('800000'), Decimal('2400000'), Decimal('24')),
+            (Decimal('2400000'), Decimal('8000000'), Decimal('28')),
+            (Decimal('8000000'), None, Decimal('32')),
+        ],
+    },
+]
+
+
+class Command(BaseCommand):
+    help = 'Charge les barèmes de cotisation par défaut (CNPS, ITS) s\'ils n\'existent pas encore'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--effective-from',
+            default='2024-01-01',
+            help='Date d\'effet des barèmes chargés, format AAAA-MM-JJ (défaut: 2024-01-01)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            effective_from = datetime.strptime(options['effective_from'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('Format de date invalide (AAAA-MM-JJ)')
+
+        created = 0
+        with transaction.atomic():
+            for definition in DEFAULT_RATES:
+                definition = dict(definition)
+                brackets = definition.pop('brackets', [])
+                rate, was_created = ContributionRate.objects.get_or_create(
+                    code=definition.pop('code'),
+                    effective_from=effective_from,
+                    defaults=definition,
+                )
+                if not was_created:
+                    self.stdout.write(self.style.WARNING(f'{rate.code}: barème déjà présent, ignoré'))
+                    continue
+                ContributionBracket.objects.bulk_create([
+                    ContributionBracket(contribution_rate=rate, lower_bound=lower, upper_bound=upper, rate=percentage)
+                    for lower, upper, percentage in brackets
+                ])
+                created += 1
+                self.stdout.write(f'{rate.code}: barème créé')
+
+        self.stdout.write(self.style.SUCCESS(f'{created} barème(s) chargé(s) avec effet au {effective_from}'))
+        self.stdout.write(self.style.WARNING('Vérifiez les taux et plafonds dans l\'administration avant le premier calcul de paie'))
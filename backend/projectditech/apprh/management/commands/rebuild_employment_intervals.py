@@ -0,0 +1,22 @@
+"""
+Commande de management pour reconstruire les périodes d'emploi des employés
+Usage: python manage.py rebuild_employment_intervals
+
+La migration 0020 construit les périodes initiales ; à relancer après des
+modifications faites hors de l'ORM (update() ensembliste, import SQL...).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apprh.workforce import rebuild_intervals
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les périodes d\'emploi (effectif, embauches, sorties) depuis les employés et leur historique'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_intervals()
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.stdout.write(self.style.SUCCESS(f"{count} période(s) d'emploi écrite(s) en {elapsed_ms} ms"))
@@ -0,0 +1,25 @@
+"""
+Commande de management pour reconstruire l'index de recherche globale
+Usage: python manage.py rebuild_search_index
+
+La migration 0018 construit l'index initial ; à relancer après des
+modifications faites hors de l'ORM (update() ensembliste, import SQL...).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apprh.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit l\'index de recherche globale (employés, candidats, documents)'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            counts = rebuild_index()
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        details = ', '.join(f'{kind.lower()}: {count}' for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"{sum(counts.values())} entrée(s) indexée(s) ({details}) en {elapsed_ms} ms"))
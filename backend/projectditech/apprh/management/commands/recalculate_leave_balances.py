@@ -0,0 +1,48 @@
+"""
+Commande de management pour recalculer les soldes de congés de tous les employés
+Usage: python manage.py recalculate_leave_balances [--year 2025]
+
+Pour une année passée, la commande clôture l'année (jours utilisés et report
+sur l'année suivante) sans modifier les soldes de l'année en cours.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apprh.accruals import close_year
+from apprh.leaves import recalculate_balances
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les jours de congés utilisés de tous les soldes à partir des demandes approuvées par RH'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--year',
+            type=int,
+            default=timezone.now().year,
+            help='Année des demandes prises en compte (défaut: année courante ; année passée: clôture et report)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        year = options['year']
+        if year < timezone.now().year:
+            result = close_year(year)
+            self.stdout.write(self.style.SUCCESS(
+                f"{year} clôturée : {result['employees']} employé(s), {result['used_annual']} j de congés annuels "
+                f"et {result['used_sick']} j de maladie utilisés, {result['carried_over']:.2f} j reportés sur {year + 1} "
+                f"({result['created']} créé(s), {result['updated']} modifié(s)) en {result['elapsed_ms']} ms"
+            ))
+            return
+
+        try:
+            total_count, updated_count = recalculate_balances(options['year'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total_count} solde(s) vérifié(s), {updated_count} mis à jour pour {options["year"]} en {elapsed:.2f}s'
+        ))
@@ -0,0 +1,115 @@
+"""
+Commande de management pour vérifier le registre des congés par rapport aux demandes
+Usage: python manage.py reconcile_leave_ledger [--year 2026] [--fix]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apprh.leaves import BALANCE_FIELDS
+from apprh.models import LeaveRequest, LeaveBalance, LeaveTransaction
+
+
+class Command(BaseCommand):
+    help = 'Compare le registre des congés (LeaveTransaction) et les soldes aux demandes approuvées par RH'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--year',
+            type=int,
+            default=timezone.now().year,
+            help='Année à vérifier (défaut: année courante)',
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Corriger les écarts : mouvements d\'ajustement dans le registre et soldes de l\'année courante',
+        )
+
+    def handle(self, *args, **options):
+        year = options['year']
+        is_current_year = year == timezone.now().year
+
+        # Jours approuvés par RH, par demande (référence)
+        approved = {
+            leave_request_id: (employee_id, leave_type, days)
+            for leave_request_id, employee_id, leave_type, days in LeaveRequest.objects.filter(
+                status='RH_APPROVED', start_date__year=year, leave_type__in=BALANCE_FIELDS
+            ).values_list('id', 'employee_id', 'leave_type', 'days')
+        }
+        expected = {}
+        for employee_id, leave_type, days in approved.values():
+            expected[(employee_id, leave_type)] = expected.get((employee_id, leave_type), 0) + days
+
+        # Registre de la même année, par demande : (employé, type, demande) ; demande None
+        # pour les mouvements non rattachés (ajustements des anciennes réconciliations)
+        ledger = {
+            (row['employee_id'], row['leave_type'], row['leave_request_id']): row['total'] or 0
+            for row in LeaveTransaction.objects.filter(
+                year=year, leave_type__in=BALANCE_FIELDS
+            ).values('employee_id', 'leave_type', 'leave_request_id').annotate(total=Sum('days')).order_by()
+        }
+        for leave_request_id, (employee_id, leave_type, _) in approved.items():
+            ledger.setdefault((employee_id, leave_type, leave_request_id), 0)
+
+        # Chaque écart est rattaché à sa demande : une annulation restitue ensuite
+        # exactement les jours du registre de la demande
+        ledger_gaps = {}
+        for (employee_id, leave_type, leave_request_id), recorded in ledger.items():
+            should_be = approved[leave_request_id][2] if leave_request_id in approved else 0
+            if should_be != recorded:
+                ledger_gaps[(employee_id, leave_type, leave_request_id)] = (should_be, recorded)
+
+        balance_gaps = []
+        if is_current_year:
+            for balance in LeaveBalance.objects.only('id', 'employee_id', 'used_annual', 'used_sick'):
+                for leave_type, field in BALANCE_FIELDS.items():
+                    should_be = expected.get((balance.employee_id, leave_type), 0)
+                    if getattr(balance, field) != should_be:
+                        balance_gaps.append((balance, field, getattr(balance, field), should_be))
+
+        for (employee_id, leave_type, leave_request_id), (should_be, recorded) in sorted(
+            ledger_gaps.items(), key=lambda item: (item[0][0], item[0][1], item[0][2] or 0)
+        ):
+            request_label = f'demande #{leave_request_id}' if leave_request_id else 'mouvements non rattachés'
+            self.stdout.write(self.style.WARNING(
+                f'Registre - employé #{employee_id} {leave_type} ({request_label}): '
+                f'{recorded} j enregistrés, {should_be} j approuvés'
+            ))
+        for balance, field, recorded, should_be in balance_gaps:
+            self.stdout.write(self.style.WARNING(
+                f'Solde - employé #{balance.employee_id} {field}: {recorded} j, attendu {should_be} j'
+            ))
+
+        if not ledger_gaps and not balance_gaps:
+            self.stdout.write(self.style.SUCCESS(f'Registre des congés {year} cohérent avec les demandes'))
+            return
+
+        self.stdout.write(self.style.WARNING(
+            f'{len(ledger_gaps)} écart(s) dans le registre, {len(balance_gaps)} écart(s) de solde pour {year}'
+        ))
+        if not options['fix']:
+            self.stdout.write('Relancez avec --fix pour corriger')
+            return
+
+        with transaction.atomic():
+            LeaveTransaction.objects.bulk_create([
+                LeaveTransaction(
+                    employee_id=employee_id,
+                    leave_request_id=leave_request_id,
+                    leave_type=leave_type,
+                    transaction_type='ADJUSTMENT',
+                    days=should_be - recorded,
+                    year=year,
+                    description='Ajustement de réconciliation',
+                )
+                for (employee_id, leave_type, leave_request_id), (should_be, recorded) in ledger_gaps.items()
+            ])
+            for balance, field, _, should_be in balance_gaps:
+                setattr(balance, field, should_be)
+            LeaveBalance.objects.bulk_update(
+                {balance for balance, *_ in balance_gaps}, ['used_annual', 'used_sick'], batch_size=500
+            )
+
+        self.stdout.write(self.style.SUCCESS('Écarts corrigés'))
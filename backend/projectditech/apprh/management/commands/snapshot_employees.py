@@ -0,0 +1,26 @@
+"""
+Commande de management pour écrire les points de reprise de l'état des employés
+Usage: python manage.py snapshot_employees
+
+À planifier périodiquement (par exemple le 1er de chaque mois) : l'état d'un
+employé à une date (apprh/timeline.py) part du point de reprise le plus proche
+au lieu de rejouer tout l'historique. Seuls les employés dont l'état a changé
+depuis leur dernier point de reprise reçoivent un nouveau point.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apprh.timeline import take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Écrit un point de reprise de l\'état des employés modifiés depuis le précédent'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count, written = take_snapshots()
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.stdout.write(self.style.SUCCESS(
+            f"{written} point(s) de reprise écrit(s) pour {count} employé(s) en {elapsed_ms} ms"
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apprh', '0010_employee_social_security_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='bank_account_number',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Numéro de compte (RIB)'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='bank_name',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Banque'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='mobile_money_number',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Numéro Mobile Money'),
+        ),
+    ]
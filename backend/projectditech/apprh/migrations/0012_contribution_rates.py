@@ -0,0 +1,77 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apprh', '0011_employee_payment_details'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContributionRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=30, verbose_name='Code')),
+                ('name', models.CharField(max_length=100, verbose_name='Libellé')),
+                ('deduction_type', models.CharField(choices=[('TAX', 'Impôt'), ('SOCIAL_SECURITY', 'Sécurité sociale'), ('INSURANCE', 'Assurance'), ('RETIREMENT', 'Retraite'), ('LOAN', 'Prêt'), ('ADVANCE', 'Avance'), ('ABSENCE', 'Absence'), ('LATE', 'Retard'), ('OTHER', 'Autre')], default='SOCIAL_SECURITY', max_length=20, verbose_name='Type de retenue')),
+                ('base', models.CharField(choices=[('GROSS', 'Salaire brut'), ('BASE', 'Salaire de base')], default='GROSS', max_length=10, verbose_name='Assiette')),
+                ('base_ratio', models.DecimalField(decimal_places=4, default=1, max_digits=5, verbose_name="Part de l'assiette soumise")),
+                ('ceiling', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Plafond mensuel')),
+                ('employee_rate', models.DecimalField(decimal_places=3, default=0, max_digits=6, verbose_name='Taux salarial (%)')),
+                ('employer_rate', models.DecimalField(decimal_places=3, default=0, max_digits=6, verbose_name='Taux patronal (%)')),
+                ('is_progressive', models.BooleanField(default=False, verbose_name='Barème progressif (par tranches)')),
+                ('effective_from', models.DateField(verbose_name='En vigueur à partir du')),
+                ('effective_to', models.DateField(blank=True, null=True, verbose_name="En vigueur jusqu'au")),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Barème de cotisation',
+                'verbose_name_plural': 'Barèmes de cotisation',
+                'ordering': ['code', '-effective_from'],
+                'unique_together': {('code', 'effective_from')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ContributionBracket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lower_bound', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Borne inférieure')),
+                ('upper_bound', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Borne supérieure')),
+                ('rate', models.DecimalField(decimal_places=3, max_digits=6, verbose_name='Taux (%)')),
+                ('contribution_rate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='brackets', to='apprh.contributionrate')),
+            ],
+            options={
+                'verbose_name': 'Tranche de barème',
+                'verbose_name_plural': 'Tranches de barème',
+                'ordering': ['contribution_rate', 'lower_bound'],
+            },
+        ),
+        migrations.AddField(
+            model_name='payslipdeduction',
+            name='contribution_rate',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='deductions', to='apprh.contributionrate', verbose_name='Barème de cotisation'),
+        ),
+        migrations.CreateModel(
+            name='PayslipContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Assiette')),
+                ('employee_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Part salariale')),
+                ('employer_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Part patronale')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('contribution_rate', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payslip_contributions', to='apprh.contributionrate')),
+                ('payslip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contributions', to='apprh.payslip')),
+            ],
+            options={
+                'verbose_name': 'Cotisation de fiche de paie',
+                'verbose_name_plural': 'Cotisations de fiches de paie',
+                'unique_together': {('payslip', 'contribution_rate')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apprh', '0012_contribution_rates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('leave_type', models.CharField(choices=[('ANNUAL', 'Congé annuel'), ('SICK', 'Congé maladie'), ('PERSONAL', 'Congé personnel'), ('MATERNITY', 'Congé maternité'), ('PATERNITY', 'Congé paternité'), ('UNPAID', 'Congé sans solde')], max_length=20)),
+                ('transaction_type', models.CharField(choices=[('APPROVAL', 'Approbation'), ('CANCELLATION', 'Annulation'), ('ADJUSTMENT', 'Ajustement')], max_length=20)),
+                ('days', models.IntegerField(help_text='Jours consommés (positif) ou restitués (négatif)')),
+                ('year', models.IntegerField(verbose_name='Année du congé')),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_transactions', to='apprh.employee')),
+                ('leave_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='apprh.leaverequest')),
+            ],
+            options={
+                'verbose_name': 'Mouvement de congés',
+                'verbose_name_plural': 'Mouvements de congés',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['employee', 'year', 'leave_type'], name='apprh_leave_employe_9fc331_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apprh', '0014_leaverequest_calendar_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='min_staff_present',
+            field=models.PositiveIntegerField(blank=True, help_text="Nombre minimum d'employés présents chaque jour ouvré (vide: pas de contrôle des congés)", null=True, verbose_name='Effectif minimum présent'),
+        ),
+    ]
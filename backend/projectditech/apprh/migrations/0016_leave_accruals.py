@@ -0,0 +1,69 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:20
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apprh', '0015_service_min_staff_present'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveAccrualRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Libellé')),
+                ('monthly_days', models.DecimalField(decimal_places=2, default=Decimal('2.08'), max_digits=5, verbose_name='Jours acquis par mois')),
+                ('carry_over_cap', models.DecimalField(blank=True, decimal_places=2, help_text='Jours non pris reportables au 1er janvier (vide: pas de plafond, 0: pas de report)', max_digits=5, null=True, verbose_name="Report maximum sur l'année suivante")),
+                ('effective_from', models.DateField(verbose_name='En vigueur à partir du')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': "Règle d'acquisition des congés",
+                'verbose_name_plural': "Règles d'acquisition des congés",
+                'ordering': ['-effective_from'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaveAccrual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField(help_text="1 à 12, 0 pour le report de l'année précédente")),
+                ('days', models.DecimalField(decimal_places=2, max_digits=6, verbose_name='Jours acquis')),
+                ('seniority_days', models.DecimalField(decimal_places=2, default=0, max_digits=6, verbose_name='Dont ancienneté')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_accruals', to='apprh.employee')),
+                ('rule', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='accruals', to='apprh.leaveaccrualrule')),
+            ],
+            options={
+                'verbose_name': 'Acquisition de congés',
+                'verbose_name_plural': 'Acquisitions de congés',
+                'ordering': ['-year', '-month'],
+                'indexes': [models.Index(fields=['year', 'month'], name='apprh_leave_year_c8ced6_idx')],
+                'unique_together': {('employee', 'year', 'month')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaveSeniorityTier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_years', models.PositiveIntegerField(verbose_name='Ancienneté minimum (années)')),
+                ('extra_days', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Jours supplémentaires par an')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seniority_tiers', to='apprh.leaveaccrualrule')),
+            ],
+            options={
+                'verbose_name': "Palier d'ancienneté",
+                'verbose_name_plural': "Paliers d'ancienneté",
+                'ordering': ['rule', 'min_years'],
+                'unique_together': {('rule', 'min_years')},
+            },
+        ),
+    ]
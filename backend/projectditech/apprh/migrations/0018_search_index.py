@@ -0,0 +1,111 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:25
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+
+# PostgreSQL : vecteur plein texte calculé par la base (colonne générée) et
+# index trigrammes pour la recherche approximative sur les noms et identifiants
+POSTGRESQL_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    """
+    ALTER TABLE apprh_searchentry ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(identifiers, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(subtitle, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX apprh_searchentry_vector_gin ON apprh_searchentry USING gin (search_vector)',
+    'CREATE INDEX apprh_searchentry_title_trgm ON apprh_searchentry USING gin (title gin_trgm_ops)',
+    'CREATE INDEX apprh_searchentry_identifiers_trgm ON apprh_searchentry USING gin (identifiers gin_trgm_ops)',
+]
+
+# SQLite (développement) : table FTS5 à contenu externe synchronisée par triggers
+SQLITE_SQL = [
+    """
+    CREATE VIRTUAL TABLE apprh_searchentry_fts USING fts5(
+        title, subtitle, identifiers, body,
+        content='apprh_searchentry', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER apprh_searchentry_fts_insert AFTER INSERT ON apprh_searchentry BEGIN
+        INSERT INTO apprh_searchentry_fts (rowid, title, subtitle, identifiers, body)
+        VALUES (new.id, new.title, new.subtitle, new.identifiers, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER apprh_searchentry_fts_delete AFTER DELETE ON apprh_searchentry BEGIN
+        INSERT INTO apprh_searchentry_fts (apprh_searchentry_fts, rowid, title, subtitle, identifiers, body)
+        VALUES ('delete', old.id, old.title, old.subtitle, old.identifiers, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER apprh_searchentry_fts_update AFTER UPDATE ON apprh_searchentry BEGIN
+        INSERT INTO apprh_searchentry_fts (apprh_searchentry_fts, rowid, title, subtitle, identifiers, body)
+        VALUES ('delete', old.id, old.title, old.subtitle, old.identifiers, old.body);
+        INSERT INTO apprh_searchentry_fts (rowid, title, subtitle, identifiers, body)
+        VALUES (new.id, new.title, new.subtitle, new.identifiers, new.body);
+    END
+    """,
+]
+
+
+def create_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRESQL_SQL:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        try:
+            for sql in SQLITE_SQL:
+                schema_editor.execute(sql)
+        except OperationalError:
+            # SQLite compilé sans FTS5 : la recherche utilise des filtres icontains
+            pass
+
+
+def populate_search_index(apps, schema_editor):
+    """Index initial des employés, candidats et documents existants"""
+    from apprh.search import rebuild_index
+    rebuild_index(apps=apps)
+
+
+def drop_search_backend(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS apprh_searchentry_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apprh', '0017_idsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='extracted_text',
+            field=models.TextField(blank=True, verbose_name='Texte extrait (OCR)'),
+        ),
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('EMPLOYEE', 'Employé'), ('CANDIDATE', 'Candidat'), ('DOCUMENT', 'Document')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+                ('identifiers', models.CharField(blank=True, help_text='Matricule, badge, CNPS, email...', max_length=255)),
+                ('body', models.TextField(blank=True, help_text='Texte long : notes, description, texte extrait')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Entrée de recherche',
+                'verbose_name_plural': 'Entrées de recherche',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_entry')],
+            },
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
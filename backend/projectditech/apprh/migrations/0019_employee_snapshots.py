@@ -0,0 +1,40 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apprh', '0018_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('values', models.JSONField(default=dict, help_text='Valeur affichée de chaque champ suivi')),
+            ],
+            options={
+                'verbose_name': 'Point de reprise employé',
+                'verbose_name_plural': 'Points de reprise employés',
+                'ordering': ['-taken_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='employeehistory',
+            index=models.Index(fields=['employee', 'field_name', 'changed_at'], name='apprh_emplo_employe_7ddb86_idx'),
+        ),
+        migrations.AddField(
+            model_name='employeesnapshot',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='apprh.employee'),
+        ),
+        migrations.AddIndex(
+            model_name='employeesnapshot',
+            index=models.Index(fields=['employee', 'taken_at'], name='apprh_emplo_employe_18bfbd_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_intervals(apps, schema_editor):
+    """Périodes d'emploi initiales des employés existants"""
+    from apprh.workforce import rebuild_intervals
+    rebuild_intervals(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apprh', '0019_employee_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmploymentInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, help_text='Date de sortie (exclue de la période)', null=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='employment_intervals', to='apprh.employee')),
+            ],
+            options={
+                'verbose_name': "Période d'emploi",
+                'verbose_name_plural': "Périodes d'emploi",
+                'ordering': ['employee', 'start_date'],
+                'indexes': [models.Index(fields=['start_date', 'end_date'], name='apprh_emplo_start_d_814379_idx'), models.Index(fields=['end_date'], name='apprh_emplo_end_dat_ee6b29_idx')],
+            },
+        ),
+        migrations.RunPython(populate_intervals, migrations.RunPython.noop),
+    ]
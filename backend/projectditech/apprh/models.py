@@ -3,6 +3,7 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
 
 
 class User(AbstractUser):
@@ -37,12 +38,32 @@ class Service(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     manager = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='managed_services')
+    min_staff_present = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Effectif minimum présent',
+        help_text='Nombre minimum d\'employés présents chaque jour ouvré (vide: pas de contrôle des congés)'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return self.name
 
 
+class IdSequence(models.Model):
+    """Compteur nommé pour les identifiants métier (matricules DITECHnnnn...), voir apprh/sequences.py"""
+    name = models.CharField(max_length=50, unique=True)
+    last_value = models.BigIntegerField(default=0, verbose_name='Dernière valeur attribuée')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Séquence d\'identifiants'
+        verbose_name_plural = 'Séquences d\'identifiants'
+    
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+
 class Employee(models.Model):
     GENDER_CHOICES = [
         ('M', 'Masculin'),
@@ -98,6 +119,10 @@ class Employee(models.Model):
     is_part_time = models.BooleanField(default=False, verbose_name='Temps partiel')
     contract_specific_other = models.CharField(max_length=200, blank=True, verbose_name='Autre (contrat spécifique)')
     salary = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Coordonnées de paiement (fichiers de virement)
+    bank_name = models.CharField(max_length=100, blank=True, verbose_name='Banque')
+    bank_account_number = models.CharField(max_length=50, blank=True, verbose_name='Numéro de compte (RIB)')
+    mobile_money_number = models.CharField(max_length=20, blank=True, verbose_name='Numéro Mobile Money')
     photo = models.ImageField(upload_to='employees/', blank=True, null=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -109,32 +134,33 @@ class Employee(models.Model):
     def save(self, *args, **kwargs):
         # Toujours forcer l'ID au format DITECH
         # Si l'ID n'existe pas ou ne commence pas par DITECH, le régénérer
-        if not self.employee_id or not self.employee_id.startswith('DITECH'):
-            # Trouver le dernier ID DITECH pour générer le suivant
-            last_employee = Employee.objects.filter(employee_id__startswith='DITECH').order_by('employee_id').last()
-            if last_employee and last_employee.employee_id.startswith('DITECH'):
-                try:
-                    # Extraire le numéro de l'ID (après "DITECH")
-                    last_id_num = int(last_employee.employee_id[6:])  # "DITECH" = 6 caractères
-                    new_id_num = last_id_num + 1
-                except (ValueError, IndexError):
-                    # Si erreur de parsing, chercher le maximum
-                    try:
-                        all_ditech_ids = Employee.objects.filter(employee_id__startswith='DITECH').values_list('employee_id', flat=True)
-                        if all_ditech_ids:
-                            max_id_num = max([int(id[6:]) for id in all_ditech_ids if len(id) > 6 and id[6:].isdigit()])
-                            new_id_num = max_id_num + 1
-                        else:
-                            new_id_num = 1
-                    except (ValueError, IndexError):
-                        new_id_num = Employee.objects.count() + 1
-            else:
-                # Aucun employé DITECH trouvé, commencer à 1
-                new_id_num = 1
-            
-            self.employee_id = f"DITECH{new_id_num:04d}"
+        from .sequences import EMPLOYEE_ID_PREFIX, next_employee_id, reserve_employee_id
+        if not self.employee_id or not self.employee_id.startswith(EMPLOYEE_ID_PREFIX):
+            # Numéro suivant pris dans la séquence (verrouillée), sans parcourir les matricules existants
+            self.employee_id = next_employee_id()
+        elif self._state.adding:
+            # Matricule fourni explicitement : la séquence ne doit pas le réattribuer
+            reserve_employee_id(self.employee_id)
         super().save(*args, **kwargs)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valeurs chargées : état de référence de l'historique (apprh.history), sans relecture à la sauvegarde
+        from .history import take_snapshot
+        take_snapshot(instance, dict(zip(field_names, values)))
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        from .history import take_snapshot
+        deferred = self.get_deferred_fields()
+        take_snapshot(self, {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred and (fields is None or field.name in fields or field.attname in fields)
+        })
+    
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}"
     
@@ -166,11 +192,64 @@ class EmployeeHistory(models.Model):
         ordering = ['-changed_at']
         verbose_name = 'Historique des changements'
         verbose_name_plural = 'Historiques des changements'
+        indexes = [
+            # État à une date : première/dernière modification d'un champ autour de la date
+            models.Index(fields=['employee', 'field_name', 'changed_at']),
+        ]
     
     def __str__(self):
         return f"{self.employee} - {self.get_change_type_display()} - {self.changed_at.strftime('%Y-%m-%d %H:%M')}"
 
 
+class EmployeeSnapshot(models.Model):
+    """
+    Point de reprise de l'état d'un employé (champs suivis par l'historique,
+    valeurs au format de EmployeeHistory), écrit périodiquement par la commande
+    snapshot_employees : l'état à une date part du point de reprise le plus
+    proche au lieu de rejouer tout l'historique (voir apprh/timeline.py).
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='snapshots')
+    taken_at = models.DateTimeField()
+    values = models.JSONField(default=dict, help_text='Valeur affichée de chaque champ suivi')
+    
+    class Meta:
+        ordering = ['-taken_at']
+        verbose_name = 'Point de reprise employé'
+        verbose_name_plural = 'Points de reprise employés'
+        indexes = [
+            models.Index(fields=['employee', 'taken_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.employee} - {self.taken_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+
+class EmploymentInterval(models.Model):
+    """
+    Période d'emploi d'un employé : de l'embauche (ou réintégration) à la
+    sortie (date_of_exit ou désactivation enregistrée dans l'historique),
+    end_date vide tant que l'employé est en poste. L'employé compte dans
+    l'effectif d'un jour J si start_date <= J < end_date. Tenue à jour par
+    apprh/workforce.py.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='employment_intervals')
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True, help_text='Date de sortie (exclue de la période)')
+    
+    class Meta:
+        ordering = ['employee', 'start_date']
+        verbose_name = 'Période d\'emploi'
+        verbose_name_plural = 'Périodes d\'emploi'
+        indexes = [
+            models.Index(fields=['start_date', 'end_date']),
+            models.Index(fields=['end_date']),
+        ]
+    
+    def __str__(self):
+        end = self.end_date.strftime('%Y-%m-%d') if self.end_date else '...'
+        return f"{self.employee} - {self.start_date.strftime('%Y-%m-%d')} → {end}"
+
 class JobOffer(models.Model):
     """Modèle pour les offres d'emploi"""
     STATUS_CHOICES = [
@@ -394,6 +473,9 @@ class LeaveRequest(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Demande de congé'
         verbose_name_plural = 'Demandes de congé'
+        indexes = [
+            models.Index(fields=['status', 'start_date', 'end_date']),
+        ]
     
     def save(self, *args, **kwargs):
         """Calcule automatiquement le nombre de jours si non fourni"""
@@ -463,28 +545,22 @@ class LeaveBalance(models.Model):
         """Calcule le total des congés restants"""
         return self.remaining_annual + self.remaining_sick
     
-    def recalculate_used_days(self):
+    def recalculate_used_days(self, year=None):
         """Recalcule automatiquement les jours utilisés à partir des demandes approuvées"""
         from django.utils import timezone
-        current_year = timezone.now().year
-        
-        # Recalculer les congés annuels utilisés
-        annual_requests = LeaveRequest.objects.filter(
-            employee=self.employee,
-            leave_type='ANNUAL',
-            status='RH_APPROVED',
-            start_date__year=current_year
-        )
-        self.used_annual = sum(request.days for request in annual_requests)
+        year = year or timezone.now().year
         
-        # Recalculer les congés maladie utilisés
-        sick_requests = LeaveRequest.objects.filter(
-            employee=self.employee,
-            leave_type='SICK',
-            status='RH_APPROVED',
-            start_date__year=current_year
+        # Une seule requête groupée par type de congé
+        used = dict(
+            LeaveRequest.objects.filter(
+                employee_id=self.employee_id,
+                leave_type__in=['ANNUAL', 'SICK'],
+                status='RH_APPROVED',
+                start_date__year=year
+            ).values_list('leave_type').annotate(total=models.Sum('days')).order_by()
         )
-        self.used_sick = sum(request.days for request in sick_requests)
+        self.used_annual = used.get('ANNUAL') or 0
+        self.used_sick = used.get('SICK') or 0
         
         self.save()
     
@@ -492,6 +568,103 @@ class LeaveBalance(models.Model):
         return f"{self.employee} - Annuel: {self.remaining_annual}/{self.annual_leave}, Maladie: {self.remaining_sick}/{self.sick_leave}"
 
 
+class LeaveTransaction(models.Model):
+    """Mouvement du registre des congés : débit à l'approbation RH, crédit à l'annulation"""
+    TYPE_CHOICES = [
+        ('APPROVAL', 'Approbation'),
+        ('CANCELLATION', 'Annulation'),
+        ('ADJUSTMENT', 'Ajustement'),
+    ]
+    
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='leave_transactions')
+    leave_request = models.ForeignKey(LeaveRequest, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
+    leave_type = models.CharField(max_length=20, choices=LeaveRequest.TYPE_CHOICES)
+    transaction_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    days = models.IntegerField(help_text='Jours consommés (positif) ou restitués (négatif)')
+    year = models.IntegerField(verbose_name='Année du congé')
+    description = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Mouvement de congés'
+        verbose_name_plural = 'Mouvements de congés'
+        indexes = [
+            models.Index(fields=['employee', 'year', 'leave_type']),
+        ]
+    
+    def __str__(self):
+        return f"{self.employee} - {self.get_transaction_type_display()} {self.leave_type}: {self.days:+d} j"
+
+
+class LeaveAccrualRule(models.Model):
+    """Règle d'acquisition des congés annuels, versionnée par date d'effet"""
+    name = models.CharField(max_length=100, verbose_name='Libellé')
+    monthly_days = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('2.08'), verbose_name='Jours acquis par mois')
+    carry_over_cap = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name='Report maximum sur l\'année suivante',
+        help_text='Jours non pris reportables au 1er janvier (vide: pas de plafond, 0: pas de report)'
+    )
+    effective_from = models.DateField(verbose_name='En vigueur à partir du')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-effective_from']
+        verbose_name = 'Règle d\'acquisition des congés'
+        verbose_name_plural = 'Règles d\'acquisition des congés'
+    
+    def __str__(self):
+        return f"{self.name} (depuis le {self.effective_from})"
+
+
+class LeaveSeniorityTier(models.Model):
+    """Jours supplémentaires par an à partir d'une ancienneté (le palier le plus élevé atteint s'applique)"""
+    rule = models.ForeignKey(LeaveAccrualRule, on_delete=models.CASCADE, related_name='seniority_tiers')
+    min_years = models.PositiveIntegerField(verbose_name='Ancienneté minimum (années)')
+    extra_days = models.DecimalField(max_digits=5, decimal_places=2, verbose_name='Jours supplémentaires par an')
+    
+    class Meta:
+        ordering = ['rule', 'min_years']
+        unique_together = ['rule', 'min_years']
+        verbose_name = 'Palier d\'ancienneté'
+        verbose_name_plural = 'Paliers d\'ancienneté'
+    
+    def __str__(self):
+        return f"{self.rule.name}: {self.min_years} ans et plus, +{self.extra_days} j/an"
+
+
+class LeaveAccrual(models.Model):
+    """Jours de congés annuels acquis par un employé sur un mois (mois 0 : report de l'année précédente)"""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='leave_accruals')
+    rule = models.ForeignKey(LeaveAccrualRule, on_delete=models.SET_NULL, null=True, blank=True, related_name='accruals')
+    year = models.IntegerField()
+    month = models.IntegerField(help_text='1 à 12, 0 pour le report de l\'année précédente')
+    days = models.DecimalField(max_digits=6, decimal_places=2, verbose_name='Jours acquis')
+    seniority_days = models.DecimalField(max_digits=6, decimal_places=2, default=0, verbose_name='Dont ancienneté')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-year', '-month']
+        unique_together = ['employee', 'year', 'month']
+        indexes = [
+            models.Index(fields=['year', 'month']),
+        ]
+        verbose_name = 'Acquisition de congés'
+        verbose_name_plural = 'Acquisitions de congés'
+    
+    def __str__(self):
+        period = f"report {self.year}" if self.month == 0 else f"{self.month:02d}/{self.year}"
+        return f"{self.employee} - {period}: {self.days} j"
+
+
 class Attendance(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendances')
     date = models.DateField()
@@ -773,6 +946,8 @@ class PayslipDeduction(models.Model):
     deduction_type = models.CharField(max_length=20, choices=TYPE_CHOICES, verbose_name='Type de déduction')
     description = models.CharField(max_length=200, verbose_name='Description')
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Montant')
+    # Renseigné pour les retenues calculées par le moteur de cotisations
+    contribution_rate = models.ForeignKey('ContributionRate', on_delete=models.SET_NULL, null=True, blank=True, related_name='deductions', verbose_name='Barème de cotisation')
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -804,6 +979,73 @@ class PaymentHistory(models.Model):
         return f"{self.payslip} - {self.payment_date}: {self.amount}"
 
 
+class ContributionRate(models.Model):
+    """Barème de cotisation sociale ou d'impôt sur salaire (CNPS, ITS...), versionné par date d'effet"""
+    BASE_CHOICES = [
+        ('GROSS', 'Salaire brut'),
+        ('BASE', 'Salaire de base'),
+    ]
+    
+    code = models.CharField(max_length=30, verbose_name='Code')
+    name = models.CharField(max_length=100, verbose_name='Libellé')
+    deduction_type = models.CharField(max_length=20, choices=PayslipDeduction.TYPE_CHOICES, default='SOCIAL_SECURITY', verbose_name='Type de retenue')
+    base = models.CharField(max_length=10, choices=BASE_CHOICES, default='GROSS', verbose_name='Assiette')
+    base_ratio = models.DecimalField(max_digits=5, decimal_places=4, default=1, verbose_name='Part de l\'assiette soumise')
+    ceiling = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name='Plafond mensuel')
+    employee_rate = models.DecimalField(max_digits=6, decimal_places=3, default=0, verbose_name='Taux salarial (%)')
+    employer_rate = models.DecimalField(max_digits=6, decimal_places=3, default=0, verbose_name='Taux patronal (%)')
+    is_progressive = models.BooleanField(default=False, verbose_name='Barème progressif (par tranches)')
+    effective_from = models.DateField(verbose_name='En vigueur à partir du')
+    effective_to = models.DateField(null=True, blank=True, verbose_name='En vigueur jusqu\'au')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['code', 'effective_from']
+        ordering = ['code', '-effective_from']
+        verbose_name = 'Barème de cotisation'
+        verbose_name_plural = 'Barèmes de cotisation'
+    
+    def __str__(self):
+        return f"{self.code} - {self.name} (depuis le {self.effective_from})"
+
+
+class ContributionBracket(models.Model):
+    """Tranche d'un barème progressif (ex: ITS)"""
+    contribution_rate = models.ForeignKey(ContributionRate, on_delete=models.CASCADE, related_name='brackets')
+    lower_bound = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Borne inférieure')
+    upper_bound = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name='Borne supérieure')
+    rate = models.DecimalField(max_digits=6, decimal_places=3, verbose_name='Taux (%)')
+    
+    class Meta:
+        ordering = ['contribution_rate', 'lower_bound']
+        verbose_name = 'Tranche de barème'
+        verbose_name_plural = 'Tranches de barème'
+    
+    def __str__(self):
+        upper = self.upper_bound if self.upper_bound is not None else '∞'
+        return f"{self.contribution_rate.code}: {self.lower_bound} - {upper} à {self.rate}%"
+
+
+class PayslipContribution(models.Model):
+    """Cotisations salariales et patronales calculées pour une fiche de paie (base des déclarations)"""
+    payslip = models.ForeignKey(Payslip, on_delete=models.CASCADE, related_name='contributions')
+    contribution_rate = models.ForeignKey(ContributionRate, on_delete=models.PROTECT, related_name='payslip_contributions')
+    base_amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Assiette')
+    employee_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Part salariale')
+    employer_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Part patronale')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['payslip', 'contribution_rate']
+        verbose_name = 'Cotisation de fiche de paie'
+        verbose_name_plural = 'Cotisations de fiches de paie'
+    
+    def __str__(self):
+        return f"{self.payslip} - {self.contribution_rate.code}"
+
+
 class Document(models.Model):
     DOCUMENT_TYPE_CHOICES = [
         ('PAYSLIP_SCAN', 'Scan de fiche de paie'),
@@ -818,6 +1060,7 @@ class Document(models.Model):
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='uploaded_documents')
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, null=True, blank=True, related_name='documents')
     description = models.TextField(blank=True)
+    extracted_text = models.TextField(blank=True, verbose_name='Texte extrait (OCR)')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -830,6 +1073,38 @@ class Document(models.Model):
         return f"{self.get_document_type_display()} - {self.created_at.strftime('%Y-%m-%d')}"
 
 
+class SearchEntry(models.Model):
+    """
+    Entrée de l'index de recherche globale (employés, candidats, documents),
+    tenue à jour par apprh/search.py. Les index plein texte propres au moteur
+    (tsvector et trigrammes sous PostgreSQL, FTS5 sous SQLite) sont créés par
+    la migration 0018.
+    """
+    KIND_CHOICES = [
+        ('EMPLOYEE', 'Employé'),
+        ('CANDIDATE', 'Candidat'),
+        ('DOCUMENT', 'Document'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    identifiers = models.CharField(max_length=255, blank=True, help_text='Matricule, badge, CNPS, email...')
+    body = models.TextField(blank=True, help_text='Texte long : notes, description, texte extrait')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Entrée de recherche'
+        verbose_name_plural = 'Entrées de recherche'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_entry'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id}: {self.title}"
+
+
 class PresenceTracking(models.Model):
     STATUS_CHOICES = [
         ('PRESENT', 'Présent'),
@@ -0,0 +1,219 @@
+"""
+Import en masse des employés (ouverture d'un nouveau site client)
+
+Le fichier est lu au fil de l'eau et toutes les lignes sont validées avant
+toute écriture ; en cas d'erreur rien n'est créé. Les services et les noms
+d'utilisateur existants sont résolus en quelques requêtes ensemblistes, les
+matricules réservés en un seul bloc dans la séquence, puis les comptes
+utilisateurs, les employés, les soldes de congés, les périodes d'emploi et
+l'historique de création sont enregistrés par bulk_create. Les comptes sont
+créés sans mot de passe utilisable (comme à la création unitaire) : aucun
+hachage n'est calculé.
+"""
+import re
+import time
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .absences import invalidate_leave_calendar
+from .models import User, Employee, EmployeeHistory, EmploymentInterval, LeaveBalance, Service
+from .search import index_objects
+from .sequences import EMPLOYEE_ID_PREFIX, allocate_employee_ids, reserve_employee_id
+from .usernames import bulk_create_users, username_base
+from .workforce import intervals_for
+
+
+REQUIRED_COLUMNS = ['first_name', 'last_name', 'email', 'phone', 'position', 'date_of_hire']
+
+OPTIONAL_COLUMNS = [
+    'badge_id', 'salary', 'address', 'date_of_birth', 'place_of_birth', 'gender',
+    'nationality', 'marital_status', 'number_of_children', 'qualification', 'social_security_number',
+    'cnps_number', 'bank_name', 'bank_account_number', 'mobile_money_number',
+]
+
+_FRENCH_DATE = re.compile(r'^\d{1,2}/\d{1,2}/\d{4}$')
+
+
+def _clean_value(field, value):
+    """Valeur d'une cellule convertie et validée par le champ du modèle"""
+    if isinstance(value, str):
+        value = value.strip()
+        if _FRENCH_DATE.match(value) and field.get_internal_type() == 'DateField':
+            try:
+                value = datetime.strptime(value, '%d/%m/%Y').date()
+            except ValueError:
+                raise ValidationError(f'Date invalide : {value}')
+        elif field.get_internal_type() == 'DecimalField':
+            value = value.replace('\u00a0', '').replace(' ', '').replace(',', '.')
+    if value is None or value == '':
+        if field.null:
+            return None
+        if field.has_default() and not field.blank:
+            return field.get_default()
+        value = ''
+    return field.clean(value, None)
+
+
+def _parse_row(row, services):
+    """Valeurs d'une ligne et liste de ses erreurs"""
+    values, errors = {}, []
+    for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS:
+        if column not in row and column not in REQUIRED_COLUMNS:
+            continue
+        try:
+            values[column] = _clean_value(Employee._meta.get_field(column), row.get(column))
+        except ValidationError as e:
+            errors.append(f'{column} : {" ".join(e.messages)}')
+
+    # Comme à la création unitaire, un matricule hors format DITECH est régénéré
+    employee_id = str(row.get('employee_id') or '').strip().upper()
+    if employee_id.startswith(EMPLOYEE_ID_PREFIX):
+        values['employee_id'] = employee_id
+
+    service = str(row.get('service') or '').strip()
+    if service:
+        service_id = services.get(service.lower())
+        if service_id is None:
+            errors.append(f'Service "{service}" introuvable')
+        values['service_id'] = service_id
+    return values, errors
+
+
+def _service_lookup():
+    """Services indexés par nom (en minuscules) et par identifiant"""
+    services = {}
+    for pk, name in Service.objects.values_list('id', 'name'):
+        services[name.strip().lower()] = pk
+        services[str(pk)] = pk
+    return services
+
+
+def _check_unique(parsed, errors):
+    """Matricules et badges uniques dans le fichier et en base (une requête par champ)"""
+    for field in ('employee_id', 'badge_id'):
+        lines = {}
+        for line_number, values in parsed:
+            if values.get(field):
+                lines.setdefault(values[field], []).append(line_number)
+        existing = set(
+            Employee.objects.filter(**{f'{field}__in': lines}).values_list(field, flat=True)
+        ) if lines else set()
+        for value, line_numbers in lines.items():
+            if value in existing:
+                errors.extend({'line': line, 'errors': [f'{field} "{value}" déjà attribué']} for line in line_numbers)
+            elif len(line_numbers) > 1:
+                errors.extend({'line': line, 'errors': [f'{field} "{value}" en double dans le fichier']} for line in line_numbers)
+
+
+def import_employees(rows, changed_by=None, dry_run=False):
+    """
+    Importe des employés depuis des lignes de fichier (voir imports.iter_import_rows).
+
+    Colonnes obligatoires : first_name, last_name, email, phone, position,
+    date_of_hire. Colonnes facultatives : employee_id (matricule DITECH),
+    service (nom ou identifiant) et les champs de OPTIONAL_COLUMNS. Un compte utilisateur (rôle EMPLOYE) est créé
+    pour chaque employé, avec un nom d'utilisateur dérivé de l'email.
+
+    Retourne un dictionnaire de résultat avec les erreurs par ligne, la durée
+    et le débit en lignes par seconde.
+    """
+    started = time.perf_counter()
+    services = _service_lookup()
+    parsed, errors = [], []
+    row_count = 0
+    for line_number, row in rows:
+        row_count += 1
+        values, row_errors = _parse_row(row, services)
+        if row_errors:
+            errors.append({'line': line_number, 'errors': row_errors})
+        else:
+            parsed.append((line_number, values))
+    _check_unique(parsed, errors)
+
+    result = {
+        'rows': row_count,
+        'created': 0,
+        'employees': [],
+        'dry_run': dry_run,
+        'errors': sorted(errors, key=lambda e: e['line']),
+    }
+
+    if not errors and not dry_run and parsed:
+        result['employees'] = _create_employees(parsed, changed_by)
+        result['created'] = len(parsed)
+
+    elapsed = time.perf_counter() - started
+    result['elapsed_ms'] = round(elapsed * 1000, 1)
+    result['rows_per_second'] = round(result['rows'] / elapsed, 1) if elapsed else None
+    return result
+
+
+def _create_employees(parsed, changed_by):
+    """Enregistre les lignes validées ; retourne matricule et nom d'utilisateur par ligne"""
+    # Matricules réservés hors transaction : comme une séquence, un bloc non utilisé n'est pas réattribué
+    missing = sum(1 for _, values in parsed if 'employee_id' not in values)
+    generated = iter(allocate_employee_ids(missing) if missing else [])
+    for _, values in parsed:
+        if 'employee_id' in values:
+            reserve_employee_id(values['employee_id'])
+        else:
+            values['employee_id'] = next(generated)
+
+    with transaction.atomic():
+        users = []
+        for _, values in parsed:
+            user = User(
+                email=values['email'],
+                first_name=values['first_name'],
+                last_name=values['last_name'],
+                role='EMPLOYE',
+            )
+            user.set_unusable_password()
+            users.append(user)
+        bulk_create_users(users, [username_base(values['email']) for _, values in parsed])
+        if any(user.pk is None for user in users):
+            # Bases sans RETURNING : identifiants relus par nom d'utilisateur
+            ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'id'))
+            for user in users:
+                user.pk = ids[user.username]
+
+        employees = [Employee(user=user, **values) for user, (_, values) in zip(users, parsed)]
+        Employee.objects.bulk_create(employees, batch_size=500)
+        if any(employee.pk is None for employee in employees):
+            ids = dict(
+                Employee.objects.filter(employee_id__in=[employee.employee_id for employee in employees])
+                .values_list('employee_id', 'id')
+            )
+            for employee in employees:
+                employee.pk = ids[employee.employee_id]
+
+        LeaveBalance.objects.bulk_create(
+            [LeaveBalance(employee=employee) for employee in employees], batch_size=500
+        )
+        EmploymentInterval.objects.bulk_create(
+            [interval for employee in employees for interval in intervals_for(employee)], batch_size=500
+        )
+        EmployeeHistory.objects.bulk_create([
+            EmployeeHistory(
+                employee=employee,
+                change_type='INFO',
+                field_name='creation',
+                old_value='',
+                new_value='Employé créé',
+                description=f'Création de l\'employé {employee.get_full_name()} (import)',
+                changed_by=changed_by,
+            )
+            for employee in employees
+        ], batch_size=500)
+
+    # bulk_create ne déclenche pas les signaux post_save
+    for service_id in {employee.service_id for employee in employees}:
+        invalidate_leave_calendar(service_id)
+    index_objects(employees)
+
+    return [
+        {'line': line_number, 'employee_id': employee.employee_id, 'username': employee.user.username}
+        for (line_number, _), employee in zip(parsed, employees)
+    ]
@@ -0,0 +1,99 @@
+"""
+Pagination des listes de l'API
+
+Les listes sont paginées par numéro de page (?page=, ?page_size=) ou, pour
+les grandes tables, par curseur (?cursor=, sans COUNT ni OFFSET). Une vue
+peut fixer sa taille de page (page_size, max_page_size) et l'ordre de son
+curseur (cursor_ordering) ; aucune page ne dépasse API_MAX_ROWS lignes.
+
+Compatibilité pendant la migration du frontend (API_PAGINATION_COMPAT) :
+une requête sans paramètre de pagination reçoit la liste nue d'avant,
+tronquée à API_MAX_ROWS lignes (en-tête X-Truncated quand c'est le cas).
+"""
+from django.conf import settings
+from django.db.models import QuerySet
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.response import Response
+
+
+DEFAULT_MAX_ROWS = 1000
+
+
+def max_rows():
+    """Plafond de lignes d'une réponse"""
+    return getattr(settings, 'API_MAX_ROWS', DEFAULT_MAX_ROWS)
+
+
+def capped(rows):
+    """Lignes limitées au plafond (listes imbriquées dans une réponse)"""
+    return rows[:max_rows()]
+
+
+class CompatPaginationMixin:
+    """Liste nue plafonnée pour les requêtes sans paramètre de pagination (mode compatibilité)"""
+    pagination_params = ()
+    legacy = False
+
+    def configure(self, request, view):
+        self.max_page_size = min(getattr(view, 'max_page_size', None) or self.max_page_size, max_rows())
+        self.page_size = min(getattr(view, 'page_size', None) or self.page_size, self.max_page_size)
+        self.legacy = getattr(settings, 'API_PAGINATION_COMPAT', False) and not any(
+            param in request.query_params for param in self.pagination_params
+        )
+
+    def legacy_page(self, queryset):
+        rows = list(queryset[:max_rows() + 1])
+        self.truncated = len(rows) > max_rows()
+        return rows[:max_rows()]
+
+    def legacy_response(self, data):
+        response = Response(data)
+        if self.truncated:
+            response['X-Truncated'] = 'true'
+            response['X-Max-Rows'] = str(max_rows())
+        return response
+
+
+class StandardPagination(CompatPaginationMixin, PageNumberPagination):
+    """Pagination par numéro de page (réponse count / next / previous / results)"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    pagination_params = ('page', 'page_size')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.configure(request, view)
+        if self.legacy:
+            return self.legacy_page(queryset)
+        if isinstance(queryset, QuerySet) and not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.legacy:
+            return self.legacy_response(data)
+        return super().get_paginated_response(data)
+
+
+class LargeTablePagination(CompatPaginationMixin, CursorPagination):
+    """
+    Pagination par curseur des grandes tables (réponse next / previous /
+    results) : coût constant quelle que soit la profondeur de la page.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-pk',)
+    pagination_params = ('cursor', 'page_size')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.configure(request, view)
+        if self.legacy:
+            return self.legacy_page(queryset)
+        self.ordering = getattr(view, 'cursor_ordering', None) or self.ordering
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.legacy:
+            return self.legacy_response(data)
+        return super().get_paginated_response(data)
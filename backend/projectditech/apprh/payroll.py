@@ -0,0 +1,579 @@
+"""
+Traitements de paie en masse (import de primes/déductions, recalcul des totaux,
+fichiers de virement, cotisations sociales et fiscales)
+"""
+import csv
+import io
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .analytics import invalidate_salary_analytics
+from .sequences import allocate
+from .models import (
+    Payslip, PayslipBonus, PayslipDeduction, PaymentHistory, ContributionRate, PayslipContribution
+)
+
+
+ITEM_KINDS = {
+    'BONUS': (PayslipBonus, 'bonus_type', 'bonuses'),
+    'DEDUCTION': (PayslipDeduction, 'deduction_type', 'deductions'),
+}
+
+KIND_ALIASES = {
+    'BONUS': 'BONUS', 'PRIME': 'BONUS',
+    'DEDUCTION': 'DEDUCTION', 'DÉDUCTION': 'DEDUCTION', 'RETENUE': 'DEDUCTION',
+}
+
+
+def _items_total(model):
+    """Sous-requête : somme des lignes d'une fiche de paie (None si aucune ligne)"""
+    return models.Subquery(
+        model.objects.filter(payslip=models.OuterRef('pk'))
+        .values('payslip')
+        .annotate(total=models.Sum('amount'))
+        .values('total'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def recompute_payslip_totals(touched):
+    """
+    Recalcule les totaux de primes/déductions et les salaires brut et net
+    d'un ensemble de fiches de paie avec une requête d'agrégation et un seul
+    bulk_update.
+
+    `touched` est un dictionnaire {payslip_id: {'bonuses', 'deductions'}}
+    indiquant les totaux à recalculer depuis les lignes détaillées ; les autres
+    totaux (saisis manuellement) sont conservés. Un simple itérable d'IDs
+    recalcule les deux totaux.
+    """
+    if not isinstance(touched, dict):
+        touched = {pk: {'bonuses', 'deductions'} for pk in touched}
+    if not touched:
+        return 0
+
+    zero = models.Value(Decimal('0'), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+    payslips = list(
+        Payslip.objects.filter(pk__in=touched.keys())
+        .only('id', 'year', 'base_salary', 'bonuses', 'deductions', 'overtime_pay', 'gross_salary', 'net_salary')
+        .annotate(
+            bonus_items_total=Coalesce(_items_total(PayslipBonus), zero),
+            deduction_items_total=Coalesce(_items_total(PayslipDeduction), zero),
+        )
+    )
+
+    now = timezone.now()
+    for payslip in payslips:
+        fields = touched[payslip.pk]
+        if 'bonuses' in fields:
+            payslip.bonuses = payslip.bonus_items_total
+        if 'deductions' in fields:
+            payslip.deductions = payslip.deduction_items_total
+        # Mêmes règles que Payslip.save()
+        payslip.gross_salary = payslip.base_salary + payslip.bonuses + payslip.overtime_pay
+        payslip.net_salary = payslip.gross_salary - payslip.deductions
+        payslip.updated_at = now
+
+    Payslip.objects.bulk_update(
+        payslips,
+        ['bonuses', 'deductions', 'gross_salary', 'net_salary', 'updated_at'],
+        batch_size=500,
+    )
+    # bulk_update ne déclenche pas les signaux post_save
+    for year in {payslip.year for payslip in payslips}:
+        invalidate_salary_analytics(year)
+    return len(payslips)
+
+
+def add_deduction_deltas(deltas):
+    """
+    Ajoute {payslip_id: montant} au total des déductions des fiches et
+    recalcule leur net (un bulk_update) : le total saisi manuellement, qui
+    peut ne correspondre à aucune ligne détaillée, est conservé.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    payslips = list(Payslip.objects.filter(pk__in=deltas.keys()).only('id', 'year', 'deductions', 'gross_salary', 'net_salary'))
+    now = timezone.now()
+    for payslip in payslips:
+        payslip.deductions += deltas[payslip.pk]
+        # Mêmes règles que Payslip.save()
+        payslip.net_salary = payslip.gross_salary - payslip.deductions
+        payslip.updated_at = now
+    Payslip.objects.bulk_update(payslips, ['deductions', 'net_salary', 'updated_at'], batch_size=500)
+    for year in {payslip.year for payslip in payslips}:
+        invalidate_salary_analytics(year)
+    return len(payslips)
+
+
+def _parse_amount(value):
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    cleaned = str(value or '').replace('\u00a0', '').replace(' ', '').replace(',', '.')
+    return Decimal(cleaned)
+
+
+def _parse_int(value):
+    if value is None or str(value).strip() == '':
+        return None
+    return int(float(str(value).replace(',', '.')))
+
+
+def import_payslip_items(rows, default_kind=None, default_month=None, default_year=None, dry_run=False):
+    """
+    Importe en masse des primes et des déductions depuis des lignes de fichier.
+
+    Colonnes reconnues :
+    - payslip (ID de la fiche) ou employee_id (matricule DITECH) + month + year
+    - kind : BONUS/PRIME ou DEDUCTION/RETENUE (sinon `default_kind`)
+    - type, description, amount
+
+    Toutes les lignes sont validées avant toute écriture ; en cas d'erreur rien
+    n'est créé. Retourne un dictionnaire de résultat contenant la liste des
+    erreurs par ligne.
+    """
+    parsed = []
+    errors = []
+
+    for line_number, row in rows:
+        row_errors = []
+
+        kind = KIND_ALIASES.get(str(row.get('kind') or default_kind or '').strip().upper())
+        if not kind:
+            row_errors.append('Type de ligne (kind) invalide : BONUS ou DEDUCTION attendu')
+
+        item_type = str(row.get('type') or row.get('bonus_type') or row.get('deduction_type') or '').strip().upper()
+        if kind:
+            model, type_field, _ = ITEM_KINDS[kind]
+            valid_types = [choice[0] for choice in model._meta.get_field(type_field).choices]
+            if item_type not in valid_types:
+                row_errors.append(f'Type "{item_type}" invalide, valeurs possibles : {", ".join(valid_types)}')
+
+        description = str(row.get('description') or '').strip()
+        if not description:
+            row_errors.append('Description requise')
+        elif len(description) > 200:
+            row_errors.append('Description trop longue (200 caractères maximum)')
+
+        try:
+            amount = _parse_amount(row.get('amount'))
+            if amount <= 0:
+                row_errors.append('Le montant doit être positif')
+        except (InvalidOperation, ValueError):
+            amount = None
+            row_errors.append(f'Montant invalide : {row.get("amount")}')
+
+        key = None
+        try:
+            payslip_id = _parse_int(row.get('payslip') or row.get('payslip_id'))
+            month = _parse_int(row.get('month')) or default_month
+            year = _parse_int(row.get('year')) or default_year
+        except ValueError:
+            payslip_id = month = year = None
+            row_errors.append('Identifiant de fiche, mois ou année invalide')
+        else:
+            employee_code = str(row.get('employee_id') or '').strip().upper()
+            if payslip_id:
+                key = ('id', payslip_id)
+            elif employee_code and month and year:
+                key = ('employee', employee_code, int(month), int(year))
+            else:
+                row_errors.append('Indiquez "payslip" ou "employee_id" avec "month" et "year"')
+
+        if row_errors:
+            errors.append({'line': line_number, 'errors': row_errors})
+        else:
+            parsed.append((line_number, kind, item_type, description, amount, key))
+
+    # Résolution de toutes les fiches de paie en une seule requête
+    ids = {key[1] for *_, key in parsed if key[0] == 'id'}
+    employee_keys = {key[1:] for *_, key in parsed if key[0] == 'employee'}
+    condition = models.Q(pk__in=ids)
+    if employee_keys:
+        condition |= models.Q(
+            employee__employee_id__in={k[0] for k in employee_keys},
+            month__in={k[1] for k in employee_keys},
+            year__in={k[2] for k in employee_keys},
+        )
+    payslips = {}
+    if parsed:
+        for pk, code, month, year, payslip_status in Payslip.objects.filter(condition).values_list(
+            'id', 'employee__employee_id', 'month', 'year', 'status'
+        ):
+            payslips[('id', pk)] = (pk, payslip_status)
+            payslips[('employee', code, month, year)] = (pk, payslip_status)
+
+    items = {'BONUS': [], 'DEDUCTION': []}
+    touched = {}
+    for line_number, kind, item_type, description, amount, key in parsed:
+        resolved = payslips.get(key)
+        if resolved is None:
+            errors.append({'line': line_number, 'errors': ['Fiche de paie introuvable']})
+            continue
+        payslip_id, payslip_status = resolved
+        if payslip_status == 'PAID':
+            errors.append({'line': line_number, 'errors': ['La fiche de paie est déjà payée']})
+            continue
+
+        model, type_field, total_field = ITEM_KINDS[kind]
+        items[kind].append(model(payslip_id=payslip_id, description=description, amount=amount, **{type_field: item_type}))
+        touched.setdefault(payslip_id, set()).add(total_field)
+
+    result = {
+        'bonuses_created': len(items['BONUS']),
+        'deductions_created': len(items['DEDUCTION']),
+        'payslips_updated': len(touched),
+        'dry_run': dry_run,
+        'errors': sorted(errors, key=lambda e: e['line']),
+    }
+    if errors or dry_run:
+        if errors:
+            result.update(bonuses_created=0, deductions_created=0, payslips_updated=0)
+        return result
+
+    with transaction.atomic():
+        PayslipBonus.objects.bulk_create(items['BONUS'], batch_size=500)
+        PayslipDeduction.objects.bulk_create(items['DEDUCTION'], batch_size=500)
+        recompute_payslip_totals(touched)
+
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Fichiers de virement (banque / mobile money)
+# ---------------------------------------------------------------------------
+
+TRANSFER_CHANNELS = {
+    # canal: (champ du compte bénéficiaire, méthode de paiement enregistrée)
+    'bank': ('employee__bank_account_number', 'Virement bancaire'),
+    'mobile_money': ('employee__mobile_money_number', 'Mobile Money'),
+}
+
+TRANSFER_FIELDS = ['reference', 'employee_id', 'beneficiary', 'bank_name', 'account', 'amount', 'currency', 'label']
+
+# Format à largeur fixe par défaut : (champ, largeur, alignement).
+# Surchargeable via settings.PAYROLL_TRANSFER_FIXED_WIDTH_LAYOUT pour coller au
+# format exigé par la banque.
+DEFAULT_FIXED_WIDTH_LAYOUT = [
+    ('reference', 20, '<'),
+    ('employee_id', 12, '<'),
+    ('beneficiary', 35, '<'),
+    ('bank_name', 20, '<'),
+    ('account', 30, '<'),
+    ('amount', 15, '>'),
+    ('currency', 3, '<'),
+    ('label', 30, '<'),
+]
+
+TRANSFER_CURRENCY = 'XOF'
+TRANSFER_SEQUENCE = 'transfer_reference'
+
+
+def transfer_reference(month, year):
+    """
+    Référence unique d'un lot de virement (VIR202610-19143022-42) : l'horodatage
+    se lit facilement, le numéro de séquence distingue deux lots de la même seconde
+    (mark_transfer_paid retrouve les fiches d'un lot par sa référence).
+    """
+    return f"VIR{year}{month:02d}-{timezone.now():%d%H%M%S}-{allocate(TRANSFER_SEQUENCE)}"
+
+
+def transfer_queryset(month, year, channel='bank', statuses=('GENERATED', 'SENT'), service_id=None):
+    """Fiches de paie d'une période à inclure dans un fichier de virement"""
+    account_field, _ = TRANSFER_CHANNELS[channel]
+    queryset = Payslip.objects.filter(month=month, year=year, status__in=statuses, net_salary__gt=0)
+    if service_id:
+        queryset = queryset.filter(employee__service_id=service_id)
+    return queryset.exclude(**{account_field: ''}).exclude(**{f'{account_field}__isnull': True})
+
+
+def transfer_control_totals(queryset):
+    """Totaux de contrôle (nombre d'ordres et montant total) en une requête"""
+    totals = queryset.aggregate(count=models.Count('id'), total=models.Sum('net_salary'))
+    return {'count': totals['count'] or 0, 'total': totals['total'] or Decimal('0')}
+
+
+def mark_transfer_paid(queryset, reference, payment_date, channel, user=None, batch_size=1000):
+    """
+    Crée les PaymentHistory en masse et marque les fiches comme payées.
+    Les fiches traitées sont identifiables ensuite par la référence du lot.
+    """
+    _, payment_method = TRANSFER_CHANNELS[channel]
+    with transaction.atomic():
+        batch = []
+        for payslip_id, net_salary in queryset.values_list('id', 'net_salary').iterator(chunk_size=batch_size):
+            batch.append(PaymentHistory(
+                payslip_id=payslip_id,
+                payment_date=payment_date,
+                amount=net_salary,
+                payment_method=payment_method,
+                reference=reference,
+                created_by=user,
+            ))
+            if len(batch) >= batch_size:
+                PaymentHistory.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            PaymentHistory.objects.bulk_create(batch)
+
+        now = timezone.now()
+        marked = Payslip.objects.filter(payment_history__reference=reference).update(
+            status='PAID',
+            payment_date=payment_date,
+            payment_method=payment_method,
+            paid_at=now,
+            updated_at=now,
+        )
+    return marked
+
+
+def _format_amount(amount, fixed_width=False):
+    amount = (amount or Decimal('0')).quantize(Decimal('0.01'))
+    if fixed_width:
+        # Montant entier en FCFA, sans séparateur, complété par des zéros
+        return str(int(amount.to_integral_value()))
+    return f'{amount:.2f}'
+
+
+def _fixed_width_line(values, layout):
+    parts = []
+    for field, width, align in layout:
+        value = str(values.get(field, '') or '')[:width]
+        if field == 'amount':
+            parts.append(value.rjust(width, '0'))
+        else:
+            parts.append(value.rjust(width) if align == '>' else value.ljust(width))
+    return ''.join(parts)
+
+
+def iter_transfer_file(queryset, reference, month, year, channel='bank', file_format='csv', control=None, chunk_size=2000):
+    """
+    Génère le fichier de virement ligne par ligne (mémoire constante).
+    Le fichier commence par un en-tête et se termine par une ligne de
+    totaux de contrôle.
+    """
+    account_field, _ = TRANSFER_CHANNELS[channel]
+    control = control or transfer_control_totals(queryset)
+    label = f'SALAIRE {month:02d}/{year}'
+    fixed_width = file_format == 'fixed'
+    layout = getattr(settings, 'PAYROLL_TRANSFER_FIXED_WIDTH_LAYOUT', DEFAULT_FIXED_WIDTH_LAYOUT)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return value
+
+    if fixed_width:
+        yield (
+            f"H{reference:<20}{timezone.localdate():%Y%m%d}{control['count']:08d}"
+            f"{_format_amount(control['total'], True):0>18}{TRANSFER_CURRENCY}\r\n"
+        )
+    else:
+        writer.writerow(TRANSFER_FIELDS)
+        yield flush()
+
+    rows = queryset.order_by('employee__employee_id').values_list(
+        'employee__employee_id', 'employee__first_name', 'employee__last_name',
+        'employee__bank_name', account_field, 'net_salary',
+    )
+    for employee_code, first_name, last_name, bank_name, account, net_salary in rows.iterator(chunk_size=chunk_size):
+        values = {
+            'reference': reference,
+            'employee_id': employee_code,
+            'beneficiary': f'{last_name} {first_name}'.upper(),
+            'bank_name': bank_name if channel == 'bank' else '',
+            'account': account.replace(' ', ''),
+            'amount': _format_amount(net_salary, fixed_width),
+            'currency': TRANSFER_CURRENCY,
+            'label': label,
+        }
+        if fixed_width:
+            yield _fixed_width_line(values, layout) + '\r\n'
+        else:
+            writer.writerow([values[field] for field in TRANSFER_FIELDS])
+            yield flush()
+
+    if fixed_width:
+        yield f"T{control['count']:08d}{_format_amount(control['total'], True):0>18}\r\n"
+    else:
+        writer.writerow(['TOTAL', control['count'], '', '', '', _format_amount(control['total']), TRANSFER_CURRENCY, ''])
+        yield flush()
+
+
+# ---------------------------------------------------------------------------
+# Moteur de cotisations (CNPS, ITS...)
+# ---------------------------------------------------------------------------
+
+def rates_in_effect(period_date):
+    """Barèmes actifs à une date : la version la plus récente de chaque code"""
+    rates = (
+        ContributionRate.objects.filter(is_active=True, effective_from__lte=period_date)
+        .filter(models.Q(effective_to__isnull=True) | models.Q(effective_to__gte=period_date))
+        .prefetch_related('brackets')
+        .order_by('code', '-effective_from')
+    )
+    in_effect = {}
+    for rate in rates:
+        in_effect.setdefault(rate.code, rate)
+    return list(in_effect.values())
+
+
+def _round_money(value):
+    return float(Decimal(str(value)).quantize(Decimal('0.01')))
+
+
+def _contribution_amounts(rate, gross, base):
+    """Calcule assiettes et parts salariale/patronale d'un barème pour toutes les fiches"""
+    assiette = (gross if rate.base == 'GROSS' else base) * float(rate.base_ratio)
+    if rate.ceiling is not None:
+        assiette = np.minimum(assiette, float(rate.ceiling))
+
+    if rate.is_progressive:
+        employee = np.zeros_like(assiette)
+        for bracket in rate.brackets.all():
+            lower = float(bracket.lower_bound)
+            upper = np.inf if bracket.upper_bound is None else float(bracket.upper_bound)
+            employee += np.clip(assiette - lower, 0, upper - lower) * float(bracket.rate) / 100
+    else:
+        employee = assiette * float(rate.employee_rate) / 100
+    employer = assiette * float(rate.employer_rate) / 100
+
+    # Montants arrondis au franc CFA
+    return np.rint(assiette), np.rint(employee), np.rint(employer)
+
+
+def compute_contributions(month, year, dry_run=False):
+    """
+    Calcule les cotisations salariales et patronales de toutes les fiches de
+    paie non payées d'une période en une passe vectorisée.
+
+    Les retenues salariales sont écrites en PayslipDeduction (liées à leur
+    barème) et le détail salarial/patronal en PayslipContribution. Le calcul
+    peut être relancé : les lignes générées précédemment pour la période sont
+    remplacées, les retenues saisies manuellement sont conservées. Le total
+    des déductions de chaque fiche est corrigé de l'écart entre les anciennes
+    et les nouvelles retenues de cotisation (un total saisi sans lignes
+    détaillées reste juste). Sans barème en vigueur (result['rates'] vide),
+    aucune ligne n'est modifiée.
+    """
+    started = time.perf_counter()
+    rates = rates_in_effect(date(year, month, 1))
+    period_payslips = Payslip.objects.filter(month=month, year=year)
+    rows = list(period_payslips.exclude(status='PAID').values_list('id', 'gross_salary', 'base_salary'))
+    skipped_paid = period_payslips.filter(status='PAID').count()
+
+    result = {
+        'period': {'month': month, 'year': year},
+        'rates': [rate.code for rate in rates],
+        'payslips': len(rows),
+        'skipped_paid': skipped_paid,
+        'deductions_created': 0,
+        'contributions_created': 0,
+        'totals': {},
+        'dry_run': dry_run,
+    }
+    if not rows or not rates:
+        # Sans barème en vigueur, rien n'est écrit : les lignes déjà calculées sont conservées
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    ids = np.array([row[0] for row in rows])
+    gross = np.array([row[1] for row in rows], dtype=float)
+    base = np.array([row[2] for row in rows], dtype=float)
+
+    contributions = []
+    deductions = []
+    for rate in rates:
+        assiette, employee, employer = _contribution_amounts(rate, gross, base)
+        result['totals'][rate.code] = {
+            'name': rate.name,
+            'employee': _round_money(employee.sum()),
+            'employer': _round_money(employer.sum()),
+        }
+        description = rate.name if rate.is_progressive else f'{rate.name} ({rate.employee_rate.normalize():f}%)'
+        for i in np.flatnonzero((employee > 0) | (employer > 0)):
+            payslip_id = int(ids[i])
+            contributions.append(PayslipContribution(
+                payslip_id=payslip_id,
+                contribution_rate=rate,
+                base_amount=Decimal(int(assiette[i])),
+                employee_amount=Decimal(int(employee[i])),
+                employer_amount=Decimal(int(employer[i])),
+            ))
+            if employee[i] > 0:
+                deductions.append(PayslipDeduction(
+                    payslip_id=payslip_id,
+                    deduction_type=rate.deduction_type,
+                    description=description[:200],
+                    amount=Decimal(int(employee[i])),
+                    contribution_rate=rate,
+                ))
+
+    result['deductions_created'] = len(deductions)
+    result['contributions_created'] = len(contributions)
+    if not dry_run:
+        payslip_ids = ids.tolist()
+        deltas = dict.fromkeys(payslip_ids, Decimal('0'))
+        for deduction in deductions:
+            deltas[deduction.payslip_id] += deduction.amount
+        with transaction.atomic():
+            previous = PayslipDeduction.objects.filter(payslip_id__in=payslip_ids, contribution_rate__isnull=False)
+            for payslip_id, amount in previous.values('payslip_id').annotate(total=models.Sum('amount')).values_list('payslip_id', 'total').order_by():
+                deltas[payslip_id] -= amount
+            PayslipContribution.objects.filter(payslip_id__in=payslip_ids).delete()
+            previous.delete()
+            PayslipContribution.objects.bulk_create(contributions, batch_size=1000)
+            PayslipDeduction.objects.bulk_create(deductions, batch_size=1000)
+            add_deduction_deltas(deltas)
+
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def contribution_declaration(month, year):
+    """Totaux de la déclaration mensuelle, par barème (une requête)"""
+    rows = (
+        PayslipContribution.objects.filter(payslip__month=month, payslip__year=year)
+        .values('contribution_rate__code', 'contribution_rate__name')
+        .annotate(
+            employees=models.Count('payslip__employee', distinct=True),
+            base_total=models.Sum('base_amount'),
+            employee_total=models.Sum('employee_amount'),
+            employer_total=models.Sum('employer_amount'),
+        )
+        .order_by('contribution_rate__code')
+    )
+    lines = []
+    employee_total = employer_total = Decimal('0')
+    for row in rows:
+        employee_total += row['employee_total'] or 0
+        employer_total += row['employer_total'] or 0
+        lines.append({
+            'code': row['contribution_rate__code'],
+            'name': row['contribution_rate__name'],
+            'employees': row['employees'],
+            'base_total': float(row['base_total'] or 0),
+            'employee_total': float(row['employee_total'] or 0),
+            'employer_total': float(row['employer_total'] or 0),
+            'total': float((row['employee_total'] or 0) + (row['employer_total'] or 0)),
+        })
+    return {
+        'period': {'month': month, 'year': year},
+        'lines': lines,
+        'employee_total': float(employee_total),
+        'employer_total': float(employer_total),
+        'total': float(employee_total + employer_total),
+    }
@@ -0,0 +1,197 @@
+"""
+Recherche globale (employés, candidats, documents)
+
+Chaque objet indexé a une ligne SearchEntry (titre, sous-titre, identifiants,
+texte long) tenue à jour par les signaux. La recherche s'appuie sur l'index
+du moteur créé par la migration 0018 :
+- PostgreSQL : colonne tsvector générée (index GIN) avec recherche par
+  préfixe, et similarité trigramme (pg_trgm) pour les fautes de frappe ;
+- SQLite : table FTS5 (classement bm25), pour le développement local ;
+- autres moteurs, ou SQLite sans FTS5 : filtres icontains, sans classement.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .models import Candidate, Document, Employee, SearchEntry
+
+
+# Nombre maximal de mots pris en compte dans une requête
+MAX_TERMS = 8
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Poids bm25 des colonnes FTS5 (title, subtitle, identifiers, body)
+FTS_WEIGHTS = '10.0, 3.0, 10.0, 1.0'
+
+
+# Les entrées sont construites à partir des seuls champs (sans méthode du
+# modèle) : la migration 0018 remplit l'index avec les modèles historiques.
+
+def _employee_entry(employee):
+    return {
+        'kind': 'EMPLOYEE',
+        'object_id': employee.pk,
+        'title': f"{employee.first_name} {employee.last_name}",
+        'subtitle': employee.position or '',
+        'identifiers': ' '.join(filter(None, [
+            employee.employee_id, employee.badge_id, employee.cnps_number, employee.email
+        ])),
+    }
+
+
+def _candidate_entry(candidate):
+    return {
+        'kind': 'CANDIDATE',
+        'object_id': candidate.pk,
+        'title': f"{candidate.first_name} {candidate.last_name}",
+        'subtitle': candidate.position or '',
+        'identifiers': candidate.email or '',
+        'body': candidate.notes or '',
+    }
+
+
+def _document_entry(document):
+    return {
+        'kind': 'DOCUMENT',
+        'object_id': document.pk,
+        'title': (document.document.name or '').rsplit('/', 1)[-1] or document.get_document_type_display(),
+        'subtitle': document.get_document_type_display(),
+        'body': '\n'.join(filter(None, [document.description, document.extracted_text])),
+    }
+
+
+# Modèle indexé : (type d'entrée, construction de l'entrée)
+INDEXED_MODELS = {
+    Employee: ('EMPLOYEE', _employee_entry),
+    Candidate: ('CANDIDATE', _candidate_entry),
+    Document: ('DOCUMENT', _document_entry),
+}
+
+ENTRY_FIELDS = ['title', 'subtitle', 'identifiers', 'body', 'updated_at']
+
+
+def _entry(entry_model, values, now):
+    for field in ('title', 'subtitle', 'identifiers'):
+        if field in values:
+            values[field] = values[field][:entry_model._meta.get_field(field).max_length]
+    return entry_model(updated_at=now, **values)
+
+
+def _write_entries(entry_model, instances, build, batch_size):
+    """Upsert des entrées d'index construites par build (un par lot)"""
+    now = timezone.now()
+    entries = [_entry(entry_model, build(instance), now) for instance in instances]
+    entry_model.objects.bulk_create(
+        entries,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=ENTRY_FIELDS,
+    )
+    return len(entries)
+
+
+def index_objects(instances, batch_size=500):
+    """Crée ou met à jour les entrées d'index d'objets indexés (un upsert par lot)"""
+    return _write_entries(SearchEntry, instances, lambda instance: INDEXED_MODELS[type(instance)][1](instance), batch_size)
+
+
+def remove_object(instance):
+    kind = INDEXED_MODELS[type(instance)][0]
+    SearchEntry.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def rebuild_index(batch_size=500, apps=None):
+    """
+    Reconstruit tout l'index ; retourne le nombre d'entrées par type.
+    apps : registre des modèles historiques (appel depuis une migration).
+    """
+    model_for = (lambda model: apps.get_model('apprh', model.__name__)) if apps else (lambda model: model)
+    entry_model = model_for(SearchEntry)
+    counts = {}
+    entry_model.objects.all().delete()
+    for model, (kind, build) in INDEXED_MODELS.items():
+        counts[kind] = 0
+        batch = []
+        for instance in model_for(model).objects.order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(instance)
+            if len(batch) >= batch_size:
+                counts[kind] += _write_entries(entry_model, batch, build, batch_size)
+                batch = []
+        counts[kind] += _write_entries(entry_model, batch, build, batch_size)
+    return counts
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+_fts_available = None
+
+
+def _sqlite_fts_available():
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = 'apprh_searchentry_fts' in connection.introspection.table_names()
+    return _fts_available
+
+
+def _ranked(queryset, query, terms):
+    """Filtre et classement selon le moteur de base de données"""
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.filter(RawSQL(
+            "(search_vector @@ to_tsquery('simple', %s) OR title %% %s OR identifiers %% %s)",
+            [tsquery, query, query],
+            output_field=BooleanField(),
+        )).annotate(rank=RawSQL(
+            "ts_rank(search_vector, to_tsquery('simple', %s)) + greatest(similarity(title, %s), similarity(identifiers, %s))",
+            [tsquery, query, query],
+            output_field=FloatField(),
+        ))
+
+    if connection.vendor == 'sqlite' and _sqlite_fts_available():
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(RawSQL(
+            'apprh_searchentry.id IN (SELECT rowid FROM apprh_searchentry_fts WHERE apprh_searchentry_fts MATCH %s)',
+            [match],
+            output_field=BooleanField(),
+        )).annotate(rank=RawSQL(
+            f'(SELECT -bm25(apprh_searchentry_fts, {FTS_WEIGHTS}) FROM apprh_searchentry_fts '
+            'WHERE apprh_searchentry_fts MATCH %s AND rowid = apprh_searchentry.id)',
+            [match],
+            output_field=FloatField(),
+        ))
+
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(title__icontains=term) | Q(subtitle__icontains=term)
+            | Q(identifiers__icontains=term) | Q(body__icontains=term)
+        )
+    return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def search(query, kinds=None, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Recherche dans l'index ; retourne le nombre total de résultats et la page
+    demandée, classée par pertinence.
+    """
+    terms = _terms(query)
+    if not terms:
+        return 0, []
+    queryset = SearchEntry.objects.all()
+    if kinds:
+        queryset = queryset.filter(kind__in=kinds)
+    queryset = _ranked(queryset, query.strip(), terms)
+    offset = (page - 1) * page_size
+    results = list(
+        queryset.order_by('-rank', 'title', 'pk')
+        .values('kind', 'object_id', 'title', 'subtitle', 'rank')[offset:offset + page_size]
+    )
+    count = len(results) + offset if len(results) < page_size and (results or page == 1) else queryset.count()
+    return count, results
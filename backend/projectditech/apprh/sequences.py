@@ -0,0 +1,84 @@
+"""
+Attribution des identifiants métier par séquence (matricules DITECHnnnn)
+
+Chaque séquence est une ligne IdSequence verrouillée (select_for_update)
+pendant l'incrément : deux embauches simultanées ne peuvent pas obtenir le
+même numéro, quel que soit le moteur de base de données. Un import peut
+réserver un bloc de numéros en une seule opération. Comme une séquence de
+base de données, un numéro réservé puis non utilisé (erreur d'enregistrement)
+n'est pas réattribué.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Employee, IdSequence
+
+
+EMPLOYEE_ID_PREFIX = 'DITECH'
+EMPLOYEE_SEQUENCE = 'employee_id'
+
+
+def _employee_number(employee_id):
+    """Numéro d'un matricule DITECHnnnn, None s'il n'est pas au format"""
+    suffix = employee_id[len(EMPLOYEE_ID_PREFIX):] if employee_id else ''
+    return int(suffix) if employee_id.startswith(EMPLOYEE_ID_PREFIX) and suffix.isdigit() else None
+
+
+def _initial_employee_number():
+    """Plus grand matricule existant : point de départ de la séquence lors de sa création"""
+    numbers = (
+        _employee_number(employee_id)
+        for employee_id in Employee.objects.filter(employee_id__startswith=EMPLOYEE_ID_PREFIX).values_list('employee_id', flat=True)
+    )
+    return max((number for number in numbers if number is not None), default=0)
+
+
+INITIAL_VALUES = {
+    EMPLOYEE_SEQUENCE: _initial_employee_number,
+}
+
+
+def allocate(name, count=1):
+    """
+    Réserve count valeurs consécutives de la séquence name et retourne la
+    première. La séquence est créée au premier appel (à partir des données
+    existantes si une valeur initiale est définie).
+    """
+    if count < 1:
+        raise ValueError('count doit être au moins 1')
+    with transaction.atomic():
+        sequence = IdSequence.objects.select_for_update().filter(name=name).first()
+        if sequence is None:
+            initial = INITIAL_VALUES.get(name, lambda: 0)()
+            IdSequence.objects.get_or_create(name=name, defaults={'last_value': initial})
+            sequence = IdSequence.objects.select_for_update().get(name=name)
+        IdSequence.objects.filter(pk=sequence.pk).update(last_value=F('last_value') + count, updated_at=timezone.now())
+        return sequence.last_value + 1
+
+
+def format_employee_id(number):
+    return f"{EMPLOYEE_ID_PREFIX}{number:04d}"
+
+
+def next_employee_id():
+    """Matricule suivant (DITECHnnnn)"""
+    return format_employee_id(allocate(EMPLOYEE_SEQUENCE))
+
+
+def allocate_employee_ids(count):
+    """Bloc de count matricules consécutifs, pour les imports en masse"""
+    first = allocate(EMPLOYEE_SEQUENCE, count)
+    return [format_employee_id(number) for number in range(first, first + count)]
+
+
+def reserve_employee_id(employee_id):
+    """Avance la séquence au-delà d'un matricule saisi manuellement pour qu'il ne soit pas réattribué"""
+    number = _employee_number(employee_id)
+    if number is None:
+        return
+    updated = IdSequence.objects.filter(name=EMPLOYEE_SEQUENCE, last_value__lt=number).update(last_value=number, updated_at=timezone.now())
+    if not updated and not IdSequence.objects.filter(name=EMPLOYEE_SEQUENCE).exists():
+        IdSequence.objects.get_or_create(
+            name=EMPLOYEE_SEQUENCE, defaults={'last_value': max(_initial_employee_number(), number)}
+        )
@@ -1,17 +1,90 @@
+import re
+
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import User, Employee, Service, EmployeeHistory, JobOffer, Candidate, Interview, LeaveRequest, LeaveBalance, Attendance, Contract, Payslip, PayslipBonus, PayslipDeduction, PaymentHistory, Document, PresenceTracking, TrainingPlan, Training, TrainingSession, Evaluation
 
 
-class UserSerializer(serializers.ModelSerializer):
+
+def _source_column(model, attrs, annotations):
+    """
+    Champ du modèle à charger pour la source d'un champ de sérialiseur : son
+    nom, '' si aucune colonne n'est nécessaire (annotation, relation inverse
+    ou plusieurs-à-plusieurs), None si on ne peut pas le déterminer (méthode
+    ou propriété du modèle).
+    """
+    name = attrs[0]
+    if name in annotations:
+        return ''
+    display = re.fullmatch(r'get_(\w+)_display', name)
+    if display:
+        name = display.group(1)
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if field.many_to_many or not field.concrete:
+        return ''
+    return field.name
+
+
+def _related_paths(tree, prefix=''):
+    """Chemins select_related ('employee', 'employee__service'...) d'un arbre query.select_related"""
+    for name, subtree in tree.items():
+        yield prefix + name
+        yield from _related_paths(subtree, f'{prefix}{name}__')
+
+
+class DynamicFieldsMixin:
+    """
+    Champs à la demande : fields (champs gardés) et omit (champs retirés),
+    transmis par les vues à partir de ?fields= et ?omit=.
+    """
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        unknown = (set(fields or ()) | set(omit or ())) - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({'error': f"Champ(s) inconnu(s) : {', '.join(sorted(unknown))}"})
+        for name in list(self.fields):
+            if (fields is not None and name not in fields) or (omit and name in omit):
+                self.fields.pop(name)
+
+    def restrict_queryset(self, queryset):
+        """
+        Queryset limité (only) aux colonnes des champs gardés et aux jointures
+        select_related qu'ils utilisent ; inchangé si ces colonnes ne peuvent
+        pas être déterminées (champ calculé par une méthode ou une propriété).
+        """
+        select_related = queryset.query.select_related
+        if select_related is True:
+            return queryset
+        columns = {queryset.model._meta.pk.name}
+        for field in self.fields.values():
+            if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+                return queryset
+            column = _source_column(queryset.model, field.source_attrs, queryset.query.annotations)
+            if column is None:
+                return queryset
+            if column:
+                columns.add(column)
+        # Une relation jointe ne peut pas être différée : les jointures inutiles sont retirées
+        joined = [path for path in _related_paths(select_related or {}) if path.split('__')[0] in columns]
+        queryset = queryset.select_related(None)
+        if joined:
+            queryset = queryset.select_related(*joined)
+        return queryset.only(*columns)
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'role', 'phone', 'first_name', 'last_name']
         read_only_fields = ['id']
 
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     manager_name = serializers.SerializerMethodField()
     employee_count = serializers.SerializerMethodField()
     
@@ -88,7 +161,7 @@ class ServiceSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     service_name = serializers.CharField(source='service.name', read_only=True)
     employee_id = serializers.CharField(read_only=True)  # L'ID est toujours généré automatiquement
@@ -99,7 +172,16 @@ class EmployeeSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at', 'employee_id']
 
 
-class EmployeeHistorySerializer(serializers.ModelSerializer):
+class EmployeeCompactSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Employé réduit pour les listes (sans le compte utilisateur imbriqué)"""
+    service_name = serializers.CharField(source='service.name', read_only=True, allow_null=True)
+    
+    class Meta:
+        model = Employee
+        fields = ['id', 'employee_id', 'first_name', 'last_name', 'email', 'position', 'service', 'service_name', 'is_active']
+
+
+class EmployeeHistorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     changed_by_name = serializers.CharField(source='changed_by.get_full_name', read_only=True)
     change_type_display = serializers.CharField(source='get_change_type_display', read_only=True)
     employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
@@ -111,7 +193,7 @@ class EmployeeHistorySerializer(serializers.ModelSerializer):
 
 
 
-class JobOfferSerializer(serializers.ModelSerializer):
+class JobOfferSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     department_name = serializers.CharField(source='department.name', read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -126,7 +208,7 @@ class JobOfferSerializer(serializers.ModelSerializer):
 
 
 # Serializer simplifié pour Candidate (évite la récursion avec InterviewSerializer)
-class CandidateSimpleSerializer(serializers.ModelSerializer):
+class CandidateSimpleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     job_offer_detail = JobOfferSerializer(source='job_offer', read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -142,7 +224,7 @@ class CandidateSimpleSerializer(serializers.ModelSerializer):
 
 
 # Serializer simplifié pour Interview (évite la récursion avec CandidateSerializer)
-class InterviewSimpleSerializer(serializers.ModelSerializer):
+class InterviewSimpleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     candidate_name = serializers.CharField(source='candidate.get_full_name', read_only=True)
     interviewer_name = serializers.CharField(source='interviewer.get_full_name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -158,7 +240,7 @@ class InterviewSimpleSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class CandidateSerializer(serializers.ModelSerializer):
+class CandidateSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     job_offer_detail = JobOfferSerializer(source='job_offer', read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -179,7 +261,7 @@ class CandidateSerializer(serializers.ModelSerializer):
         return None
 
 
-class InterviewSerializer(serializers.ModelSerializer):
+class InterviewSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     candidate_name = serializers.CharField(source='candidate.get_full_name', read_only=True)
     candidate_detail = serializers.SerializerMethodField()
     interviewer_name = serializers.SerializerMethodField()
@@ -253,7 +335,7 @@ class InterviewSerializer(serializers.ModelSerializer):
 
 
 
-class LeaveRequestSerializer(serializers.ModelSerializer):
+class LeaveRequestSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
     employee_detail = EmployeeSerializer(source='employee', read_only=True)
     leave_type_display = serializers.CharField(source='get_leave_type_display', read_only=True)
@@ -266,9 +348,31 @@ class LeaveRequestSerializer(serializers.ModelSerializer):
         model = LeaveRequest
         fields = '__all__'
         read_only_fields = ['created_at', 'updated_at', 'manager_approval_date', 'rh_approval_date']
+    
+    def validate(self, attrs):
+        """À la création, vérifie que l'absence laisse assez de collègues présents dans le service"""
+        if self.instance is None and attrs.get('employee') and attrs.get('start_date') and attrs.get('end_date'):
+            from .leaves import lock_services, staffing_conflicts, staffing_message
+            
+            if attrs['end_date'] < attrs['start_date']:
+                raise serializers.ValidationError({'end_date': 'La date de fin doit être postérieure à la date de début.'})
+            # Le verrou du service est gardé jusqu'à l'enregistrement (LeaveRequestViewSet.create est atomique)
+            with transaction.atomic():
+                lock_services([attrs['employee'].pk])
+                conflicts = staffing_conflicts(attrs['employee'].pk, attrs['start_date'], attrs['end_date'])
+            if conflicts:
+                raise serializers.ValidationError({
+                    'non_field_errors': [staffing_message(conflicts)],
+                    'conflicts': conflicts,
+                })
+        return attrs
 
 
-class LeaveBalanceSerializer(serializers.ModelSerializer):
+class LeaveRequestCompactSerializer(LeaveRequestSerializer):
+    employee_detail = EmployeeCompactSerializer(source='employee', read_only=True)
+
+
+class LeaveBalanceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
     remaining_annual = serializers.IntegerField(read_only=True)
     remaining_sick = serializers.IntegerField(read_only=True)
@@ -282,30 +386,35 @@ class LeaveBalanceSerializer(serializers.ModelSerializer):
         read_only_fields = ['updated_at']
     
     def get_monthly_leave(self, obj):
-        """Calcule le solde mensuel (congés annuels / 12)"""
+        """Jours acquis sur le mois (moteur d'acquisition), à défaut congés annuels / 12"""
         from decimal import Decimal
+        accrued = getattr(obj, 'accrued_monthly_days', None)
+        if accrued is not None:
+            return float(accrued)
         monthly = Decimal(obj.annual_leave) / Decimal(12)
         return float(monthly.quantize(Decimal('0.01')))
     
     def get_used_monthly(self, obj):
         """Calcule les congés mensuels utilisés pour le mois en cours"""
+        # Annotation posée par LeaveBalanceViewSet.get_queryset (mois/année en paramètre)
+        if hasattr(obj, 'used_monthly_days'):
+            return obj.used_monthly_days
+        
         from datetime import date
+        from django.db.models import Sum
         from .models import LeaveRequest
         
         today = date.today()
-        current_month = today.month
-        current_year = today.year
         
         # Calculer les congés annuels utilisés ce mois (statut RH_APPROVED)
-        monthly_requests = LeaveRequest.objects.filter(
-            employee=obj.employee,
+        total_days = LeaveRequest.objects.filter(
+            employee_id=obj.employee_id,
             leave_type='ANNUAL',
             status='RH_APPROVED',
-            start_date__year=current_year,
-            start_date__month=current_month
-        )
-        
-        total_days = sum(request.days for request in monthly_requests)
+            start_date__year=today.year,
+            start_date__month=today.month
+        ).aggregate(total=Sum('days'))['total'] or 0
+        obj.used_monthly_days = total_days
         return total_days
     
     def get_remaining_monthly(self, obj):
@@ -315,7 +424,7 @@ class LeaveBalanceSerializer(serializers.ModelSerializer):
         return float(monthly_leave - used_monthly)
 
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
     
     class Meta:
@@ -323,7 +432,7 @@ class AttendanceSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ContractSerializer(serializers.ModelSerializer):
+class ContractSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
     employee_detail = EmployeeSerializer(source='employee', read_only=True)
     is_expiring_soon = serializers.BooleanField(read_only=True)
@@ -333,16 +442,50 @@ class ContractSerializer(serializers.ModelSerializer):
     contract_type_display = serializers.CharField(source='get_contract_type_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     parent_contract_id = serializers.IntegerField(source='parent_contract.id', read_only=True, allow_null=True)
-    renewal_count = serializers.IntegerField(source='renewals.count', read_only=True)
+    renewal_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Contract
         fields = '__all__'
         read_only_fields = ['created_at', 'updated_at']
+    
+    def get_renewal_count(self, obj):
+        # Annotation posée par ContractViewSet.get_queryset
+        if hasattr(obj, 'renewals_total'):
+            return obj.renewals_total
+        return obj.renewals.count()
+
+
+class ContractCompactSerializer(ContractSerializer):
+    employee_detail = EmployeeCompactSerializer(source='employee', read_only=True)
+
+
+class ContractAlertSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Version légère pour les écrans d'alerte : champs annotés par contracts.with_expiry"""
+    employee_name = serializers.CharField(read_only=True)
+    service_name = serializers.CharField(read_only=True, allow_null=True)
+    contract_type_display = serializers.CharField(source='get_contract_type_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    days_until_expiry = serializers.SerializerMethodField()
+    alert_level = serializers.CharField(source='alert', read_only=True, allow_null=True)
+    is_expiring_soon = serializers.BooleanField(source='expires_soon', read_only=True)
+    is_expired = serializers.BooleanField(source='has_expired', read_only=True)
+    
+    class Meta:
+        model = Contract
+        fields = [
+            'id', 'employee', 'employee_name', 'service_name', 'contract_type', 'contract_type_display',
+            'position', 'start_date', 'end_date', 'salary', 'status', 'status_display', 'needs_renewal',
+            'auto_renewal', 'renewal_notice_days', 'parent_contract', 'days_until_expiry', 'alert_level',
+            'is_expiring_soon', 'is_expired',
+        ]
+    
+    def get_days_until_expiry(self, obj):
+        return obj.days_left.days if obj.days_left is not None else None
 
 
 
-class PayslipSerializer(serializers.ModelSerializer):
+class PayslipSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
     employee_detail = EmployeeSerializer(source='employee', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -355,7 +498,21 @@ class PayslipSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at', 'generated_at', 'sent_at', 'paid_at', 'gross_salary', 'net_salary']
 
 
-class PayslipBonusSerializer(serializers.ModelSerializer):
+class PayslipCompactSerializer(PayslipSerializer):
+    employee_detail = EmployeeCompactSerializer(source='employee', read_only=True)
+
+
+class PayslipSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Résumé de fiche de paie imbriqué dans les primes, retenues et paiements"""
+    employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = Payslip
+        fields = ['id', 'employee', 'employee_name', 'month', 'year', 'status', 'status_display', 'gross_salary', 'net_salary']
+
+
+class PayslipBonusSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     payslip_detail = PayslipSerializer(source='payslip', read_only=True)
     bonus_type_display = serializers.CharField(source='get_bonus_type_display', read_only=True)
     
@@ -365,7 +522,11 @@ class PayslipBonusSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class PayslipDeductionSerializer(serializers.ModelSerializer):
+class PayslipBonusCompactSerializer(PayslipBonusSerializer):
+    payslip_detail = PayslipSummarySerializer(source='payslip', read_only=True)
+
+
+class PayslipDeductionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     payslip_detail = PayslipSerializer(source='payslip', read_only=True)
     deduction_type_display = serializers.CharField(source='get_deduction_type_display', read_only=True)
     
@@ -375,7 +536,11 @@ class PayslipDeductionSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class PaymentHistorySerializer(serializers.ModelSerializer):
+class PayslipDeductionCompactSerializer(PayslipDeductionSerializer):
+    payslip_detail = PayslipSummarySerializer(source='payslip', read_only=True)
+
+
+class PaymentHistorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     payslip_detail = PayslipSerializer(source='payslip', read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     
@@ -385,7 +550,11 @@ class PaymentHistorySerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class DocumentSerializer(serializers.ModelSerializer):
+class PaymentHistoryCompactSerializer(PaymentHistorySerializer):
+    payslip_detail = PayslipSummarySerializer(source='payslip', read_only=True)
+
+
+class DocumentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     uploaded_by_username = serializers.CharField(source='uploaded_by.username', read_only=True)
     employee_full_name = serializers.CharField(source='employee.get_full_name', read_only=True)
     document_type_display = serializers.CharField(source='get_document_type_display', read_only=True)
@@ -410,7 +579,7 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
 
-class PresenceTrackingSerializer(serializers.ModelSerializer):
+class PresenceTrackingSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
     employee_detail = EmployeeSerializer(source='employee', read_only=True)
     service_name = serializers.CharField(source='employee.service.name', read_only=True)
@@ -435,7 +604,11 @@ class PresenceTrackingSerializer(serializers.ModelSerializer):
         return None
 
 
-class TrainingPlanSerializer(serializers.ModelSerializer):
+class PresenceTrackingCompactSerializer(PresenceTrackingSerializer):
+    employee_detail = EmployeeCompactSerializer(source='employee', read_only=True)
+
+
+class TrainingPlanSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
     employee_detail = EmployeeSerializer(source='employee', read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
@@ -448,7 +621,7 @@ class TrainingPlanSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class TrainingSerializer(serializers.ModelSerializer):
+class TrainingSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
     employee_detail = EmployeeSerializer(source='employee', read_only=True)
     training_plan_detail = TrainingPlanSerializer(source='training_plan', read_only=True)
@@ -462,7 +635,7 @@ class TrainingSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class TrainingSessionSerializer(serializers.ModelSerializer):
+class TrainingSessionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     training_detail = TrainingSerializer(source='training', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     
@@ -472,7 +645,7 @@ class TrainingSessionSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class EvaluationSerializer(serializers.ModelSerializer):
+class EvaluationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
     employee_detail = EmployeeSerializer(source='employee', read_only=True)
     evaluated_by_name = serializers.CharField(source='evaluated_by.get_full_name', read_only=True)
@@ -487,6 +660,10 @@ class EvaluationSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at', 'approval_date', 'performance_score']
 
 
+class EvaluationCompactSerializer(EvaluationSerializer):
+    employee_detail = EmployeeCompactSerializer(source='employee', read_only=True)
+
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Serializer personnalisé pour inclure les informations utilisateur dans le token"""
     
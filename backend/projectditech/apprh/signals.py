@@ -1,7 +1,13 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Employee, EmployeeHistory
+from .models import Employee, Service, Payslip, LeaveRequest, PresenceTracking, Candidate, Document, Contract, EmployeeHistory, Evaluation, EmploymentInterval
+from .analytics import grouping_changed, invalidate_salary_analytics
+from .absences import invalidate_leave_calendar
+from .history import record_changes, take_snapshot
+from . import search
+from .dossier import MODEL_SECTIONS, invalidate_dossier
+from .workforce import intervals_changed, intervals_for, rebuild_intervals
 
 User = get_user_model()
 
@@ -10,75 +16,140 @@ User = get_user_model()
 def track_employee_changes(sender, instance, **kwargs):
     """Enregistre les changements dans l'historique avant la sauvegarde"""
     if instance.pk:  # Si l'employé existe déjà (modification)
-        try:
-            old_instance = Employee.objects.get(pk=instance.pk)
-            
-            # Vérifier les changements de poste
-            if old_instance.position != instance.position:
-                EmployeeHistory.objects.create(
-                    employee=instance,
-                    change_type='POSITION',
-                    field_name='position',
-                    old_value=old_instance.position,
-                    new_value=instance.position,
-                    description=f'Changement de poste de "{old_instance.position}" à "{instance.position}"',
-                    changed_by=getattr(instance, '_changed_by', None)
-                )
-            
-            # Vérifier les changements de salaire
-            if old_instance.salary != instance.salary:
-                EmployeeHistory.objects.create(
-                    employee=instance,
-                    change_type='SALARY',
-                    field_name='salary',
-                    old_value=str(old_instance.salary),
-                    new_value=str(instance.salary),
-                    description=f'Changement de salaire de {old_instance.salary:,.0f} FCFA à {instance.salary:,.0f} FCFA',
-                    changed_by=getattr(instance, '_changed_by', None)
-                )
-            
-            # Vérifier les changements de service
-            if old_instance.service != instance.service:
-                old_service = old_instance.service.name if old_instance.service else 'Non assigné'
-                new_service = instance.service.name if instance.service else 'Non assigné'
-                EmployeeHistory.objects.create(
-                    employee=instance,
-                    change_type='SERVICE',
-                    field_name='service',
-                    old_value=old_service,
-                    new_value=new_service,
-                    description=f'Changement de service de "{old_service}" à "{new_service}"',
-                    changed_by=getattr(instance, '_changed_by', None)
-                )
-            
-            # Vérifier les changements de statut (actif/inactif)
-            if old_instance.is_active != instance.is_active:
-                status_old = 'Actif' if old_instance.is_active else 'Inactif'
-                status_new = 'Actif' if instance.is_active else 'Inactif'
-                EmployeeHistory.objects.create(
-                    employee=instance,
-                    change_type='STATUS',
-                    field_name='is_active',
-                    old_value=status_old,
-                    new_value=status_new,
-                    description=f'Changement de statut de "{status_old}" à "{status_new}"',
-                    changed_by=getattr(instance, '_changed_by', None)
-                )
-            
-            # Vérifier les autres changements d'informations personnelles
-            fields_to_track = ['first_name', 'last_name', 'email', 'phone', 'address', 'date_of_birth', 'date_of_hire']
-            for field in fields_to_track:
-                old_value = getattr(old_instance, field, None)
-                new_value = getattr(instance, field, None)
-                if old_value != new_value:
-                    EmployeeHistory.objects.create(
-                        employee=instance,
-                        change_type='INFO',
-                        field_name=field,
-                        old_value=str(old_value) if old_value else '',
-                        new_value=str(new_value) if new_value else '',
-                        description=f'Modification de {field}: "{old_value}" → "{new_value}"',
-                        changed_by=getattr(instance, '_changed_by', None)
-                    )
-        except Employee.DoesNotExist:
-            pass  # Nouvel employé, pas d'historique à créer
+        update_fields = kwargs.get('update_fields')
+        for service_id in record_changes([instance], fields=update_fields):
+            # L'employé quitte le calendrier des absences de son ancien service
+            invalidate_leave_calendar(service_id)
+
+
+@receiver(post_save, sender=Payslip)
+@receiver(post_delete, sender=Payslip)
+def invalidate_payslip_analytics(sender, instance, **kwargs):
+    """Invalide le cache des analyses salariales de l'année de la fiche"""
+    invalidate_salary_analytics(instance.year)
+
+
+@receiver(pre_save, sender=Employee)
+def detect_grouping_change(sender, instance, update_fields=None, **kwargs):
+    """Repère avant la sauvegarde un changement de service ou de poste (regroupements des analyses)"""
+    instance._grouping_changed = instance.pk is not None and grouping_changed(instance, update_fields)
+
+
+@receiver(post_save, sender=Employee)
+def invalidate_employee_analytics(sender, instance, **kwargs):
+    """Les fiches de l'employé passent dans un autre regroupement, pour toutes les années"""
+    if getattr(instance, '_grouping_changed', False):
+        invalidate_salary_analytics()
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_service_analytics(sender, instance, **kwargs):
+    """Les analyses par service sont libellées par le nom du service"""
+    invalidate_salary_analytics()
+
+
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+@receiver(post_save, sender=PresenceTracking)
+@receiver(post_delete, sender=PresenceTracking)
+def invalidate_absence_calendar(sender, instance, **kwargs):
+    """Invalide le calendrier des absences du service de l'employé"""
+    service_id = Employee.objects.filter(pk=instance.employee_id).values_list('service_id', flat=True).first()
+    invalidate_leave_calendar(service_id)
+
+
+@receiver(post_save, sender=Employee)
+def invalidate_employee_calendar(sender, instance, **kwargs):
+    """Un employé embauché, désactivé ou muté modifie les lignes du calendrier"""
+    invalidate_leave_calendar(instance.service_id)
+
+
+@receiver(pre_save, sender=Employee)
+def detect_employment_change(sender, instance, **kwargs):
+    """Repère avant la sauvegarde (l'instantané est encore l'état chargé) un changement d'embauche, de sortie ou de statut"""
+    instance._intervals_changed = instance.pk is not None and intervals_changed(instance)
+
+
+@receiver(post_save, sender=Employee)
+def refresh_employment_intervals(sender, instance, created, **kwargs):
+    """Périodes d'emploi : créées avec l'employé, recalculées quand elles peuvent changer"""
+    if created:
+        EmploymentInterval.objects.bulk_create(intervals_for(instance))
+    elif getattr(instance, '_intervals_changed', True):
+        rebuild_intervals([instance.pk])
+
+
+@receiver(post_save, sender=Employee)
+def refresh_employee_snapshot(sender, instance, update_fields=None, **kwargs):
+    """Les valeurs enregistrées deviennent l'état de référence de la prochaine modification"""
+    if update_fields is None:
+        take_snapshot(instance)
+    else:
+        take_snapshot(instance, {
+            field.attname: getattr(instance, field.attname)
+            for field in (sender._meta.get_field(name) for name in update_fields)
+        })
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_save, sender=Candidate)
+@receiver(post_save, sender=Document)
+def update_search_index(sender, instance, **kwargs):
+    """Met à jour l'entrée de recherche globale de l'objet"""
+    search.index_objects([instance])
+
+
+@receiver(post_delete, sender=Employee)
+@receiver(post_delete, sender=Candidate)
+@receiver(post_delete, sender=Document)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_object(instance)
+
+
+@receiver(post_save, sender=Employee)
+def invalidate_employee_dossier(sender, instance, **kwargs):
+    """Les informations et l'historique du dossier changent avec l'employé"""
+    invalidate_dossier(instance.pk)
+
+
+@receiver(post_save, sender=Service)
+def invalidate_service_dossiers(sender, instance, created, **kwargs):
+    """Le nom du service figure dans les informations du dossier de ses employés"""
+    if not created:
+        for employee_id in instance.employees.values_list('pk', flat=True):
+            invalidate_dossier(employee_id, ['employee'])
+
+
+@receiver(post_delete, sender=Service)
+def invalidate_unassigned_dossiers(sender, instance, **kwargs):
+    """Les employés du service supprimé sont désassignés sans signaux : invalidation globale"""
+    invalidate_dossier(sections=['employee'])
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_dossier(sender, instance, created, update_fields=None, **kwargs):
+    """Le compte utilisateur est repris dans les informations du dossier (sauf la date de connexion)"""
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    employee_id = Employee.objects.filter(user=instance).values_list('pk', flat=True).first()
+    if employee_id is not None:
+        invalidate_dossier(employee_id, ['employee'])
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+@receiver(post_save, sender=EmployeeHistory)
+@receiver(post_delete, sender=EmployeeHistory)
+@receiver(post_save, sender=Evaluation)
+@receiver(post_delete, sender=Evaluation)
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+@receiver(post_save, sender=PresenceTracking)
+@receiver(post_delete, sender=PresenceTracking)
+def invalidate_dossier_section(sender, instance, **kwargs):
+    """Invalide la section du dossier de l'employé correspondant à la ligne modifiée"""
+    if instance.employee_id is not None:
+        invalidate_dossier(instance.employee_id, MODEL_SECTIONS[sender])
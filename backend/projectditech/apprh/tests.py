@@ -1,3 +1,590 @@
-from django.test import TestCase
+from datetime import date, datetime
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .history import bulk_update_employees, suppress_history
+from .models import User, Service, Employee, EmployeeHistory, EmployeeSnapshot, IdSequence, Attendance, LeaveRequest, LeaveBalance, LeaveAccrualRule
+from .sequences import allocate_employee_ids, next_employee_id
+from . import search, timeline, usernames
+from .workforce import employment_periods
+
+
+class LeaveBalanceListQueriesTest(APITestCase):
+    """La liste des soldes ne doit pas faire une requête par employé"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='rh', password='rh', role='RH')
+        cls.month = date(2026, 3, 1)
+        for i in range(5):
+            user = User.objects.create_user(username=f'employe{i}', role='EMPLOYE')
+            employee = Employee.objects.create(
+                user=user,
+                first_name=f'Prénom{i}',
+                last_name='Nom',
+                email=f'employe{i}@example.ci',
+                phone='0102030405',
+                position='Agent',
+                date_of_hire=date(2020, 1, 1),
+                salary=300000,
+            )
+            LeaveBalance.objects.get_or_create(employee=employee)
+            LeaveRequest.objects.create(
+                employee=employee,
+                leave_type='ANNUAL',
+                start_date=cls.month,
+                end_date=date(2026, 3, 1 + i),
+                days=i + 1,
+                reason='Congé',
+                status='RH_APPROVED',
+            )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_list_uses_constant_number_of_queries(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/ditech/leave-balances/', {'month': 3, 'year': 2026})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 5)
+
+    def test_used_monthly_for_requested_period(self):
+        response = self.client.get('/ditech/leave-balances/', {'month': 3, 'year': 2026})
+        used = sorted(row['used_monthly'] for row in response.data)
+        self.assertEqual(used, [1, 2, 3, 4, 5])
+
+        response = self.client.get('/ditech/leave-balances/', {'month': 4, 'year': 2026})
+        self.assertEqual([row['used_monthly'] for row in response.data], [0] * 5)
+
+
+class BulkApproveStaffingTest(APITestCase):
+    """Les absences déjà approuvées (en base ou plus tôt dans le lot) comptent pour l'effectif minimum"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='rh', password='rh', role='RH')
+        service = Service.objects.create(name='Comptabilité', min_staff_present=2)
+        cls.requests = []
+        for i in range(4):
+            user = User.objects.create_user(username=f'employe{i}', role='EMPLOYE')
+            employee = Employee.objects.create(
+                user=user,
+                first_name='Jean',
+                last_name='Kouassi',
+                email=f'employe{i}@example.ci',
+                phone='0102030405',
+                position='Comptable',
+                date_of_hire=date(2020, 1, 1),
+                salary=300000,
+                service=service,
+            )
+            if i < 3:
+                cls.requests.append(LeaveRequest.objects.create(
+                    employee=employee,
+                    leave_type='ANNUAL',
+                    start_date=date(2027, 3, 1),
+                    end_date=date(2027, 3, 1),
+                    days=1,
+                    reason='Congé',
+                ))
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_batch_cannot_go_below_minimum(self):
+        # Formulaire : identifiants répétés
+        response = self.client.post('/ditech/leave-requests/bulk_approve/', {
+            'ids': [leave_request.pk for leave_request in self.requests],
+            'level': 'manager',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['succeeded'], 2)
+        failed = [result for result in response.data['results'] if not result['success']]
+        self.assertEqual([result['id'] for result in failed], [self.requests[2].pk])
+        self.assertEqual(failed[0]['conflicts'][0]['present'], 1)
+        self.assertEqual(LeaveRequest.objects.filter(status='MANAGER_APPROVED').count(), 2)
+
+    def test_single_approve_stops_at_minimum(self):
+        for leave_request in self.requests[:2]:
+            response = self.client.post(f'/ditech/leave-requests/{leave_request.pk}/approve_manager/')
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post(f'/ditech/leave-requests/{self.requests[2].pk}/approve_manager/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['conflicts'][0]['present'], 1)
+        self.requests[2].refresh_from_db()
+        self.assertEqual(self.requests[2].status, 'PENDING')
+
+
+class EmploymentPeriodsTest(SimpleTestCase):
+    """Périodes d'emploi dérivées de l'embauche, de la sortie et des changements de statut"""
+
+    hire = date(2024, 1, 1)
+
+    def test_active_without_history(self):
+        self.assertEqual(employment_periods(self.hire, None, True, date(2026, 5, 1)), [(self.hire, None)])
+
+    def test_exit_date_overrides_deactivation_day(self):
+        changes = [(date(2026, 10, 19), True, False)]
+        periods = employment_periods(self.hire, date(2026, 9, 30), False, date(2026, 10, 19), changes)
+        self.assertEqual(periods, [(self.hire, date(2026, 9, 30))])
+
+    def test_exit_date_kept_after_reactivation(self):
+        changes = [(date(2026, 10, 19), True, False), (date(2026, 10, 19), False, True)]
+        periods = employment_periods(self.hire, date(2026, 9, 30), True, date(2026, 10, 19), changes)
+        self.assertEqual(periods, [(self.hire, date(2026, 9, 30)), (date(2026, 10, 19), None)])
+
+    def test_reactivation_on_exit_day_opens_new_period(self):
+        changes = [(date(2026, 3, 1), True, False), (date(2026, 6, 1), False, True)]
+        periods = employment_periods(self.hire, date(2026, 6, 1), True, date(2026, 6, 1), changes)
+        self.assertEqual(periods, [(self.hire, date(2026, 6, 1)), (date(2026, 6, 1), None)])
+
+    def test_planned_exit_closes_current_period(self):
+        periods = employment_periods(self.hire, date(2027, 1, 31), True, date(2026, 5, 1))
+        self.assertEqual(periods, [(self.hire, date(2027, 1, 31))])
+
+    def test_deactivation_without_history_uses_last_update(self):
+        periods = employment_periods(self.hire, None, False, date(2026, 5, 1))
+        self.assertEqual(periods, [(self.hire, date(2026, 5, 1))])
+
+
+class EmploymentIntervalSignalsTest(APITestCase):
+    """Les périodes d'emploi suivent les désactivations et réintégrations enregistrées"""
+
+    def test_exit_then_rehire(self):
+        user = User.objects.create_user(username='employe', role='EMPLOYE')
+        employee = Employee.objects.create(
+            user=user,
+            first_name='Awa',
+            last_name='Koné',
+            email='awa@example.ci',
+            phone='0102030405',
+            position='Agent',
+            date_of_hire=date(2024, 1, 1),
+            salary=300000,
+        )
+        today = timezone.localdate()
+        employee.is_active = False
+        employee.date_of_exit = date(2024, 9, 30)
+        employee.save()
+        employee.is_active = True
+        employee.save()
+
+        periods = list(employee.employment_intervals.values_list('start_date', 'end_date'))
+        self.assertEqual(periods, [(date(2024, 1, 1), date(2024, 9, 30)), (today, None)])
+
+
+class AccrueLeaveCommandTest(TestCase):
+    """Le calcul d'un seul mois ne remplace pas le droit annuel existant"""
+
+    @classmethod
+    def setUpTestData(cls):
+        LeaveAccrualRule.objects.create(name='Code du travail', monthly_days=Decimal('2.08'), effective_from=date(2020, 1, 1))
+        user = User.objects.create_user(username='employe', role='EMPLOYE')
+        cls.employee = Employee.objects.create(
+            user=user,
+            first_name='Awa',
+            last_name='Koné',
+            email='awa@example.ci',
+            phone='0102030405',
+            position='Agent',
+            date_of_hire=date(2020, 1, 1),
+            salary=300000,
+        )
+        LeaveBalance.objects.get_or_create(employee=cls.employee)
+
+    def test_current_month_keeps_balance(self):
+        call_command('accrue_leave', stdout=StringIO())
+        balance = LeaveBalance.objects.get(employee=self.employee)
+        self.assertEqual(balance.annual_leave, 25)
+
+    def test_full_year_replay_syncs_balance(self):
+        today = timezone.now().date()
+        call_command('accrue_leave', '--from', f'{today.year}-01', stdout=StringIO())
+        balance = LeaveBalance.objects.get(employee=self.employee)
+        self.assertEqual(balance.annual_leave, int(Decimal('2.08') * today.month))
+
+
+class BulkEmployeeHistoryTest(TestCase):
+    """Les mises à jour en masse écrivent l'historique par lots, sauf dans suppress_history"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            user = User.objects.create_user(username=f'employe{i}', role='EMPLOYE')
+            Employee.objects.create(
+                user=user,
+                first_name=f'Prénom{i}',
+                last_name='Nom',
+                email=f'employe{i}@example.ci',
+                phone='0102030405',
+                position='Agent',
+                date_of_hire=date(2020, 1, 1),
+                salary=300000,
+            )
+
+    def test_bulk_update_writes_history(self):
+        employees = list(Employee.objects.order_by('pk'))
+        for employee in employees:
+            employee.salary = 350000
+        employees[0].position = 'Chef d\'équipe'
+        bulk_update_employees(employees, ['salary', 'position'])
+
+        self.assertEqual(set(Employee.objects.values_list('salary', flat=True)), {350000})
+        history = EmployeeHistory.objects.order_by('employee_id', 'field_name')
+        self.assertEqual(
+            list(history.values_list('employee_id', 'change_type')),
+            [(employees[0].pk, 'POSITION'), (employees[0].pk, 'SALARY')]
+            + [(employee.pk, 'SALARY') for employee in employees[1:]],
+        )
+        self.assertEqual(history.first().new_value, 'Chef d\'équipe')
+
+    def test_suppressed_history(self):
+        employees = list(Employee.objects.order_by('pk'))
+        for employee in employees:
+            employee.salary = 400000
+        with suppress_history():
+            bulk_update_employees(employees, ['salary'])
+            employees[0].position = 'Comptable'
+            employees[0].save()
+
+        self.assertEqual(set(Employee.objects.values_list('salary', flat=True)), {400000})
+        self.assertEqual(Employee.objects.get(pk=employees[0].pk).position, 'Comptable')
+        self.assertFalse(EmployeeHistory.objects.exists())
+
+
+class EmployeeIdSequenceTest(TestCase):
+    """Matricules attribués par la séquence, sans réattribuer un matricule saisi manuellement"""
+
+    def create_employee(self, index, employee_id=''):
+        user = User.objects.create_user(username=f'employe{index}', role='EMPLOYE')
+        return Employee.objects.create(
+            user=user,
+            employee_id=employee_id,
+            first_name=f'Prénom{index}',
+            last_name='Nom',
+            email=f'employe{index}@example.ci',
+            phone='0102030405',
+            position='Agent',
+            date_of_hire=date(2020, 1, 1),
+            salary=300000,
+        )
+
+    def test_allocation_after_manual_ids(self):
+        self.create_employee(0, 'DITECH0007')
+        self.assertEqual(self.create_employee(1).employee_id, 'DITECH0008')
+        self.assertEqual(allocate_employee_ids(2), ['DITECH0009', 'DITECH0010'])
+
+        self.create_employee(2, 'DITECH0050')
+        self.assertEqual(self.create_employee(3).employee_id, 'DITECH0051')
+        # Un matricule manuel inférieur ne fait pas reculer la séquence
+        self.create_employee(4, 'DITECH0020')
+        self.assertEqual(self.create_employee(5).employee_id, 'DITECH0052')
+
+    def test_sequence_starts_after_existing_ids(self):
+        self.create_employee(0, 'DITECH0042')
+        IdSequence.objects.all().delete()
+        self.assertEqual(next_employee_id(), 'DITECH0043')
+
+
+class EmployeeImportTest(APITestCase):
+    """Le fichier est validé en entier : une seule ligne invalide et rien n'est créé"""
+
+    header = 'first_name;last_name;email;phone;position;date_of_hire;service;badge_id\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='rh', password='rh', role='RH')
+        Service.objects.create(name='Comptabilité')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def upload(self, lines):
+        content = (self.header + ''.join(lines)).encode()
+        return self.client.post(
+            '/ditech/employees/import_employees/',
+            {'file': SimpleUploadedFile('employes.csv', content, content_type='text/csv')},
+            format='multipart',
+        )
+
+    def test_invalid_rows_reject_whole_file(self):
+        response = self.upload([
+            'Jean;Kouassi;jean.kouassi@example.ci;0102030405;Comptable;01/03/2024;Comptabilité;B1\n',
+            'Awa;Koné;awa.kone@example.ci;0102030405;Agent;31/02/2024;Comptabilité;B2\n',
+            'Paul;Yao;paul.yao@example.ci;0102030405;Agent;01/03/2024;Logistique;B3\n',
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 4])
+        self.assertFalse(Employee.objects.exists())
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_valid_file_creates_employees(self):
+        response = self.upload([
+            'Jean;Kouassi;kouassi@example.ci;0102030405;Comptable;01/03/2024;Comptabilité;B1\n',
+            'Jeanne;Kouassi;kouassi@example.com;0102030405;Agent;2024-03-01;;B2\n',
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(
+            list(Employee.objects.order_by('pk').values_list('user__username', 'service__name', 'date_of_hire')),
+            [('kouassi', 'Comptabilité', date(2024, 3, 1)), ('kouassi1', None, date(2024, 3, 1))],
+        )
+        self.assertEqual(LeaveBalance.objects.count(), 2)
+
+
+class UsernameAllocationTest(TestCase):
+    """Premier suffixe libre par base, nouvelle attribution après un conflit concurrent"""
+
+    def test_repeated_bases(self):
+        User.objects.create_user(username='kouassi', role='EMPLOYE')
+        User.objects.create_user(username='kouassi1', role='EMPLOYE')
+        self.assertEqual(usernames.allocate_usernames(['kouassi', 'kone', 'kouassi']), ['kouassi2', 'kone', 'kouassi3'])
+
+    def test_bulk_create_retries_after_conflict(self):
+        allocate_usernames = usernames.allocate_usernames
+        calls = []
+
+        def allocate_then_conflict(bases):
+            allocated = allocate_usernames(bases)
+            if not calls:
+                # Création concurrente entre l'attribution et l'insertion
+                User.objects.create_user(username=allocated[0], role='EMPLOYE')
+            calls.append(allocated)
+            return allocated
+
+        users = [User(role='EMPLOYE'), User(role='EMPLOYE')]
+        with mock.patch.object(usernames, 'allocate_usernames', side_effect=allocate_then_conflict):
+            usernames.bulk_create_users(users, ['kouassi', 'kone'])
+
+        self.assertEqual(calls, [['kouassi', 'kone'], ['kouassi1', 'kone']])
+        self.assertEqual([user.username for user in users], ['kouassi1', 'kone'])
+        self.assertEqual(User.objects.filter(username__in=['kouassi', 'kouassi1', 'kone']).count(), 3)
+
+
+class SearchTest(TestCase):
+    """Recherche par préfixe, classée par pertinence (titre et identifiants avant le sous-titre)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        people = [
+            ('Awa', 'Koné', 'Assistante de M. Kouassi', 'DITECH0101'),
+            ('Jean', 'Kouassi', 'Comptable', 'DITECH0102'),
+            ('Paul', 'Yao', 'Chauffeur', 'DITECH0103'),
+        ]
+        cls.employees = {}
+        for index, (first_name, last_name, position, employee_id) in enumerate(people):
+            user = User.objects.create_user(username=f'employe{index}', role='EMPLOYE')
+            cls.employees[last_name] = Employee.objects.create(
+                user=user,
+                employee_id=employee_id,
+                first_name=first_name,
+                last_name=last_name,
+                email=f'employe{index}@example.ci',
+                phone='0102030405',
+                position=position,
+                date_of_hire=date(2020, 1, 1),
+                salary=300000,
+            )
+
+    def test_prefix_ranked_by_field(self):
+        count, results = search.search('kouas')
+        self.assertEqual(count, 2)
+        self.assertEqual(
+            [result['object_id'] for result in results],
+            [self.employees['Kouassi'].pk, self.employees['Koné'].pk],
+        )
+
+    def test_identifier_and_kind_filter(self):
+        count, results = search.search('DITECH0103', kinds=['EMPLOYEE'])
+        self.assertEqual([result['object_id'] for result in results], [self.employees['Yao'].pk])
+        self.assertEqual(search.search('DITECH0103', kinds=['CANDIDATE']), (0, []))
+
+    @skipUnless(connection.vendor == 'sqlite', 'Index FTS5 de SQLite')
+    def test_sqlite_fts_index_used(self):
+        self.assertTrue(search._sqlite_fts_available())
+        _, results = search.search('kouas')
+        self.assertTrue(all(result['rank'] > 0 for result in results))
+
+        # Sans FTS5 : filtres icontains, sans classement
+        with mock.patch.object(search, '_sqlite_fts_available', return_value=False):
+            count, results = search.search('kouassi')
+        self.assertEqual(count, 2)
+        self.assertEqual({result['rank'] for result in results}, {0.0})
+
+
+class SparseFieldsTest(APITestCase):
+    """?fields= et ?omit= réduisent la réponse et les colonnes lues"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='rh', password='rh', role='RH')
+        user = User.objects.create_user(username='employe', role='EMPLOYE')
+        employee = Employee.objects.create(
+            user=user,
+            first_name='Awa',
+            last_name='Koné',
+            email='awa@example.ci',
+            phone='0102030405',
+            position='Agent',
+            date_of_hire=date(2020, 1, 1),
+            salary=300000,
+        )
+        for day in (2, 3):
+            LeaveRequest.objects.create(
+                employee=employee,
+                leave_type='ANNUAL',
+                start_date=date(2027, 3, day),
+                end_date=date(2027, 3, day),
+                days=1,
+                reason='Congé',
+            )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_fields_restrict_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/ditech/leave-requests/', {'fields': 'id,status'})
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([set(row) for row in rows], [{'id', 'status'}] * 2)
+        selects = [query['sql'] for query in queries.captured_queries if 'apprh_leaverequest' in query['sql']]
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('reason', selects[0])
+        self.assertNotIn('JOIN', selects[0])
+
+    def test_omit_and_unknown_fields(self):
+        response = self.client.get('/ditech/leave-requests/', {'omit': 'reason,employee_detail'})
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertNotIn('reason', rows[0])
+        self.assertNotIn('employee_detail', rows[0])
+        self.assertIn('status', rows[0])
+
+        response = self.client.get('/ditech/leave-requests/', {'fields': 'id,inconnu'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(API_MAX_ROWS=3, API_PAGINATION_COMPAT=True)
+class ListPaginationTest(APITestCase):
+    """Liste nue plafonnée sans paramètre (compatibilité), pages plafonnées sinon"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='rh', password='rh', role='RH')
+        user = User.objects.create_user(username='employe', role='EMPLOYE')
+        employee = Employee.objects.create(
+            user=user,
+            first_name='Awa',
+            last_name='Koné',
+            email='awa@example.ci',
+            phone='0102030405',
+            position='Agent',
+            date_of_hire=date(2020, 1, 1),
+            salary=300000,
+        )
+        for day in range(1, 6):
+            LeaveRequest.objects.create(
+                employee=employee,
+                leave_type='ANNUAL',
+                start_date=date(2027, 3, day),
+                end_date=date(2027, 3, day),
+                days=1,
+                reason='Congé',
+            )
+            Attendance.objects.create(employee=employee, date=date(2026, 3, day), is_present=True)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_compat_list_truncated(self):
+        response = self.client.get('/ditech/leave-requests/')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(response['X-Truncated'], 'true')
+        self.assertEqual(response['X-Max-Rows'], '3')
+
+    def test_page_number_pagination_capped(self):
+        response = self.client.get('/ditech/leave-requests/', {'page_size': 2})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        self.assertFalse(response.has_header('X-Truncated'))
+
+        response = self.client.get('/ditech/leave-requests/', {'page_size': 50})
+        self.assertEqual(len(response.data['results']), 3)
+
+    @override_settings(API_PAGINATION_COMPAT=False)
+    def test_paginated_without_compat(self):
+        response = self.client.get('/ditech/leave-requests/')
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_cursor_pagination(self):
+        response = self.client.get('/ditech/attendances/', {'page_size': 2})
+        self.assertNotIn('count', response.data)
+        self.assertEqual([row['date'] for row in response.data['results']], ['2026-03-05', '2026-03-04'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['date'] for row in response.data['results']], ['2026-03-03', '2026-03-02'])
+
+
+class EmployeeAsOfTest(TestCase):
+    """État à une date reconstruit depuis l'historique, avec ou sans point de reprise"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='employe', role='EMPLOYE')
+        Employee.objects.create(
+            user=user,
+            first_name='Awa',
+            last_name='Koné',
+            email='awa@example.ci',
+            phone='0102030405',
+            position='Agent',
+            date_of_hire=date(2020, 1, 1),
+            salary=300000,
+        )
+        employee = Employee.objects.get()
+        employee.position = 'Comptable'
+        employee.salary = 350000
+        employee.save()
+        timeline.take_snapshots()
+        employee.salary = 400000
+        employee.save()
+
+        # Promotion le 1er juin, point de reprise le 1er juillet, augmentation le 1er septembre
+        EmployeeHistory.objects.filter(Q(field_name='position') | Q(field_name='salary', new_value__startswith='350000')).update(
+            changed_at=timezone.make_aware(datetime(2025, 6, 1, 10))
+        )
+        EmployeeSnapshot.objects.update(taken_at=timezone.make_aware(datetime(2025, 7, 1)))
+        EmployeeHistory.objects.filter(field_name='salary', new_value__startswith='400000').update(
+            changed_at=timezone.make_aware(datetime(2025, 9, 1, 10))
+        )
+        cls.employee = employee
+
+    def values(self, day):
+        return timeline.employee_as_of(Employee.objects.select_related('service').get(), day)['values']
+
+    def test_with_snapshot(self):
+        before = self.values(date(2025, 5, 31))
+        self.assertEqual((before['position'], before['salary']), ('Agent', Decimal('300000')))
+        self.assertIsNone(before['date_of_exit'])
+        self.assertEqual(self.values(date(2025, 6, 1))['position'], 'Comptable')
+        self.assertEqual(self.values(date(2025, 8, 1))['salary'], Decimal('350000'))
+        self.assertEqual(self.values(date(2025, 12, 31))['salary'], Decimal('400000'))
+
+    def test_without_snapshot(self):
+        EmployeeSnapshot.objects.all().delete()
+        before = self.values(date(2025, 5, 31))
+        self.assertEqual((before['position'], before['salary']), ('Agent', Decimal('300000')))
+        self.assertEqual(self.values(date(2025, 8, 1))['salary'], Decimal('350000'))
+        self.assertEqual(self.values(date(2025, 12, 31))['salary'], Decimal('400000'))
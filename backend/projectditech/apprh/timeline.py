@@ -0,0 +1,216 @@
+"""
+État des employés à une date (audits : poste, salaire, service... au JJ/MM/AAAA)
+
+L'état est reconstruit à partir de la base la plus proche de la date :
+- le dernier point de reprise (EmployeeSnapshot) antérieur, complété par la
+  dernière modification de chaque champ entre ce point et la date ;
+- à défaut, le premier point de reprise postérieur (ou l'état actuel),
+  corrigé par l'ancienne valeur de la première modification de chaque champ
+  après la date.
+Chaque correction est lue par une requête fenêtrée (ROW_NUMBER partitionné
+par employé et champ, ordonné par changed_at) appuyée sur l'index
+(employee, field_name, changed_at) : le nombre de requêtes ne dépend ni du
+nombre d'employés ni de la longueur de l'historique, et les lignes lues
+sont bornées par les points de reprise.
+
+Les valeurs suivent le format de EmployeeHistory : le service est connu par
+son nom au moment du changement.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .history import NOT_ASSIGNED, TRACKED_FIELDS, _status
+from .models import Employee, EmployeeHistory, EmployeeSnapshot
+
+
+FIELD_NAMES = [field.name for field in TRACKED_FIELDS]
+
+
+def _decimal(text):
+    try:
+        return Decimal(text) if text else None
+    except InvalidOperation:
+        return text
+
+
+# Conversion des valeurs affichées (format de l'historique) pour la réponse
+PARSERS = {
+    'salary': _decimal,
+    'is_active': lambda text: text == _status(True),
+    'service': lambda text: None if text in ('', NOT_ASSIGNED) else text,
+    'date_of_birth': lambda text: text or None,
+    'date_of_hire': lambda text: text or None,
+    'date_of_exit': lambda text: text or None,
+}
+
+
+def current_values(employee):
+    """Valeurs actuelles des champs suivis, au format de l'historique (service chargé)"""
+    values = {}
+    for field in TRACKED_FIELDS:
+        if field.display is None:
+            values[field.name] = employee.service.name if employee.service_id else NOT_ASSIGNED
+        else:
+            values[field.name] = field.display(getattr(employee, field.attname))
+    return values
+
+
+def _end_of_day(day):
+    """Premier instant du lendemain : l'état « au jour J » inclut les changements de J"""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def _snapshots(employee_ids, until, before):
+    """
+    Point de reprise le plus proche de until (avant ou après) de chaque
+    employé de employee_ids (de tous les employés si None)
+    """
+    if employee_ids is not None and not employee_ids:
+        return {}
+    if before:
+        queryset, order = EmployeeSnapshot.objects.filter(taken_at__lt=until), F('taken_at').desc()
+    else:
+        queryset, order = EmployeeSnapshot.objects.filter(taken_at__gte=until), F('taken_at').asc()
+    if employee_ids is not None:
+        queryset = queryset.filter(employee_id__in=employee_ids)
+    rows = queryset.annotate(
+        rank=Window(RowNumber(), partition_by=[F('employee_id')], order_by=[order, F('id').desc()])
+    ).filter(rank=1).values_list('employee_id', 'taken_at', 'values')
+    return {employee_id: (taken_at, values) for employee_id, taken_at, values in rows}
+
+
+def _edge_changes(conditions, latest):
+    """
+    Par employé et par champ, valeur de la dernière modification (latest,
+    nouvelle valeur) ou de la première (ancienne valeur) parmi les lignes
+    d'historique retenues par conditions.
+    """
+    if not conditions:
+        return {}
+    if latest:
+        order, value = [F('changed_at').desc(), F('id').desc()], 'new_value'
+    else:
+        order, value = [F('changed_at').asc(), F('id').asc()], 'old_value'
+    rows = EmployeeHistory.objects.filter(conditions, field_name__in=FIELD_NAMES).annotate(
+        rank=Window(RowNumber(), partition_by=[F('employee_id'), F('field_name')], order_by=order)
+    ).filter(rank=1).values_list('employee_id', 'field_name', value)
+    changes = {}
+    for employee_id, field_name, text in rows:
+        changes.setdefault(employee_id, {})[field_name] = text
+    return changes
+
+
+def _grouped_condition(bases, condition):
+    """
+    Une condition par date de point de reprise : les points de reprise étant
+    écrits par lots, les employés partagent quelques dates seulement.
+    """
+    by_time = {}
+    for employee_id, taken_at in bases.items():
+        by_time.setdefault(taken_at, []).append(employee_id)
+    result = Q()
+    for taken_at, employee_ids in by_time.items():
+        result |= condition(taken_at, employee_ids)
+    return result
+
+
+def states_as_of(employees, day):
+    """
+    État de chaque employé (service chargé) au soir du jour day :
+    {employee.pk: {champ: valeur}}.
+    """
+    until = _end_of_day(day)
+    employees = {employee.pk: employee for employee in employees}
+    states = {}
+
+    # Base antérieure : point de reprise puis dernières modifications jusqu'à la date
+    previous = _snapshots(list(employees), until, before=True)
+    forward = _edge_changes(_grouped_condition(
+        {employee_id: taken_at for employee_id, (taken_at, _) in previous.items()},
+        lambda taken_at, ids: Q(employee_id__in=ids, changed_at__gt=taken_at, changed_at__lt=until),
+    ), latest=True)
+    for employee_id, (_, values) in previous.items():
+        states[employee_id] = {**values, **forward.get(employee_id, {})}
+
+    # Base postérieure : point de reprise suivant (ou état actuel) moins les modifications depuis la date
+    remaining = [employee_id for employee_id in employees if employee_id not in previous]
+    following = _snapshots(remaining, until, before=False)
+    current = [employee_id for employee_id in remaining if employee_id not in following]
+    condition = _grouped_condition(
+        {employee_id: taken_at for employee_id, (taken_at, _) in following.items()},
+        lambda taken_at, ids: Q(employee_id__in=ids, changed_at__gte=until, changed_at__lte=taken_at),
+    )
+    if current:
+        condition |= Q(employee_id__in=current, changed_at__gte=until)
+    backward = _edge_changes(condition, latest=False)
+    for employee_id in remaining:
+        base = following[employee_id][1] if employee_id in following else current_values(employees[employee_id])
+        states[employee_id] = {**base, **backward.get(employee_id, {})}
+
+    return {
+        employee_id: {
+            name: PARSERS.get(name, str)(values.get(name, ''))
+            for name in FIELD_NAMES
+        }
+        for employee_id, values in states.items()
+    }
+
+
+def _result(employee, day, values):
+    hired = values['date_of_hire']
+    return {
+        'id': employee.pk,
+        'employee_id': employee.employee_id,
+        'name': employee.get_full_name(),
+        'as_of': day.isoformat(),
+        'hired': hired is not None and hired <= day.isoformat(),
+        'values': values,
+    }
+
+
+def employee_as_of(employee, day):
+    """État d'un employé au jour day"""
+    return _result(employee, day, states_as_of([employee], day)[employee.pk])
+
+
+def service_as_of(service, day):
+    """
+    Employés du service au jour day et leur état : membres actuels et anciens
+    membres partis après la date (ancien service au nom du service dans
+    l'historique), filtrés sur le service reconstruit.
+    """
+    moved_out = EmployeeHistory.objects.filter(
+        field_name='service', changed_at__gte=_end_of_day(day), old_value=service.name
+    ).values('employee_id')
+    employees = list(
+        Employee.objects.filter(Q(service=service) | Q(pk__in=moved_out)).select_related('service').order_by('last_name', 'first_name', 'pk')
+    )
+    states = states_as_of(employees, day)
+    results = [_result(employee, day, states[employee.pk]) for employee in employees]
+    return [result for result in results if result['values']['service'] == service.name and result['hired']]
+
+
+def take_snapshots(batch_size=500):
+    """
+    Écrit un point de reprise pour chaque employé dont l'état diffère de son
+    dernier point de reprise (ou qui n'en a pas). Retourne (employés, points écrits).
+    """
+    taken_at = timezone.now()
+    count, snapshots = 0, []
+    with transaction.atomic():
+        last = {
+            employee_id: values
+            for employee_id, (_, values) in _snapshots(None, taken_at, before=True).items()
+        }
+        for employee in Employee.objects.select_related('service').order_by('pk').iterator(chunk_size=batch_size):
+            count += 1
+            values = current_values(employee)
+            if last.get(employee.pk) != values:
+                snapshots.append(EmployeeSnapshot(employee=employee, taken_at=taken_at, values=values))
+        EmployeeSnapshot.objects.bulk_create(snapshots, batch_size=batch_size)
+    return count, len(snapshots)
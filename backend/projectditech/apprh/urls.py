@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import  ( login, dashboard_stats, dashboard_hr_analytics, dashboard_service_stats, dashboard_alerts, ServiceViewSet, 
+from .views import  ( login, dashboard_stats, dashboard_hr_analytics, dashboard_service_stats, dashboard_alerts, dashboard_workforce, global_search, ServiceViewSet, 
                      EmployeeViewSet, EmployeeHistoryViewSet, JobOfferViewSet, CandidateViewSet, InterviewViewSet, 
                      LeaveRequestViewSet, LeaveBalanceViewSet, AttendanceViewSet, 
                      ContractViewSet, PayslipViewSet, PayslipBonusViewSet, PayslipDeductionViewSet, PaymentHistoryViewSet,
@@ -38,7 +38,9 @@ urlpatterns = [
     path('dashboard/service-stats/', dashboard_service_stats, name='dashboard-service-stats'),
     path('dashboard/service-stats/<int:service_id>/', dashboard_service_stats, name='dashboard-service-stats-detail'),
     path('dashboard/alerts/', dashboard_alerts, name='dashboard-alerts'),
+    path('dashboard/workforce/', dashboard_workforce, name='dashboard-workforce'),
     path('documents/upload/', upload_document, name='upload-document'),
     path('documents/scan/', scan_document, name='scan-document'),
+    path('search/', global_search, name='global-search'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Attribution des noms d'utilisateur (kouassi, kouassi1, kouassi2...)
+
+Les noms existants qui commencent par la base sont lus en une seule requête
+(username__startswith : l'index unique de username est doublé sous
+PostgreSQL d'un index *_like utilisable pour les préfixes), puis le premier
+suffixe libre est choisi en mémoire. Deux créations simultanées peuvent
+choisir le même nom : la contrainte d'unicité le détecte et l'attribution
+est refaite.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .models import User
+
+
+# Nombre de bases recherchées par requête (imports en masse)
+LOOKUP_CHUNK = 200
+
+# Tentatives en cas de conflit avec une création concurrente
+MAX_ATTEMPTS = 5
+
+
+def username_base(email):
+    """Base du nom d'utilisateur : partie locale de l'email"""
+    return email.split('@')[0]
+
+
+def _taken_usernames(bases):
+    taken = set()
+    for start in range(0, len(bases), LOOKUP_CHUNK):
+        condition = Q()
+        for base in bases[start:start + LOOKUP_CHUNK]:
+            condition |= Q(username__startswith=base)
+        taken.update(User.objects.filter(condition).values_list('username', flat=True))
+    return taken
+
+
+def allocate_usernames(bases):
+    """
+    Noms d'utilisateur libres pour une liste de bases, dans l'ordre (une base
+    répétée reçoit des suffixes successifs). Les noms ne sont pas réservés :
+    ils doivent être enregistrés par create_user ou bulk_create_users.
+    """
+    taken = _taken_usernames(sorted(set(bases)))
+    usernames, counters = [], {}
+    for base in bases:
+        # Reprise au dernier suffixe essayé pour cette base (fichiers où beaucoup de noms se répètent)
+        counter = counters.get(base, 0)
+        username = f"{base}{counter}" if counter else base
+        while username in taken:
+            counter += 1
+            username = f"{base}{counter}"
+        counters[base] = counter
+        taken.add(username)
+        usernames.append(username)
+    return usernames
+
+
+def allocate_username(base):
+    """Premier nom d'utilisateur libre pour une base"""
+    return allocate_usernames([base])[0]
+
+
+def create_user(base, **fields):
+    """
+    Crée un utilisateur (User.objects.create_user) avec le premier nom libre
+    dérivé de base, en recommençant si une création concurrente l'a pris.
+    """
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        username = allocate_username(base)
+        try:
+            with transaction.atomic():
+                return User.objects.create_user(username=username, **fields)
+        except IntegrityError:
+            # Seul un conflit sur le nom d'utilisateur justifie une nouvelle tentative
+            if attempt == MAX_ATTEMPTS or not User.objects.filter(username=username).exists():
+                raise
+
+
+def bulk_create_users(users, bases, batch_size=500):
+    """
+    Attribue un nom libre à chaque utilisateur (non enregistré) à partir de
+    sa base, puis les enregistre en bulk_create ; en cas de conflit avec une
+    création concurrente, l'attribution et l'insertion sont refaites.
+    """
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        for user, username in zip(users, allocate_usernames(bases)):
+            user.username = username
+        try:
+            with transaction.atomic():
+                return User.objects.bulk_create(users, batch_size=batch_size)
+        except IntegrityError:
+            usernames = [user.username for user in users]
+            if attempt == MAX_ATTEMPTS or not User.objects.filter(username__in=usernames).exists():
+                raise
+            # Les lots déjà insérés ont été annulés avec la transaction
+            for user in users:
+                user.pk = None
+                user._state.adding = True
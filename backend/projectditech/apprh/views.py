@@ -6,24 +6,45 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import authenticate
-from django.db import models
-from .models import User, Employee, Service, EmployeeHistory, JobOffer, Candidate, Interview, LeaveRequest, LeaveBalance, Attendance, Contract, Payslip, PayslipBonus, PayslipDeduction, PaymentHistory, Document, PresenceTracking, TrainingPlan, Training, TrainingSession, Evaluation
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from .models import User, Employee, Service, EmployeeHistory, JobOffer, Candidate, Interview, LeaveRequest, LeaveBalance, Attendance, Contract, Payslip, PayslipBonus, PayslipDeduction, PaymentHistory, Document, PresenceTracking, TrainingPlan, Training, TrainingSession, Evaluation, LeaveAccrual, SearchEntry
 from .serializers import (
     UserSerializer, EmployeeSerializer, ServiceSerializer,
     EmployeeHistorySerializer, LoginSerializer, JobOfferSerializer, CandidateSerializer, InterviewSerializer,
     LeaveRequestSerializer, LeaveBalanceSerializer, AttendanceSerializer, ContractSerializer, PayslipSerializer,
     PayslipBonusSerializer, PayslipDeductionSerializer, PaymentHistorySerializer,
     DocumentSerializer, CustomTokenObtainPairSerializer, PresenceTrackingSerializer,
-    TrainingPlanSerializer, TrainingSerializer, TrainingSessionSerializer, EvaluationSerializer
+    TrainingPlanSerializer, TrainingSerializer, TrainingSessionSerializer, EvaluationSerializer,
+    ContractAlertSerializer, LeaveRequestCompactSerializer, ContractCompactSerializer, PayslipCompactSerializer,
+    PayslipBonusCompactSerializer, PayslipDeductionCompactSerializer, PaymentHistoryCompactSerializer,
+    PresenceTrackingCompactSerializer, DynamicFieldsMixin
 )
 from .models import EmployeeHistory
+from .imports import iter_import_rows, ImportFileError
+from .payroll import (
+    import_payslip_items, recompute_payslip_totals, TRANSFER_CHANNELS,
+    transfer_queryset, transfer_reference, transfer_control_totals, mark_transfer_paid, iter_transfer_file,
+    compute_contributions, contribution_declaration
+)
+from .emails import build_payslip_email, send_payslip_emails
+from .onboarding import import_employees
+from .usernames import create_user, username_base
+from . import search
+from . import dossier
+from . import accruals
+from . import leaves
+from . import timeline
+from . import workforce
+from .absences import team_calendar
+from .contracts import with_expiry, with_renewal_count
+from .pagination import LargeTablePagination, capped
 from datetime import date, timedelta
 from django.utils import timezone
 from io import BytesIO
 import os
 from django.http import FileResponse
 from django.conf import settings
-from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -32,6 +53,67 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 
 
+class CompactListMixin:
+    """
+    Les listes utilisent compact_serializer_class (employé et fiche de paie
+    imbriqués en version réduite) ; ?expand=true renvoie les objets complets.
+    """
+    compact_serializer_class = None
+    
+    def get_serializer_class(self):
+        expand = str(self.request.query_params.get('expand', '')).lower() in ('1', 'true', 'yes', 'all')
+        if self.action == 'list' and self.compact_serializer_class and not expand:
+            return self.compact_serializer_class
+        return super().get_serializer_class()
+
+
+class SparseFieldsMixin:
+    """
+    Lectures à la demande : ?fields=id,first_name (champs gardés) et
+    ?omit=user (champs retirés). Le sérialiseur ne produit que ces champs et,
+    en liste comme en détail, la requête ne charge que les colonnes utiles.
+    """
+    def get_sparse_fields(self):
+        if self.request is None or self.request.method not in ('GET', 'HEAD'):
+            return {}
+        params = {}
+        for name in ('fields', 'omit'):
+            value = self.request.query_params.get(name)
+            if value:
+                params[name] = [part.strip() for part in value.split(',') if part.strip()]
+        return params
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, DynamicFieldsMixin):
+            kwargs.update(self.get_sparse_fields())
+        kwargs.setdefault('context', self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in ('list', 'retrieve') and self.get_sparse_fields():
+            serializer = self.get_serializer()
+            if isinstance(serializer, DynamicFieldsMixin):
+                queryset = serializer.restrict_queryset(queryset)
+        return queryset
+
+
+class PaginatedActionsMixin:
+    """Listes des actions personnalisées paginées (et plafonnées) comme la liste principale"""
+    def paginated_response(self, rows, serializer_class=None):
+        page = self.paginate_queryset(rows)
+        if page is None:
+            page = capped(rows)
+        if serializer_class is None:
+            serializer = self.get_serializer(page, many=True)
+        else:
+            serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+        if self.paginator is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     """Vue personnalisée pour l'obtention de token avec informations utilisateur"""
     serializer_class = CustomTokenObtainPairSerializer
@@ -98,17 +180,12 @@ def dashboard_stats(request):
         total_staff = Employee.objects.filter(is_active=True).count()
     
         # ========== 2. RENOUVELLEMENT (ROTATION DU PERSONNEL) ==========
-        new_employees_this_month = Employee.objects.filter(
-            date_of_hire__year=current_year,
-            date_of_hire__month=current_month
-        ).count()
+        # Embauches et départs du mois d'après les périodes d'emploi (date de sortie, pas updated_at)
+        this_month = workforce.period_stats([workforce.month_bounds(current_year, current_month)])[0]
+        new_employees_this_month = this_month['hires']
+        departures_this_month = this_month['exits']
         
         # Rotation du personnel (embauches - départs ce mois)
-        departures_this_month = Employee.objects.filter(
-            is_active=False,
-            updated_at__year=current_year,
-            updated_at__month=current_month
-        ).count()
         staff_rotation = new_employees_this_month - departures_this_month
         
         # Effectif par service
@@ -237,8 +314,13 @@ def dashboard_stats(request):
         leaves_count_history = []
         months_labels = []
         
-        for i in range(11, -1, -1):  # 12 mois en arrière
-            target_date = now - timedelta(days=30 * i)
+        # Effectif de fin de mois des 12 mois, d'après les périodes d'emploi (une requête)
+        history_dates = [now - timedelta(days=30 * i) for i in range(11, -1, -1)]
+        month_workforce = workforce.period_stats([
+            workforce.month_bounds(target_date.year, target_date.month) for target_date in history_dates
+        ])
+        
+        for target_date, month_stats in zip(history_dates, month_workforce):  # 12 mois en arrière
             target_month = target_date.month
             target_year = target_date.year
             
@@ -253,10 +335,7 @@ def dashboard_stats(request):
             
             # Effectif à la fin du mois
             month_end = datetime(target_year, target_month, monthrange(target_year, target_month)[1]).date()
-            staff_count = Employee.objects.filter(
-                is_active=True,
-                date_of_hire__lte=month_end
-            ).count()
+            staff_count = month_stats['headcount_end']
             staff_count_history.append(staff_count)
             
             # Taux de présence moyen du mois
@@ -278,11 +357,7 @@ def dashboard_stats(request):
             ).count()
             
             # Calculer le taux de présence : pointages présents / (effectif * jours ouvrés)
-            month_staff_count = Employee.objects.filter(
-                is_active=True,
-                date_of_hire__lte=month_end
-            ).count()
-            expected_presence = month_staff_count * working_days
+            expected_presence = staff_count * working_days
             month_presence_rate = (month_presence / expected_presence * 100) if expected_presence > 0 else 0
             presence_rate_history.append(round(month_presence_rate, 1))
             
@@ -795,7 +870,98 @@ def dashboard_alerts(request):
     })
 
 
-class ServiceViewSet(viewsets.ModelViewSet):
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_workforce(request):
+    """
+    Effectif, embauches, sorties et taux de rotation par période
+    GET /ditech/dashboard/workforce/?start=2025-01-01&end=2025-12-31&granularity=month
+
+    Par défaut : les 12 derniers mois, par mois. Calculé sur les périodes d'emploi
+    (date d'embauche, date de sortie et changements de statut de l'historique).
+    """
+    today = timezone.now().date()
+    try:
+        end = date.fromisoformat(request.query_params['end']) if request.query_params.get('end') else today
+        if request.query_params.get('start'):
+            start = date.fromisoformat(request.query_params['start'])
+        else:
+            # Premier jour du 12e mois avant le mois de fin (inclus)
+            first_month = end.year * 12 + end.month - 12
+            start = date(first_month // 12, first_month % 12 + 1, 1)
+        granularity = request.query_params.get('granularity', 'month')
+        periods = workforce.split_periods(start, end, granularity)
+    except ValueError as e:
+        return Response({'error': f'Paramètres invalides: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    series = workforce.period_stats(periods)
+    hires = sum(period['hires'] for period in series)
+    exits = sum(period['exits'] for period in series)
+    headcount_start = series[0]['headcount_start']
+    return Response({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity,
+        'summary': {
+            'headcount_start': headcount_start,
+            'headcount_end': series[-1]['headcount_end'],
+            'hires': hires,
+            'exits': exits,
+            'net_change': hires - exits,
+            'turnover_rate': round((hires + exits) / 2 / headcount_start * 100, 2) if headcount_start else 0.0,
+        },
+        'series': series,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def global_search(request):
+    """
+    Recherche globale dans les employés, candidats et documents
+    GET /ditech/search/?q=kouassi&type=employee,candidate&page=1&page_size=20
+
+    Les résultats sont classés par pertinence (index plein texte du moteur de base de données).
+    """
+    query = request.query_params.get('q', '').strip()
+    if len(query) < 2:
+        return Response({'error': 'La recherche doit contenir au moins 2 caractères'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    kinds = [kind.strip().upper() for kind in request.query_params.get('type', '').split(',') if kind.strip()]
+    valid_kinds = dict(SearchEntry.KIND_CHOICES)
+    if any(kind not in valid_kinds for kind in kinds):
+        return Response(
+            {'error': f'Type invalide, valeurs possibles : {", ".join(kind.lower() for kind in valid_kinds)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        page = max(1, int(request.query_params.get('page', 1)))
+        page_size = min(search.MAX_PAGE_SIZE, max(1, int(request.query_params.get('page_size', search.DEFAULT_PAGE_SIZE))))
+    except ValueError:
+        return Response({'error': 'Page invalide'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    count, results = search.search(query, kinds=kinds, page=page, page_size=page_size)
+    return Response({
+        'query': query,
+        'count': count,
+        'page': page,
+        'page_size': page_size,
+        'results': [
+            {
+                'type': result['kind'].lower(),
+                'type_display': valid_kinds[result['kind']],
+                'id': result['object_id'],
+                'title': result['title'],
+                'subtitle': result['subtitle'],
+                'rank': result['rank'] or 0,
+            }
+            for result in results
+        ],
+    })
+
+
+class ServiceViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Service.objects.select_related('manager').all()
     serializer_class = ServiceSerializer
     permission_classes = [IsAuthenticated]
@@ -819,13 +985,31 @@ class ServiceViewSet(viewsets.ModelViewSet):
             logger.error(f"Erreur lors de la création du service: {e}")
             logger.error(f"Données reçues: {request.data}")
             raise
+    
+    @action(detail=True, methods=['get'])
+    def as_of(self, request, pk=None):
+        """Employés du service à une date (?date=AAAA-MM-JJ) et leur état à cette date"""
+        service = self.get_object()
+        try:
+            day = date.fromisoformat(request.query_params.get('date', ''))
+        except ValueError:
+            return Response({'error': 'Paramètre date requis (AAAA-MM-JJ)'}, status=status.HTTP_400_BAD_REQUEST)
+        employees = timeline.service_as_of(service, day)
+        return Response({
+            'service': service.name,
+            'as_of': day.isoformat(),
+            'total': len(employees),
+            'employees': capped(employees),
+        })
 
 
-class EmployeeHistoryViewSet(viewsets.ReadOnlyModelViewSet):
+class EmployeeHistoryViewSet(SparseFieldsMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet en lecture seule pour l'historique des employés"""
     queryset = EmployeeHistory.objects.all()
     serializer_class = EmployeeHistorySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = LargeTablePagination
+    cursor_ordering = ('-changed_at', '-id')
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -840,7 +1024,7 @@ class EmployeeHistoryViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset.select_related('employee', 'changed_by')
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(SparseFieldsMixin, PaginatedActionsMixin, viewsets.ModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
     permission_classes = [IsAuthenticated]
@@ -868,16 +1052,9 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         # Créer un User d'abord si l'email est fourni
         email = serializer.validated_data.get('email')
         if email:
-            # Générer un username unique à partir de l'email
-            base_username = email.split('@')[0]
-            username = base_username
-            counter = 1
-            while User.objects.filter(username=username).exists():
-                username = f"{base_username}{counter}"
-                counter += 1
-            
-            user = User.objects.create_user(
-                username=username,
+            # Générer un username unique à partir de l'email (kouassi, kouassi1...)
+            user = create_user(
+                username_base(email),
                 email=email,
                 first_name=serializer.validated_data.get('first_name', ''),
                 last_name=serializer.validated_data.get('last_name', ''),
@@ -930,60 +1107,75 @@ class EmployeeViewSet(viewsets.ModelViewSet):
                 logger = logging.getLogger(__name__)
                 logger.warning(f"Erreur lors de la suppression du User associé à l'employé: {e}")
     
-    @action(detail=True, methods=['get'])
-    def dossier(self, request, pk=None):
-        """Récupérer le dossier complet d'un employé (informations, contrat, documents, historique)"""
-        employee = self.get_object()
-        
-        # Informations personnelles
-        employee_data = EmployeeSerializer(employee).data
-        
-        # Contrat actif
-        active_contract = Contract.objects.filter(
-            employee=employee,
-            status='SIGNED'
-        ).order_by('-start_date').first()
-        contract_data = ContractSerializer(active_contract).data if active_contract else None
-        
-        # Tous les contrats
-        all_contracts = Contract.objects.filter(employee=employee).order_by('-start_date')
-        contracts_data = ContractSerializer(all_contracts, many=True).data
-        
-        # Documents
-        documents = Document.objects.filter(employee=employee).order_by('-created_at')
-        documents_data = DocumentSerializer(documents, many=True, context={'request': request}).data
-        
-        # Historique des changements
-        history = EmployeeHistory.objects.filter(employee=employee).order_by('-changed_at')
-        history_data = EmployeeHistorySerializer(history, many=True).data
-        
-        # Évaluations
-        evaluations = Evaluation.objects.filter(employee=employee).order_by('-evaluation_date')
-        evaluations_data = EvaluationSerializer(evaluations, many=True).data
+    @action(detail=False, methods=['post'])
+    def import_employees(self, request):
+        """
+        Importer en masse des employés depuis un fichier CSV ou XLSX
+        POST /ditech/employees/import_employees/
+
+        Body (FormData):
+        - file: fichier CSV ou XLSX (colonnes: first_name, last_name, email, phone, position, date_of_hire,
+          et facultativement service, salary, employee_id, badge_id, date_of_birth...)
+        - dry_run: true pour valider le fichier sans rien enregistrer
+        """
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response(
+                {'error': 'Aucun fichier fourni', 'detail': 'Le champ "file" est requis'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Congés
-        leave_requests = LeaveRequest.objects.filter(employee=employee).order_by('-created_at')
-        leave_requests_data = LeaveRequestSerializer(leave_requests, many=True).data
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
         
-        # Pointages récents (30 derniers jours)
-        from datetime import timedelta
-        thirty_days_ago = timezone.now().date() - timedelta(days=30)
-        attendances = PresenceTracking.objects.filter(
-            employee=employee,
-            date__gte=thirty_days_ago
-        ).order_by('-date')
-        attendances_data = PresenceTrackingSerializer(attendances, many=True).data
+        try:
+            result = import_employees(iter_import_rows(upload), changed_by=request.user, dry_run=dry_run)
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ImportError:
+            return Response(
+                {'error': 'openpyxl n\'est pas installé. Installez-le avec: pip install openpyxl'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
         
-        return Response({
-            'employee': employee_data,
-            'active_contract': contract_data,
-            'all_contracts': contracts_data,
-            'documents': documents_data,
-            'history': history_data,
-            'evaluations': evaluations_data,
-            'leave_requests': leave_requests_data,
-            'recent_attendances': attendances_data,
-        })
+        if result['errors']:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get'])
+    def dossier(self, request, pk=None):
+        """
+        Récupérer le dossier d'un employé (informations, contrats, documents, historique...)
+
+        ?include= : sections voulues, séparées par des virgules (toutes par défaut),
+        ex. ?include=info,contracts,history.
+        ?limit= / ?<section>_limit= : nombre de lignes des sections listes (50 par défaut, 200 au plus).
+        ?<section>_cursor= : page suivante d'une section, valeur donnée dans "cursors".
+        """
+        employee = self.get_object()
+        try:
+            sections = dossier.parse_sections(request.query_params.get('include'))
+            default_limit = dossier.parse_limit(request.query_params.get('limit'))
+            limits = {
+                section: dossier.parse_limit(request.query_params.get(f'{section}_limit'), default_limit)
+                for section in sections if section in dossier.LIST_SECTIONS
+            }
+            cursors = {
+                section: request.query_params.get(f'{section}_cursor')
+                for section in limits if request.query_params.get(f'{section}_cursor')
+            }
+            data = dossier.build_dossier(employee, sections, limits, cursors, request)
+        except dossier.DossierParameterError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response, next_cursors = {}, {}
+        for section, value in data.items():
+            if section in dossier.LIST_SECTIONS:
+                response[section] = value['results']
+                next_cursors[section] = value['next_cursor']
+            else:
+                response[section] = value
+        response['cursors'] = next_cursors
+        return Response(response)
     
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
@@ -996,12 +1188,21 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         if change_type:
             history = history.filter(change_type=change_type)
         
-        serializer = EmployeeHistorySerializer(history, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(history, EmployeeHistorySerializer)
+    
+    @action(detail=True, methods=['get'])
+    def as_of(self, request, pk=None):
+        """État de l'employé à une date (?date=AAAA-MM-JJ) : poste, salaire, service, statut..."""
+        employee = self.get_object()
+        try:
+            day = date.fromisoformat(request.query_params.get('date', ''))
+        except ValueError:
+            return Response({'error': 'Paramètre date requis (AAAA-MM-JJ)'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(timeline.employee_as_of(employee, day))
     
 
 
-class JobOfferViewSet(viewsets.ModelViewSet):
+class JobOfferViewSet(SparseFieldsMixin, PaginatedActionsMixin, viewsets.ModelViewSet):
     """ViewSet pour gérer les offres d'emploi"""
     queryset = JobOffer.objects.all()
     serializer_class = JobOfferSerializer
@@ -1069,8 +1270,7 @@ class JobOfferViewSet(viewsets.ModelViewSet):
         # Filtrer celles qui ne sont pas expirées
         open_offers = [offer for offer in open_offers if offer.is_open]
         
-        serializer = self.get_serializer(open_offers, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(open_offers)
     
     @action(detail=True, methods=['get'])
     def applications(self, request, pk=None):
@@ -1078,7 +1278,7 @@ class JobOfferViewSet(viewsets.ModelViewSet):
         job_offer = self.get_object()
         candidates = Candidate.objects.filter(job_offer=job_offer).order_by('-application_date')
         
-        serializer = CandidateSerializer(candidates, many=True)
+        serializer = CandidateSerializer(capped(candidates), many=True)
         return Response({
             'job_offer': JobOfferSerializer(job_offer).data,
             'applications': serializer.data,
@@ -1086,7 +1286,7 @@ class JobOfferViewSet(viewsets.ModelViewSet):
         })
 
 
-class CandidateViewSet(viewsets.ModelViewSet):
+class CandidateViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Candidate.objects.all()
     serializer_class = CandidateSerializer
     permission_classes = [IsAuthenticated]
@@ -1158,35 +1358,17 @@ class CandidateViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Service not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Create user
-        base_username = candidate.email.split('@')[0]
-        username = base_username
-        counter = 1
-        while User.objects.filter(username=username).exists():
-            username = f"{base_username}{counter}"
-            counter += 1
-        
-        user = User.objects.create_user(
-            username=username,
+        user = create_user(
+            username_base(candidate.email),
             email=candidate.email,
             first_name=candidate.first_name,
             last_name=candidate.last_name,
             role='EMPLOYE'
         )
         
-        # Create employee
-        last_employee = Employee.objects.filter(employee_id__startswith='DITECH').order_by('employee_id').last()
-        if last_employee and last_employee.employee_id.startswith('DITECH'):
-            try:
-                last_id_num = int(last_employee.employee_id[6:])
-                new_id_num = last_id_num + 1
-            except (ValueError, IndexError):
-                new_id_num = Employee.objects.count() + 1
-        else:
-            new_id_num = Employee.objects.count() + 1
-        
+        # Create employee (matricule attribué par la séquence dans Employee.save)
         employee = Employee.objects.create(
             user=user,
-            employee_id=f"DITECH{new_id_num:04d}",
             first_name=candidate.first_name,
             last_name=candidate.last_name,
             email=candidate.email,
@@ -1247,7 +1429,7 @@ class CandidateViewSet(viewsets.ModelViewSet):
         })
 
 
-class InterviewViewSet(viewsets.ModelViewSet):
+class InterviewViewSet(SparseFieldsMixin, PaginatedActionsMixin, viewsets.ModelViewSet):
     queryset = Interview.objects.all()
     serializer_class = InterviewSerializer
     permission_classes = [IsAuthenticated]
@@ -1355,8 +1537,7 @@ class InterviewViewSet(viewsets.ModelViewSet):
             status__in=['SCHEDULED', 'RESCHEDULED']
         ).select_related('candidate', 'interviewer').order_by('scheduled_date')
         
-        serializer = self.get_serializer(upcoming_interviews, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(upcoming_interviews)
     
     @action(detail=False, methods=['get'])
     def today(self, request):
@@ -1371,17 +1552,17 @@ class InterviewViewSet(viewsets.ModelViewSet):
             scheduled_date__lt=today_end
         ).select_related('candidate', 'interviewer').order_by('scheduled_date')
         
-        serializer = self.get_serializer(today_interviews, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(today_interviews)
 
 
 
-class LeaveRequestViewSet(viewsets.ModelViewSet):
+class LeaveRequestViewSet(SparseFieldsMixin, PaginatedActionsMixin, CompactListMixin, viewsets.ModelViewSet):
     queryset = LeaveRequest.objects.all()
     serializer_class = LeaveRequestSerializer
+    compact_serializer_class = LeaveRequestCompactSerializer
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('employee', 'employee__user', 'employee__service')
         employee_id = self.request.query_params.get('employee', None)
         status_filter = self.request.query_params.get('status', None)
         
@@ -1392,20 +1573,22 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def create(self, request, *args, **kwargs):
+        """Contrôle d'effectif et enregistrement sous le même verrou de service (voir LeaveRequestSerializer.validate)"""
+        with transaction.atomic():
+            return super().create(request, *args, **kwargs)
+    
     @action(detail=True, methods=['post'])
     def approve_manager(self, request, pk=None):
         """Approuver par le manager"""
         leave_request = self.get_object()
-        if leave_request.status != 'PENDING':
-            return Response(
-                {'error': 'Cette demande n\'est pas en attente'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        leave_request.status = 'MANAGER_APPROVED'
-        leave_request.manager_approval = request.user
-        leave_request.manager_approval_date = timezone.now()
-        leave_request.save()
+        force = str(request.data.get('force', '')).lower() in ('1', 'true', 'yes')
+        try:
+            leave_request = leaves.approve_by_manager(leave_request.pk, request.user, force=force)
+        except leaves.StaffingConflictError as e:
+            return Response({'error': str(e), 'conflicts': e.conflicts}, status=status.HTTP_400_BAD_REQUEST)
+        except leaves.LeaveWorkflowError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'status': 'Approuvé par le manager',
@@ -1416,16 +1599,11 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     def reject_manager(self, request, pk=None):
         """Rejeter par le manager"""
         leave_request = self.get_object()
-        if leave_request.status != 'PENDING':
-            return Response(
-                {'error': 'Cette demande n\'est pas en attente'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
         rejection_reason = request.data.get('rejection_reason', '')
-        leave_request.status = 'REJECTED'
-        leave_request.manager_rejection_reason = rejection_reason
-        leave_request.save()
+        try:
+            leave_request = leaves.reject(leave_request.pk, 'manager', rejection_reason)
+        except leaves.LeaveWorkflowError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'status': 'Rejeté par le manager',
@@ -1434,42 +1612,12 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def approve_rh(self, request, pk=None):
-        """Approuver par RH et mettre à jour le solde"""
+        """Approuver par RH et mettre à jour le solde (verrouillé, sans recalcul complet)"""
         leave_request = self.get_object()
-        if leave_request.status != 'MANAGER_APPROVED':
-            return Response(
-                {'error': 'La demande doit être approuvée par le manager d\'abord'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Vérifier le solde disponible
-        balance, created = LeaveBalance.objects.get_or_create(employee=leave_request.employee)
-        
-        if leave_request.leave_type == 'ANNUAL':
-            if balance.remaining_annual < leave_request.days:
-                return Response(
-                    {
-                        'error': f'Solde insuffisant. Disponible: {balance.remaining_annual} jours, Demandé: {leave_request.days} jours'
-                    },
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        elif leave_request.leave_type == 'SICK':
-            if balance.remaining_sick < leave_request.days:
-                return Response(
-                    {
-                        'error': f'Solde maladie insuffisant. Disponible: {balance.remaining_sick} jours, Demandé: {leave_request.days} jours'
-                    },
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        # Approuver et mettre à jour le solde
-        leave_request.status = 'RH_APPROVED'
-        leave_request.rh_approval = request.user
-        leave_request.rh_approval_date = timezone.now()
-        leave_request.save()
-        
-        # Recalculer le solde (utilise la méthode recalculate_used_days)
-        balance.recalculate_used_days()
+        try:
+            leave_request, balance = leaves.approve_by_rh(leave_request.pk, request.user)
+        except leaves.LeaveWorkflowError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'status': 'Approuvé par RH et solde mis à jour',
@@ -1481,16 +1629,11 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     def reject_rh(self, request, pk=None):
         """Rejeter par RH"""
         leave_request = self.get_object()
-        if leave_request.status != 'MANAGER_APPROVED':
-            return Response(
-                {'error': 'La demande doit être approuvée par le manager d\'abord'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
         rejection_reason = request.data.get('rejection_reason', '')
-        leave_request.status = 'REJECTED'
-        leave_request.rh_rejection_reason = rejection_reason
-        leave_request.save()
+        try:
+            leave_request = leaves.reject(leave_request.pk, 'rh', rejection_reason)
+        except leaves.LeaveWorkflowError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'status': 'Rejeté par RH',
@@ -1499,21 +1642,56 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
-        """Annuler une demande de congé"""
+        """Annuler une demande de congé (les jours déjà débités sont restitués)"""
         leave_request = self.get_object()
-        if leave_request.status == 'RH_APPROVED':
-            # Si déjà approuvé, il faut recalculer le solde
-            balance, created = LeaveBalance.objects.get_or_create(employee=leave_request.employee)
-            balance.recalculate_used_days()
-        
-        leave_request.status = 'CANCELLED'
-        leave_request.save()
+        try:
+            leave_request = leaves.cancel(leave_request.pk, request.user)
+        except leaves.LeaveWorkflowError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'status': 'Demande annulée',
             'leave_request': LeaveRequestSerializer(leave_request).data
         })
     
+    @action(detail=False, methods=['post'])
+    def bulk_approve(self, request):
+        """Approuver un lot de demandes (ids, level: manager ou rh, force)"""
+        return self._bulk_transition(request, 'approve')
+    
+    @action(detail=False, methods=['post'])
+    def bulk_reject(self, request):
+        """Rejeter un lot de demandes (ids, level: manager ou rh, rejection_reason)"""
+        return self._bulk_transition(request, 'reject')
+    
+    def _bulk_transition(self, request, decision):
+        # Liste JSON, ou formulaire (ids répété ou séparé par des virgules)
+        values = request.data.getlist('ids') if hasattr(request.data, 'getlist') else request.data.get('ids') or []
+        if isinstance(values, (str, int)):
+            values = [values]
+        level = request.data.get('level', 'manager')
+        if level not in ('manager', 'rh'):
+            return Response({'error': 'Le niveau doit être "manager" ou "rh"'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(part) for value in values for part in str(value).split(',') if part.strip()]
+        except (TypeError, ValueError):
+            return Response({'error': 'Liste d\'identifiants invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({'error': 'Aucune demande sélectionnée'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        force = str(request.data.get('force', '')).lower() in ('1', 'true', 'yes')
+        results = leaves.bulk_transition(
+            ids, decision, level, request.user,
+            rejection_reason=request.data.get('rejection_reason', ''),
+            force=force
+        )
+        succeeded = sum(1 for result in results if result['success'])
+        return Response({
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'results': results,
+        })
+    
     @action(detail=False, methods=['get'])
     def current(self, request):
         """Récupérer les congés en cours"""
@@ -1524,8 +1702,7 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
             end_date__gte=today
         ).select_related('employee', 'employee__service')
         
-        serializer = self.get_serializer(current_leaves, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(current_leaves)
     
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
@@ -1536,8 +1713,7 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
             start_date__gt=today
         ).select_related('employee', 'employee__service').order_by('start_date')
         
-        serializer = self.get_serializer(upcoming_leaves, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(upcoming_leaves)
     
     @action(detail=False, methods=['get'])
     def pending_approval(self, request):
@@ -1546,11 +1722,40 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
             status__in=['PENDING', 'MANAGER_APPROVED']
         ).select_related('employee', 'employee__service', 'manager_approval', 'rh_approval')
         
-        serializer = self.get_serializer(pending, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(pending)
+    
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Calendrier des absences d'un service : un caractère par jour et par employé
+        Paramètres: service, start/end (AAAA-MM-JJ) ou month/year (défaut: mois en cours)
+        """
+        from datetime import datetime
+        from calendar import monthrange
+        
+        service_id = request.query_params.get('service') or None
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+        try:
+            if service_id:
+                service_id = int(service_id)
+            if start or end:
+                start = datetime.strptime(start, '%Y-%m-%d').date()
+                end = datetime.strptime(end, '%Y-%m-%d').date() if end else start
+            else:
+                today = timezone.now().date()
+                month = int(request.query_params.get('month', today.month))
+                year = int(request.query_params.get('year', today.year))
+                start = date(year, month, 1)
+                end = date(year, month, monthrange(year, month)[1])
+            result = team_calendar(service_id, start, end)
+        except (TypeError, ValueError) as e:
+            return Response({'error': f'Paramètres invalides: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(result)
 
 
-class LeaveBalanceViewSet(viewsets.ModelViewSet):
+class LeaveBalanceViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = LeaveBalance.objects.all()
     serializer_class = LeaveBalanceSerializer
     
@@ -1561,7 +1766,32 @@ class LeaveBalanceViewSet(viewsets.ModelViewSet):
         if employee_id:
             queryset = queryset.filter(employee_id=employee_id)
         
-        return queryset.select_related('employee')
+        # Congés annuels utilisés sur le mois demandé (défaut: mois en cours),
+        # calculés en SQL plutôt qu'une requête par solde dans le serializer
+        today = timezone.now().date()
+        try:
+            month = int(self.request.query_params.get('month', today.month))
+            year = int(self.request.query_params.get('year', today.year))
+        except ValueError:
+            month, year = today.month, today.year
+        
+        monthly_used = LeaveRequest.objects.filter(
+            employee_id=models.OuterRef('employee_id'),
+            leave_type='ANNUAL',
+            status='RH_APPROVED',
+            start_date__year=year,
+            start_date__month=month
+        ).values('employee_id').annotate(total=models.Sum('days')).values('total')
+        
+        # Jours acquis sur le mois par le moteur d'acquisition (accrue_leave), s'il a tourné
+        monthly_accrued = LeaveAccrual.objects.filter(
+            employee_id=models.OuterRef('employee_id'), year=year, month=month
+        ).values('days')[:1]
+        
+        return queryset.select_related('employee').annotate(
+            used_monthly_days=Coalesce(models.Subquery(monthly_used), 0),
+            accrued_monthly_days=models.Subquery(monthly_accrued)
+        )
     
     @action(detail=True, methods=['post'])
     def recalculate(self, request, pk=None):
@@ -1577,23 +1807,41 @@ class LeaveBalanceViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def recalculate_all(self, request):
-        """Recalculer les soldes de tous les employés"""
-        balances = LeaveBalance.objects.all()
-        updated_count = 0
+        """
+        Recalculer les soldes de tous les employés (requête groupée + bulk_update)
+        Body: year (optionnel) : année courante par défaut ; une année passée est
+        clôturée (jours utilisés et report sur l'année suivante) sans modifier les soldes
+        """
+        try:
+            year = int(request.data.get('year') or request.query_params.get('year') or timezone.now().year)
+        except (TypeError, ValueError):
+            return Response({'error': 'Année invalide'}, status=status.HTTP_400_BAD_REQUEST)
         
-        for balance in balances:
-            balance.recalculate_used_days()
-            updated_count += 1
+        if year < timezone.now().year:
+            result = accruals.close_year(year)
+            return Response({
+                'message': f'Année {year} clôturée : {result["carried_over"]} jour(s) reporté(s) sur {year + 1}',
+                **result,
+            })
+        
+        try:
+            total_count, updated_count = leaves.recalculate_balances(year)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
-            'message': f'Soldes recalculés pour {updated_count} employé(s)',
+            'message': f'Soldes recalculés pour {total_count} employé(s)',
+            'year': year,
+            'total_count': total_count,
             'updated_count': updated_count
         })
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
+    pagination_class = LargeTablePagination
+    cursor_ordering = ('-date', '-id')
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -1603,15 +1851,18 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         return queryset
     
 
-class ContractViewSet(viewsets.ModelViewSet):
+class ContractViewSet(SparseFieldsMixin, PaginatedActionsMixin, CompactListMixin, viewsets.ModelViewSet):
     queryset = Contract.objects.all()
     serializer_class = ContractSerializer
+    compact_serializer_class = ContractCompactSerializer
     
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
     
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('employee', 'employee__service', 'parent_contract', 'created_by')
+        queryset = with_renewal_count(super().get_queryset().select_related(
+            'employee', 'employee__user', 'employee__service', 'parent_contract', 'created_by'
+        ))
         employee_id = self.request.query_params.get('employee', None)
         status_filter = self.request.query_params.get('status', None)
         contract_type = self.request.query_params.get('contract_type', None)
@@ -1710,6 +1961,14 @@ class ContractViewSet(viewsets.ModelViewSet):
             'auto_renewal': contract.auto_renewal
         })
     
+    def _alert_queryset(self, **filters):
+        """Contrats annotés par with_expiry (échéance et alertes calculées en SQL)"""
+        contracts = Contract.objects.filter(**filters).select_related(None).only(
+            'id', 'employee_id', 'contract_type', 'position', 'start_date', 'end_date', 'salary', 'status',
+            'needs_renewal', 'auto_renewal', 'renewal_notice_days', 'parent_contract_id'
+        )
+        return with_expiry(contracts)
+    
     @action(detail=False, methods=['get'])
     def expiring_soon(self, request):
         """Get contracts expiring soon with alert levels"""
@@ -1717,71 +1976,35 @@ class ContractViewSet(viewsets.ModelViewSet):
         days_ahead = int(request.query_params.get('days', 30))
         future_date = today + timedelta(days=days_ahead)
         
-        contracts = Contract.objects.filter(
+        # Trier par date d'expiration (les plus urgents en premier)
+        contracts = self._alert_queryset(
             end_date__gte=today,
             end_date__lte=future_date,
             status='SIGNED'
-        ).select_related('employee', 'employee__service')
-        
-        contracts_data = []
-        for contract in contracts:
-            contract_dict = self.get_serializer(contract).data
-            contract_dict['days_until_expiry'] = contract.days_until_expiry
-            contract_dict['alert_level'] = contract.alert_level
-            contract_dict['is_expiring_soon'] = contract.is_expiring_soon
-            contract_dict['is_expired'] = contract.is_expired
-            contracts_data.append(contract_dict)
+        ).order_by('end_date', 'id')
         
-        # Trier par date d'expiration (les plus urgents en premier)
-        contracts_data.sort(key=lambda x: x['days_until_expiry'] if x['days_until_expiry'] is not None else float('inf'))
-        
-        return Response(contracts_data)
+        return self.paginated_response(contracts, ContractAlertSerializer)
     
     @action(detail=False, methods=['get'])
     def expired(self, request):
         """Get expired contracts"""
-        today = date.today()
-        
-        contracts = Contract.objects.filter(
-            end_date__lt=today,
+        contracts = self._alert_queryset(
+            end_date__lt=date.today(),
             status__in=['SIGNED', 'EXPIRED']
-        ).select_related('employee', 'employee__service')
+        ).order_by('-end_date', 'id')
         
-        contracts_data = []
-        for contract in contracts:
-            contract_dict = self.get_serializer(contract).data
-            contract_dict['days_until_expiry'] = contract.days_until_expiry
-            contract_dict['alert_level'] = 'critical'
-            contract_dict['is_expired'] = True
-            contracts_data.append(contract_dict)
-        
-        serializer = self.get_serializer(contracts, many=True)
-        return Response(contracts_data)
+        return self.paginated_response(contracts, ContractAlertSerializer)
     
     @action(detail=False, methods=['get'])
     def needs_renewal(self, request):
         """Get contracts that need renewal"""
-        contracts = Contract.objects.filter(
+        # Trier par urgence : expirés d'abord, puis par date d'échéance
+        contracts = self._alert_queryset(
             needs_renewal=True,
             status='SIGNED'
-        ).select_related('employee', 'employee__service', 'parent_contract')
-        
-        contracts_data = []
-        for contract in contracts:
-            contract_dict = self.get_serializer(contract).data
-            contract_dict['days_until_expiry'] = contract.days_until_expiry
-            contract_dict['alert_level'] = contract.alert_level
-            contract_dict['is_expiring_soon'] = contract.is_expiring_soon
-            contract_dict['is_expired'] = contract.is_expired
-            contracts_data.append(contract_dict)
-        
-        # Trier par urgence (expirés d'abord, puis par date)
-        contracts_data.sort(key=lambda x: (
-            x['is_expired'] is False,  # Expirés en premier
-            x['days_until_expiry'] if x['days_until_expiry'] is not None else float('inf')
-        ))
+        ).order_by(models.F('end_date').asc(nulls_last=True), 'id')
         
-        return Response(contracts_data)
+        return self.paginated_response(contracts, ContractAlertSerializer)
     
     @action(detail=False, methods=['get'])
     def alerts(self, request):
@@ -1790,11 +2013,11 @@ class ContractViewSet(viewsets.ModelViewSet):
         days_ahead = int(request.query_params.get('days', 90))
         future_date = today + timedelta(days=days_ahead)
         
-        # Contrats expirant bientôt ou expirés
-        contracts = Contract.objects.filter(
+        # Contrats expirant bientôt ou expirés, seuls ceux qui ont un niveau d'alerte
+        contracts = self._alert_queryset(
             end_date__lte=future_date,
             status='SIGNED'
-        ).select_related('employee', 'employee__service')
+        ).filter(alert__isnull=False).order_by('end_date', 'id')
         
         alerts = {
             'critical': [],
@@ -1803,21 +2026,20 @@ class ContractViewSet(viewsets.ModelViewSet):
             'expired': []
         }
         
-        for contract in contracts:
-            if contract.is_expired:
+        for contract_data in ContractAlertSerializer(capped(contracts), many=True).data:
+            days_until_expiry = contract_data['days_until_expiry']
+            if contract_data['is_expired']:
                 alerts['expired'].append({
-                    'contract': self.get_serializer(contract).data,
-                    'days_until_expiry': contract.days_until_expiry,
-                    'message': f'Contrat expiré depuis {abs(contract.days_until_expiry)} jour(s)'
+                    'contract': contract_data,
+                    'days_until_expiry': days_until_expiry,
+                    'message': f'Contrat expiré depuis {abs(days_until_expiry)} jour(s)'
                 })
             else:
-                alert_level = contract.alert_level
-                if alert_level:
-                    alerts[alert_level].append({
-                        'contract': self.get_serializer(contract).data,
-                        'days_until_expiry': contract.days_until_expiry,
-                        'message': f'Contrat expire dans {contract.days_until_expiry} jour(s)'
-                    })
+                alerts[contract_data['alert_level']].append({
+                    'contract': contract_data,
+                    'days_until_expiry': days_until_expiry,
+                    'message': f'Contrat expire dans {days_until_expiry} jour(s)'
+                })
         
         # Compter le total
         total_alerts = sum(len(alerts[key]) for key in alerts)
@@ -1831,9 +2053,10 @@ class ContractViewSet(viewsets.ModelViewSet):
         })
 
 
-class PayslipViewSet(viewsets.ModelViewSet):
+class PayslipViewSet(SparseFieldsMixin, PaginatedActionsMixin, CompactListMixin, viewsets.ModelViewSet):
     queryset = Payslip.objects.all()
     serializer_class = PayslipSerializer
+    compact_serializer_class = PayslipCompactSerializer
     
     def perform_create(self, serializer):
         instance = serializer.save(created_by=self.request.user)
@@ -1861,199 +2084,7 @@ class PayslipViewSet(viewsets.ModelViewSet):
                 print(f"Warning: Employee {employee.get_full_name()} has no email address")
                 return
             
-            # Préparer les données pour l'email (même logique que send_email)
-            month_names = ['', 'Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin', 
-                          'Juillet', 'Août', 'Septembre', 'Octobre', 'Novembre', 'Décembre']
-            month_name = month_names[payslip.month] if 1 <= payslip.month <= 12 else str(payslip.month)
-            
-            email_subject = f"Fiche de Paie - {month_name} {payslip.year}"
-            
-            employee_first_name = str(employee.first_name) if employee.first_name else ''
-            employee_last_name = str(employee.last_name) if employee.last_name else ''
-            employee_id = str(employee.employee_id) if employee.employee_id else ''
-            base_salary = float(payslip.base_salary) if payslip.base_salary else 0.0
-            bonuses = float(payslip.bonuses) if payslip.bonuses else 0.0
-            deductions = float(payslip.deductions) if payslip.deductions else 0.0
-            net_salary = float(payslip.net_salary) if payslip.net_salary else 0.0
-            payslip_year = int(payslip.year) if payslip.year else timezone.now().year
-            current_year = timezone.now().year
-            
-            base_salary_formatted = f"{base_salary:,.0f}"
-            bonuses_formatted = f"{bonuses:,.0f}"
-            deductions_formatted = f"{deductions:,.0f}"
-            net_salary_formatted = f"{net_salary:,.0f}"
-            
-            email_body = """
-            <html>
-            <head>
-                <style>
-                    body {{
-                        font-family: Arial, sans-serif;
-                        line-height: 1.6;
-                        color: #333;
-                    }}
-                    .container {{
-                        max-width: 600px;
-                        margin: 0 auto;
-                        padding: 20px;
-                        background-color: #f9f9f9;
-                    }}
-                    .header {{
-                        background-color: #1e3a8a;
-                        color: white;
-                        padding: 20px;
-                        text-align: center;
-                        border-radius: 5px 5px 0 0;
-                    }}
-                    .content {{
-                        background-color: white;
-                        padding: 30px;
-                        border-radius: 0 0 5px 5px;
-                    }}
-                    .info-table {{
-                        width: 100%;
-                        border-collapse: collapse;
-                        margin: 20px 0;
-                    }}
-                    .info-table td {{
-                        padding: 10px;
-                        border-bottom: 1px solid #e5e7eb;
-                    }}
-                    .info-table td:first-child {{
-                        font-weight: bold;
-                        width: 40%;
-                        color: #1e3a8a;
-                    }}
-                    .salary-table {{
-                        width: 100%;
-                        border-collapse: collapse;
-                        margin: 20px 0;
-                    }}
-                    .salary-table th {{
-                        background-color: #1e3a8a;
-                        color: white;
-                        padding: 12px;
-                        text-align: left;
-                    }}
-                    .salary-table td {{
-                        padding: 10px;
-                        border-bottom: 1px solid #e5e7eb;
-                    }}
-                    .salary-table tr:last-child {{
-                        background-color: #fbbf24;
-                        font-weight: bold;
-                        font-size: 16px;
-                    }}
-                    .footer {{
-                        margin-top: 30px;
-                        padding-top: 20px;
-                        border-top: 2px solid #e5e7eb;
-                        color: #666;
-                        font-size: 12px;
-                        text-align: center;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>FICHE DE PAIE</h1>
-                        <p>DiTech - Digital Technology Ivoirienne</p>
-                    </div>
-                    <div class="content">
-                        <h2>Bonjour {employee_first_name} {employee_last_name},</h2>
-                        <p>Veuillez trouver ci-joint votre fiche de paie pour la période de <strong>{month_name} {payslip_year}</strong>.</p>
-                        
-                        <table class="info-table">
-                            <tr>
-                                <td>Employé:</td>
-                                <td>{employee_first_name} {employee_last_name}</td>
-                            </tr>
-                            <tr>
-                                <td>ID Employé:</td>
-                                <td>{employee_id}</td>
-                            </tr>
-                            <tr>
-                                <td>Période:</td>
-                                <td>{month_name} {payslip_year}</td>
-                            </tr>
-                        </table>
-                        
-                        <h3>Détails de la paie:</h3>
-                        <table class="salary-table">
-                            <thead>
-                                <tr>
-                                    <th>Description</th>
-                                    <th style="text-align: right;">Montant (FCFA)</th>
-                                </tr>
-                            </thead>
-                            <tbody>
-                                <tr>
-                                    <td>Salaire de base</td>
-                                    <td style="text-align: right;">{base_salary_formatted}</td>
-                                </tr>
-                                <tr>
-                                    <td>Primes</td>
-                                    <td style="text-align: right;">{bonuses_formatted}</td>
-                                </tr>
-                                <tr>
-                                    <td>Déductions</td>
-                                    <td style="text-align: right;">-{deductions_formatted}</td>
-                                </tr>
-                                <tr>
-                                    <td>NET À PAYER</td>
-                                    <td style="text-align: right;">{net_salary_formatted}</td>
-                                </tr>
-                            </tbody>
-                        </table>
-                        
-                        <div class="footer">
-                            <p>Ceci est un email automatique, merci de ne pas y répondre.</p>
-                            <p>Pour toute question, veuillez contacter le service RH.</p>
-                            <p>&copy; {current_year} DiTech - Tous droits réservés</p>
-                        </div>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """.format(
-                employee_first_name=employee_first_name,
-                employee_last_name=employee_last_name,
-                employee_id=employee_id,
-                month_name=month_name,
-                payslip_year=payslip_year,
-                base_salary_formatted=base_salary_formatted,
-                bonuses_formatted=bonuses_formatted,
-                deductions_formatted=deductions_formatted,
-                net_salary_formatted=net_salary_formatted,
-                current_year=current_year
-            )
-            
-            from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@ditech.com')
-            if not from_email or from_email == 'noreply@votredomaine.com':
-                from_email = getattr(settings, 'EMAIL_HOST_USER', 'noreply@ditech.com')
-            
-            email = EmailMessage(
-                subject=email_subject,
-                body=email_body,
-                from_email=from_email,
-                to=[employee_email],
-            )
-            email.content_subtype = "html"
-            
-            # Attacher le PDF si disponible
-            try:
-                if payslip.pdf_file and hasattr(payslip.pdf_file, 'path'):
-                    pdf_path = payslip.pdf_file.path
-                    if os.path.exists(pdf_path):
-                        with open(pdf_path, 'rb') as pdf:
-                            email.attach(
-                                f'Fiche_Paie_{month_name}_{payslip.year}.pdf',
-                                pdf.read(),
-                                'application/pdf'
-                            )
-            except Exception as pdf_error:
-                print(f"Warning: Could not attach PDF: {str(pdf_error)}")
+            email = build_payslip_email(payslip)
             
             # Envoyer l'email
             try:
@@ -2076,7 +2107,7 @@ class PayslipViewSet(viewsets.ModelViewSet):
             print(f"Error in _send_payslip_email: {str(e)}")
     
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('employee', 'employee__service', 'created_by')
+        queryset = super().get_queryset().select_related('employee', 'employee__user', 'employee__service', 'created_by')
         employee_id = self.request.query_params.get('employee', None)
         month = self.request.query_params.get('month', None)
         year = self.request.query_params.get('year', None)
@@ -2171,6 +2202,53 @@ class PayslipViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    def import_items(self, request):
+        """
+        Importer en masse des primes et déductions depuis un fichier CSV ou XLSX
+        POST /ditech/payslips/import_items/
+
+        Body (FormData):
+        - file: fichier CSV ou XLSX (colonnes: payslip ou employee_id/month/year, kind, type, description, amount)
+        - kind: BONUS ou DEDUCTION si la colonne "kind" est absente du fichier
+        - month, year: période par défaut pour les lignes identifiées par employee_id
+        - dry_run: true pour valider le fichier sans rien enregistrer
+        """
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response(
+                {'error': 'Aucun fichier fourni', 'detail': 'Le champ "file" est requis'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            default_month = int(request.data['month']) if request.data.get('month') else None
+            default_year = int(request.data['year']) if request.data.get('year') else None
+        except (TypeError, ValueError):
+            return Response({'error': 'Mois ou année invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        
+        try:
+            result = import_payslip_items(
+                iter_import_rows(upload),
+                default_kind=request.data.get('kind'),
+                default_month=default_month,
+                default_year=default_year,
+                dry_run=dry_run
+            )
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ImportError:
+            return Response(
+                {'error': 'openpyxl n\'est pas installé. Installez-le avec: pip install openpyxl'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        if result['errors']:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+    
     @action(detail=True, methods=['post'])
     def mark_as_paid(self, request, pk=None):
         """Marquer une fiche de paie comme payée"""
@@ -2211,14 +2289,83 @@ class PayslipViewSet(viewsets.ModelViewSet):
             'payment_history': PaymentHistorySerializer(payment_history).data
         })
     
+    @action(detail=False, methods=['get', 'post'])
+    def transfer_file(self, request):
+        """
+        Générer le fichier de virement des salaires d'une période (streaming)
+        GET/POST /ditech/payslips/transfer_file/?month=10&year=2026
+
+        Paramètres:
+        - month, year: période (obligatoires)
+        - channel: bank (défaut) ou mobile_money
+        - file_format: csv (défaut) ou fixed (largeur fixe, voir PAYROLL_TRANSFER_FIXED_WIDTH_LAYOUT) ;
+          ?format= est réservé par DRF au choix du renderer
+        - status: statuts à inclure, séparés par des virgules (défaut: GENERATED,SENT)
+        - service: filtrer sur un service
+        - mark_paid=true (POST uniquement): marquer les fiches exportées comme payées
+          et créer l'historique de paiement correspondant
+        - payment_date: date de paiement (défaut: aujourd'hui)
+        """
+        from django.http import StreamingHttpResponse
+        from datetime import datetime
+        
+        params = request.data if request.method == 'POST' else request.query_params
+        try:
+            month = int(params.get('month') or request.query_params.get('month'))
+            year = int(params.get('year') or request.query_params.get('year'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Les paramètres month et year sont requis'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        channel = params.get('channel', 'bank')
+        file_format = params.get('file_format', 'csv')
+        if channel not in TRANSFER_CHANNELS:
+            return Response(
+                {'error': f'Canal invalide. Valeurs possibles: {", ".join(TRANSFER_CHANNELS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if file_format not in ('csv', 'fixed'):
+            return Response({'error': 'Format invalide (csv ou fixed)'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        statuses = [s.strip().upper() for s in params.get('status', 'GENERATED,SENT').split(',') if s.strip()]
+        queryset = transfer_queryset(month, year, channel, statuses, params.get('service'))
+        reference = transfer_reference(month, year)
+        
+        mark_paid = request.method == 'POST' and str(params.get('mark_paid', '')).lower() in ('1', 'true', 'yes')
+        if mark_paid:
+            payment_date = params.get('payment_date')
+            try:
+                payment_date = datetime.strptime(payment_date, '%Y-%m-%d').date() if payment_date else date.today()
+            except ValueError:
+                return Response({'error': 'Format de date invalide (AAAA-MM-JJ)'}, status=status.HTTP_400_BAD_REQUEST)
+            if 'PAID' in statuses:
+                return Response(
+                    {'error': 'Impossible de marquer comme payées des fiches déjà payées'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            mark_transfer_paid(queryset, reference, payment_date, channel, user=request.user)
+            # Le fichier porte exactement sur les fiches marquées dans ce lot
+            queryset = Payslip.objects.filter(payment_history__reference=reference)
+        
+        control = transfer_control_totals(queryset)
+        extension = 'csv' if file_format == 'csv' else 'txt'
+        response = StreamingHttpResponse(
+            iter_transfer_file(queryset, reference, month, year, channel, file_format, control),
+            content_type='text/csv; charset=utf-8' if file_format == 'csv' else 'text/plain; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{reference}.{extension}"'
+        response['X-Transfer-Reference'] = reference
+        response['X-Control-Count'] = str(control['count'])
+        response['X-Control-Total'] = f"{control['total']:.2f}"
+        response['X-Marked-Paid'] = 'true' if mark_paid else 'false'
+        return response
+    
     @action(detail=True, methods=['get'])
     def payment_history(self, request, pk=None):
         """Récupérer l'historique des paiements d'une fiche de paie"""
         payslip = self.get_object()
         history = PaymentHistory.objects.filter(payslip=payslip).order_by('-payment_date')
         
-        serializer = PaymentHistorySerializer(history, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(history, PaymentHistorySerializer)
     
     @action(detail=False, methods=['get'])
     def employee_history(self, request):
@@ -2233,7 +2380,7 @@ class PayslipViewSet(viewsets.ModelViewSet):
         
         payslips = Payslip.objects.filter(employee_id=employee_id).order_by('-year', '-month')
         
-        serializer = PayslipSerializer(payslips, many=True)
+        serializer = PayslipSerializer(capped(payslips), many=True)
         return Response({
             'employee_id': employee_id,
             'total_payslips': payslips.count(),
@@ -2280,6 +2427,91 @@ class PayslipViewSet(viewsets.ModelViewSet):
             }
         })
     
+    @action(detail=False, methods=['get'])
+    def salary_analytics(self, request):
+        """
+        Distribution des salaires: percentiles (p10-p90), histogramme et bandes
+        salariales par poste et par service, avec évolution sur un an
+        GET /ditech/payslips/salary_analytics/?year=2026&month=10&service=3&bins=10
+        """
+        from .analytics import salary_analytics
+        
+        try:
+            year = int(request.query_params.get('year', timezone.now().year))
+            month = int(request.query_params['month']) if request.query_params.get('month') else None
+            service_id = int(request.query_params['service']) if request.query_params.get('service') else None
+            bins = min(max(int(request.query_params.get('bins', 10)), 1), 50)
+        except ValueError:
+            return Response({'error': 'Paramètres invalides'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if month is not None and not 1 <= month <= 12:
+            return Response({'error': 'Le mois doit être compris entre 1 et 12'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(salary_analytics(year, month, service_id, bins))
+    
+    @action(detail=False, methods=['post'])
+    def compute_contributions(self, request):
+        """
+        Calculer les cotisations (CNPS, ITS...) de toutes les fiches non payées d'une période
+        POST /ditech/payslips/compute_contributions/ {month, year, dry_run}
+        """
+        try:
+            month = int(request.data.get('month'))
+            year = int(request.data.get('year'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Les paramètres month et year sont requis'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= month <= 12:
+            return Response({'error': 'Le mois doit être compris entre 1 et 12'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        result = compute_contributions(month, year, dry_run=dry_run)
+        if not result['rates']:
+            return Response(
+                {'error': 'Aucun barème de cotisation en vigueur pour cette période', **result},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(result)
+    
+    @action(detail=False, methods=['post'])
+    def send_emails(self, request):
+        """
+        Envoyer en masse les fiches de paie générées d'une période (une connexion SMTP)
+        POST /ditech/payslips/send_emails/ {month, year, service}
+        Les fiches envoyées passent au statut SENT.
+        """
+        try:
+            month = int(request.data.get('month'))
+            year = int(request.data.get('year'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Les paramètres month et year sont requis'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        payslips = Payslip.objects.filter(month=month, year=year, status='GENERATED').select_related('employee')
+        if request.data.get('service'):
+            payslips = payslips.filter(employee__service_id=request.data.get('service'))
+        
+        sent, failed = send_payslip_emails(payslips.order_by('pk').iterator(chunk_size=500))
+        now = timezone.now()
+        Payslip.objects.filter(pk__in=sent).update(status='SENT', sent_at=now, updated_at=now)
+        return Response({
+            'sent': len(sent),
+            'failed': len(failed),
+            'errors': [{'id': payslip_id, 'error': error} for payslip_id, error in failed],
+        })
+    
+    @action(detail=False, methods=['get'])
+    def contribution_declaration(self, request):
+        """
+        Totaux de la déclaration mensuelle des cotisations, par barème
+        GET /ditech/payslips/contribution_declaration/?month=10&year=2026
+        """
+        try:
+            month = int(request.query_params.get('month'))
+            year = int(request.query_params.get('year'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Les paramètres month et year sont requis'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(contribution_declaration(month, year))
+    
     @action(detail=True, methods=['post'])
     def generate_pdf(self, request, pk=None):
         payslip = self.get_object()
@@ -2388,205 +2620,8 @@ class PayslipViewSet(viewsets.ModelViewSet):
             if not employee_email:
                 return Response({'error': 'Employee email not found'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Préparer les données pour l'email
-            month_names = ['', 'Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin', 
-                          'Juillet', 'Août', 'Septembre', 'Octobre', 'Novembre', 'Décembre']
-            month_name = month_names[payslip.month] if 1 <= payslip.month <= 12 else str(payslip.month)
-            
-            # Créer le message HTML
-            email_subject = f"Fiche de Paie - {month_name} {payslip.year}"
-            
-            # Échapper les valeurs pour éviter les problèmes dans le HTML
-            employee_first_name = str(employee.first_name) if employee.first_name else ''
-            employee_last_name = str(employee.last_name) if employee.last_name else ''
-            employee_id = str(employee.employee_id) if employee.employee_id else ''
-            base_salary = float(payslip.base_salary) if payslip.base_salary else 0.0
-            bonuses = float(payslip.bonuses) if payslip.bonuses else 0.0
-            deductions = float(payslip.deductions) if payslip.deductions else 0.0
-            net_salary = float(payslip.net_salary) if payslip.net_salary else 0.0
-            payslip_year = int(payslip.year) if payslip.year else timezone.now().year
-            current_year = timezone.now().year
-            
-            # Formater les montants
-            base_salary_formatted = f"{base_salary:,.0f}"
-            bonuses_formatted = f"{bonuses:,.0f}"
-            deductions_formatted = f"{deductions:,.0f}"
-            net_salary_formatted = f"{net_salary:,.0f}"
-            
-            # Construire le message HTML de manière plus sûre avec format()
-            email_body = """
-            <html>
-            <head>
-                <style>
-                    body {{
-                        font-family: Arial, sans-serif;
-                        line-height: 1.6;
-                        color: #333;
-                    }}
-                    .container {{
-                        max-width: 600px;
-                        margin: 0 auto;
-                        padding: 20px;
-                        background-color: #f9f9f9;
-                    }}
-                    .header {{
-                        background-color: #1e3a8a;
-                        color: white;
-                        padding: 20px;
-                        text-align: center;
-                        border-radius: 5px 5px 0 0;
-                    }}
-                    .content {{
-                        background-color: white;
-                        padding: 30px;
-                        border-radius: 0 0 5px 5px;
-                    }}
-                    .info-table {{
-                        width: 100%;
-                        border-collapse: collapse;
-                        margin: 20px 0;
-                    }}
-                    .info-table td {{
-                        padding: 10px;
-                        border-bottom: 1px solid #e5e7eb;
-                    }}
-                    .info-table td:first-child {{
-                        font-weight: bold;
-                        width: 40%;
-                        color: #1e3a8a;
-                    }}
-                    .salary-table {{
-                        width: 100%;
-                        border-collapse: collapse;
-                        margin: 20px 0;
-                    }}
-                    .salary-table th {{
-                        background-color: #1e3a8a;
-                        color: white;
-                        padding: 12px;
-                        text-align: left;
-                    }}
-                    .salary-table td {{
-                        padding: 10px;
-                        border-bottom: 1px solid #e5e7eb;
-                    }}
-                    .salary-table tr:last-child {{
-                        background-color: #fbbf24;
-                        font-weight: bold;
-                        font-size: 16px;
-                    }}
-                    .footer {{
-                        margin-top: 30px;
-                        padding-top: 20px;
-                        border-top: 2px solid #e5e7eb;
-                        color: #666;
-                        font-size: 12px;
-                        text-align: center;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>FICHE DE PAIE</h1>
-                        <p>DiTech - Digital Technology Ivoirienne</p>
-                    </div>
-                    <div class="content">
-                        <h2>Bonjour {employee_first_name} {employee_last_name},</h2>
-                        <p>Veuillez trouver ci-joint votre fiche de paie pour la période de <strong>{month_name} {payslip_year}</strong>.</p>
-                        
-                        <table class="info-table">
-                            <tr>
-                                <td>Employé:</td>
-                                <td>{employee_first_name} {employee_last_name}</td>
-                            </tr>
-                            <tr>
-                                <td>ID Employé:</td>
-                                <td>{employee_id}</td>
-                            </tr>
-                            <tr>
-                                <td>Période:</td>
-                                <td>{month_name} {payslip_year}</td>
-                            </tr>
-                        </table>
-                        
-                        <h3>Détails de la paie:</h3>
-                        <table class="salary-table">
-                            <thead>
-                                <tr>
-                                    <th>Description</th>
-                                    <th style="text-align: right;">Montant (FCFA)</th>
-                                </tr>
-                            </thead>
-                            <tbody>
-                                <tr>
-                                    <td>Salaire de base</td>
-                                    <td style="text-align: right;">{base_salary_formatted}</td>
-                                </tr>
-                                <tr>
-                                    <td>Primes</td>
-                                    <td style="text-align: right;">{bonuses_formatted}</td>
-                                </tr>
-                                <tr>
-                                    <td>Déductions</td>
-                                    <td style="text-align: right;">-{deductions_formatted}</td>
-                                </tr>
-                                <tr>
-                                    <td>NET À PAYER</td>
-                                    <td style="text-align: right;">{net_salary_formatted}</td>
-                                </tr>
-                            </tbody>
-                        </table>
-                        
-                        <div class="footer">
-                            <p>Ceci est un email automatique, merci de ne pas y répondre.</p>
-                            <p>Pour toute question, veuillez contacter le service RH.</p>
-                            <p>&copy; {current_year} DiTech - Tous droits réservés</p>
-                        </div>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """.format(
-                employee_first_name=employee_first_name,
-                employee_last_name=employee_last_name,
-                employee_id=employee_id,
-                month_name=month_name,
-                payslip_year=payslip_year,
-                base_salary_formatted=base_salary_formatted,
-                bonuses_formatted=bonuses_formatted,
-                deductions_formatted=deductions_formatted,
-                net_salary_formatted=net_salary_formatted,
-                current_year=current_year
-            )
-            
-            # Créer l'email
-            from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@ditech.com')
-            if not from_email or from_email == 'noreply@votredomaine.com':
-                from_email = getattr(settings, 'EMAIL_HOST_USER', 'noreply@ditech.com')
-            
-            email = EmailMessage(
-                subject=email_subject,
-                body=email_body,
-                from_email=from_email,
-                to=[employee_email],
-            )
-            email.content_subtype = "html"  # Définir le contenu comme HTML
-            
-            # Attacher le PDF si disponible
-            try:
-                if payslip.pdf_file and hasattr(payslip.pdf_file, 'path'):
-                    pdf_path = payslip.pdf_file.path
-                    if os.path.exists(pdf_path):
-                        with open(pdf_path, 'rb') as pdf:
-                            email.attach(
-                                f'Fiche_Paie_{month_name}_{payslip.year}.pdf',
-                                pdf.read(),
-                                'application/pdf'
-                            )
-            except Exception as pdf_error:
-                # Si le PDF ne peut pas être attaché, on continue quand même
-                print(f"Warning: Could not attach PDF: {str(pdf_error)}")
+            # Construire l'email à partir du template partagé
+            email = build_payslip_email(payslip)
             
             # Envoyer l'email
             try:
@@ -3136,7 +3171,8 @@ def scan_document(request):
                     ),
                     document_type=doc_type_choice,
                     uploaded_by=request.user,
-                    description=description[:500]  # Limiter à 500 caractères
+                    description=description[:500],  # Limiter à 500 caractères
+                    extracted_text=result.get('extracted_text', '')  # Indexé pour la recherche globale
                 )
                 
                 # Si un employee_id est fourni, lier le document à l'employé
@@ -3185,14 +3221,17 @@ def scan_document(request):
         )
 
 
-class PayslipBonusViewSet(viewsets.ModelViewSet):
+class PayslipBonusViewSet(SparseFieldsMixin, CompactListMixin, viewsets.ModelViewSet):
     """ViewSet pour gérer les primes des fiches de paie"""
     queryset = PayslipBonus.objects.all()
     serializer_class = PayslipBonusSerializer
+    compact_serializer_class = PayslipBonusCompactSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('payslip', 'payslip__employee')
+        queryset = super().get_queryset().select_related(
+            'payslip', 'payslip__employee', 'payslip__employee__user', 'payslip__employee__service'
+        )
         payslip_id = self.request.query_params.get('payslip', None)
         
         if payslip_id:
@@ -3203,32 +3242,26 @@ class PayslipBonusViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         bonus = serializer.save()
         # Recalculer le total des primes de la fiche de paie
-        payslip = bonus.payslip
-        total_bonuses = PayslipBonus.objects.filter(payslip=payslip).aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        payslip.bonuses = total_bonuses
-        payslip.save()
+        recompute_payslip_totals({bonus.payslip_id: {'bonuses'}})
     
     def perform_destroy(self, instance):
-        payslip = instance.payslip
+        payslip_id = instance.payslip_id
         super().perform_destroy(instance)
         # Recalculer le total des primes après suppression
-        total_bonuses = PayslipBonus.objects.filter(payslip=payslip).aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        payslip.bonuses = total_bonuses
-        payslip.save()
+        recompute_payslip_totals({payslip_id: {'bonuses'}})
 
 
-class PayslipDeductionViewSet(viewsets.ModelViewSet):
+class PayslipDeductionViewSet(SparseFieldsMixin, CompactListMixin, viewsets.ModelViewSet):
     """ViewSet pour gérer les déductions des fiches de paie"""
     queryset = PayslipDeduction.objects.all()
     serializer_class = PayslipDeductionSerializer
+    compact_serializer_class = PayslipDeductionCompactSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('payslip', 'payslip__employee')
+        queryset = super().get_queryset().select_related(
+            'payslip', 'payslip__employee', 'payslip__employee__user', 'payslip__employee__service'
+        )
         payslip_id = self.request.query_params.get('payslip', None)
         
         if payslip_id:
@@ -3239,32 +3272,26 @@ class PayslipDeductionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         deduction = serializer.save()
         # Recalculer le total des déductions de la fiche de paie
-        payslip = deduction.payslip
-        total_deductions = PayslipDeduction.objects.filter(payslip=payslip).aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        payslip.deductions = total_deductions
-        payslip.save()
+        recompute_payslip_totals({deduction.payslip_id: {'deductions'}})
     
     def perform_destroy(self, instance):
-        payslip = instance.payslip
+        payslip_id = instance.payslip_id
         super().perform_destroy(instance)
         # Recalculer le total des déductions après suppression
-        total_deductions = PayslipDeduction.objects.filter(payslip=payslip).aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        payslip.deductions = total_deductions
-        payslip.save()
+        recompute_payslip_totals({payslip_id: {'deductions'}})
 
 
-class PaymentHistoryViewSet(viewsets.ModelViewSet):
+class PaymentHistoryViewSet(SparseFieldsMixin, CompactListMixin, viewsets.ModelViewSet):
     """ViewSet pour gérer l'historique des paiements"""
     queryset = PaymentHistory.objects.all()
     serializer_class = PaymentHistorySerializer
+    compact_serializer_class = PaymentHistoryCompactSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('payslip', 'payslip__employee', 'created_by')
+        queryset = super().get_queryset().select_related(
+            'payslip', 'payslip__employee', 'payslip__employee__user', 'payslip__employee__service', 'created_by'
+        )
         payslip_id = self.request.query_params.get('payslip', None)
         employee_id = self.request.query_params.get('employee', None)
         
@@ -3287,7 +3314,7 @@ class PaymentHistoryViewSet(viewsets.ModelViewSet):
             payslip.save()
 
 
-class DocumentViewSet(viewsets.ModelViewSet):
+class DocumentViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Document.objects.all()
     serializer_class = DocumentSerializer
     permission_classes = [IsAuthenticated]
@@ -3317,13 +3344,16 @@ class DocumentViewSet(viewsets.ModelViewSet):
         serializer.save(uploaded_by=self.request.user)
 
 
-class PresenceTrackingViewSet(viewsets.ModelViewSet):
+class PresenceTrackingViewSet(SparseFieldsMixin, CompactListMixin, viewsets.ModelViewSet):
     queryset = PresenceTracking.objects.all()
     serializer_class = PresenceTrackingSerializer
+    compact_serializer_class = PresenceTrackingCompactSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = LargeTablePagination
+    cursor_ordering = ('-date', '-check_in_time', '-id')
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('employee', 'employee__user', 'employee__service')
         employee_id = self.request.query_params.get('employee', None)
         date_filter = self.request.query_params.get('date', None)
         status_filter = self.request.query_params.get('status', None)
@@ -3739,7 +3769,7 @@ class PresenceTrackingViewSet(viewsets.ModelViewSet):
         return response
 
 
-class TrainingPlanViewSet(viewsets.ModelViewSet):
+class TrainingPlanViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     """ViewSet pour gérer les plans de formation"""
     queryset = TrainingPlan.objects.all()
     serializer_class = TrainingPlanSerializer
@@ -3794,7 +3824,7 @@ class TrainingPlanViewSet(viewsets.ModelViewSet):
         })
 
 
-class TrainingViewSet(viewsets.ModelViewSet):
+class TrainingViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     """ViewSet pour gérer les formations"""
     queryset = Training.objects.all()
     serializer_class = TrainingSerializer
@@ -3838,7 +3868,7 @@ class TrainingViewSet(viewsets.ModelViewSet):
         return Response({'message': 'Formation terminée', 'training': TrainingSerializer(training).data})
 
 
-class TrainingSessionViewSet(viewsets.ModelViewSet):
+class TrainingSessionViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     """ViewSet pour gérer les sessions de formation"""
     queryset = TrainingSession.objects.all()
     serializer_class = TrainingSessionSerializer
@@ -3866,7 +3896,7 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
         return Response({'message': 'Présence enregistrée', 'session': TrainingSessionSerializer(session).data})
 
 
-class EvaluationViewSet(viewsets.ModelViewSet):
+class EvaluationViewSet(SparseFieldsMixin, PaginatedActionsMixin, viewsets.ModelViewSet):
     queryset = Evaluation.objects.all()
     serializer_class = EvaluationSerializer
     permission_classes = [IsAuthenticated]
@@ -3948,8 +3978,7 @@ class EvaluationViewSet(viewsets.ModelViewSet):
             manager_feedback=''
         ).select_related('employee', 'evaluated_by')
         
-        serializer = self.get_serializer(pending, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(pending)
     
     @action(detail=False, methods=['get'])
     def annual(self, request):
@@ -3962,7 +3991,7 @@ class EvaluationViewSet(viewsets.ModelViewSet):
             evaluation_date__year=year
         ).select_related('employee', 'evaluated_by', 'approved_by')
         
-        serializer = self.get_serializer(annual_evaluations, many=True)
+        serializer = self.get_serializer(capped(annual_evaluations), many=True)
         return Response({
             'year': year,
             'total': annual_evaluations.count(),
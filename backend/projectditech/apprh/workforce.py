@@ -0,0 +1,185 @@
+"""
+Effectif et rotation du personnel dans le temps (tableaux de bord)
+
+Les périodes d'emploi (EmploymentInterval) sont dérivées de la date
+d'embauche, de la date de sortie et des changements de statut enregistrés
+dans l'historique (désactivation = sortie, réactivation = nouvelle période).
+Elles sont construites en une passe (rebuild_intervals, appelé par la
+migration 0020 et la commande rebuild_employment_intervals) puis recalculées
+pour chaque employé modifié.
+
+L'effectif à une date, les embauches, les sorties et le taux de rotation
+d'une période sont alors des requêtes d'intervalles : toutes les périodes
+d'une série sont agrégées en une seule requête.
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .history import _status
+from .models import Employee, EmployeeHistory, EmploymentInterval
+
+
+# Champs de l'employé dont dépendent les périodes d'emploi
+INTERVAL_FIELDS = {'is_active', 'date_of_hire', 'date_of_exit'}
+
+GRANULARITIES = ('month', 'year')
+
+# Nombre maximal de périodes d'une série (une requête agrège toutes les périodes)
+MAX_PERIODS = 120
+
+
+def employment_periods(date_of_hire, date_of_exit, is_active, last_update, changes=()):
+    """
+    Périodes d'emploi [(début, fin)] d'un employé, fin exclue (None : en poste).
+    changes : changements de statut triés [(jour, actif avant, actif après)].
+    Une désactivation sans historique (données anciennes, mises à jour en
+    masse) est datée par last_update.
+
+    La date de sortie saisie prime sur la date de la désactivation : elle
+    termine la dernière période commencée avant elle, y compris quand
+    l'employé a été réintégré depuis (une réactivation le jour même de la
+    sortie ouvre une nouvelle période), ou la période en cours (sortie prévue).
+    """
+    periods = []
+    start = date_of_hire if (changes[0][1] if changes else True) else None
+    for day, _, active in changes:
+        if active and start is None:
+            start = max(day, date_of_hire)
+        elif not active and start is not None:
+            periods.append((start, max(day, start)))
+            start = None
+    if start is not None:
+        periods.append((start, None if is_active else max(last_update, start)))
+
+    if date_of_exit:
+        for index in range(len(periods) - 1, -1, -1):
+            period_start = periods[index][0]
+            if period_start < date_of_exit or (index == 0 and period_start == date_of_exit):
+                periods[index] = (period_start, date_of_exit)
+                break
+    return periods
+
+
+def intervals_changed(employee):
+    """
+    Vrai si l'embauche, la sortie ou le statut diffère de l'état chargé
+    (instantané de l'historique) ; vrai aussi si cet état est inconnu.
+    """
+    loaded = getattr(employee, '_loaded_values', {})
+    return any(name not in loaded or loaded[name] != getattr(employee, name) for name in INTERVAL_FIELDS)
+
+
+def intervals_for(employee, changes=(), interval_model=EmploymentInterval):
+    """Périodes d'emploi (non enregistrées) d'un employé"""
+    # Dates éventuellement saisies en texte sur une instance pas encore relue
+    date_of_hire, date_of_exit = (
+        Employee._meta.get_field(name).to_python(getattr(employee, name)) for name in ('date_of_hire', 'date_of_exit')
+    )
+    last_update = timezone.localdate(employee.updated_at) if employee.updated_at else date_of_hire
+    return [
+        interval_model(employee_id=employee.pk, start_date=start, end_date=end)
+        for start, end in employment_periods(date_of_hire, date_of_exit, employee.is_active, last_update, changes)
+    ]
+
+
+def _status_changes(employee_ids=None, history_model=EmployeeHistory):
+    """Changements de statut par employé, triés, en une requête"""
+    rows = history_model.objects.filter(field_name='is_active')
+    if employee_ids is not None:
+        rows = rows.filter(employee_id__in=employee_ids)
+    active = _status(True)
+    changes = {}
+    for employee_id, changed_at, old_value, new_value in rows.order_by('employee_id', 'changed_at', 'id').values_list(
+        'employee_id', 'changed_at', 'old_value', 'new_value'
+    ):
+        changes.setdefault(employee_id, []).append(
+            (timezone.localdate(changed_at), old_value == active, new_value == active)
+        )
+    return changes
+
+
+def rebuild_intervals(employee_ids=None, batch_size=500, apps=None):
+    """
+    Recalcule les périodes d'emploi des employés employee_ids (de tous si None)
+    en une passe ; retourne le nombre de périodes écrites.
+    apps : registre des modèles historiques (appel depuis une migration).
+    """
+    model_for = (lambda model: apps.get_model('apprh', model.__name__)) if apps else (lambda model: model)
+    interval_model = model_for(EmploymentInterval)
+    changes = _status_changes(employee_ids, model_for(EmployeeHistory))
+    employees = model_for(Employee).objects.only('pk', 'date_of_hire', 'date_of_exit', 'is_active', 'updated_at')
+    if employee_ids is not None:
+        employees = employees.filter(pk__in=employee_ids)
+    intervals = []
+    for employee in employees.order_by('pk').iterator(chunk_size=batch_size):
+        intervals.extend(intervals_for(employee, changes.get(employee.pk, ()), interval_model))
+
+    with transaction.atomic():
+        existing = interval_model.objects.all()
+        if employee_ids is not None:
+            existing = existing.filter(employee_id__in=employee_ids)
+        existing.delete()
+        interval_model.objects.bulk_create(intervals, batch_size=batch_size)
+    return len(intervals)
+
+
+def employed_on(day):
+    """Condition des périodes couvrant le jour day (effectif au soir de day)"""
+    return Q(start_date__lte=day) & (Q(end_date__isnull=True) | Q(end_date__gt=day))
+
+
+def period_stats(periods):
+    """
+    Effectif, embauches, sorties et taux de rotation de chaque période
+    [(premier jour, dernier jour)], en une seule requête.
+    Taux de rotation : (embauches + sorties) / 2 / effectif de début × 100.
+    """
+    aggregates = {}
+    for index, (start, end) in enumerate(periods):
+        aggregates[f'start_{index}'] = Count('pk', filter=employed_on(start - timedelta(days=1)))
+        aggregates[f'end_{index}'] = Count('pk', filter=employed_on(end))
+        aggregates[f'hires_{index}'] = Count('pk', filter=Q(start_date__gte=start, start_date__lte=end))
+        aggregates[f'exits_{index}'] = Count('pk', filter=Q(end_date__gte=start, end_date__lte=end))
+    totals = EmploymentInterval.objects.aggregate(**aggregates) if aggregates else {}
+
+    results = []
+    for index, (start, end) in enumerate(periods):
+        headcount_start, hires, exits = totals[f'start_{index}'], totals[f'hires_{index}'], totals[f'exits_{index}']
+        results.append({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'headcount_start': headcount_start,
+            'headcount_end': totals[f'end_{index}'],
+            'hires': hires,
+            'exits': exits,
+            'net_change': hires - exits,
+            'turnover_rate': round((hires + exits) / 2 / headcount_start * 100, 2) if headcount_start else 0.0,
+        })
+    return results
+
+
+def month_bounds(year, month):
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+
+def split_periods(start, end, granularity='month'):
+    """Découpe [start, end] en mois (ou années) calendaires, bornés par start et end"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Granularité invalide : {granularity} (month ou year)')
+    if start > end:
+        raise ValueError('La date de début doit précéder la date de fin')
+    periods, current = [], start
+    while current <= end:
+        if granularity == 'month':
+            period_end = month_bounds(current.year, current.month)[1]
+        else:
+            period_end = date(current.year, 12, 31)
+        periods.append((current, min(period_end, end)))
+        current = period_end + timedelta(days=1)
+        if len(periods) > MAX_PERIODS:
+            raise ValueError(f'Série limitée à {MAX_PERIODS} périodes')
+    return periods
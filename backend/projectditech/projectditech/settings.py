@@ -116,6 +116,27 @@ else:
     }
 
 
+# Cache (dossiers, calendriers d'absences, analyses de salaires)
+# Les clés de version invalidées par les signaux doivent être partagées entre
+# tous les workers gunicorn : en production, cache en base (table créée par
+# "manage.py createcachetable" au build). En local, cache mémoire du processus
+# (un seul processus avec runserver).
+
+if DATABASE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'apprh_cache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -180,8 +201,15 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'apprh.pagination.StandardPagination',
+    'PAGE_SIZE': 50,
 }
 
+# Pagination : liste nue (plafonnée) pour les requêtes sans ?page= / ?cursor= tant que le frontend migre
+API_PAGINATION_COMPAT = config('API_PAGINATION_COMPAT', default=True, cast=bool)
+# Nombre maximal de lignes d'une réponse, quel que soit le mode
+API_MAX_ROWS = config('API_MAX_ROWS', default=1000, cast=int)
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=8),
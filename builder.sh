@@ -40,6 +40,8 @@ if [ -d "backend" ]; then
         python projectditech/manage.py collectstatic --noinput
         echo "Exécution des migrations..."
         python projectditech/manage.py migrate --noinput
+        echo "Création de la table de cache..."
+        python projectditech/manage.py createcachetable
     else
         echo "Erreur: requirements.txt introuvable dans backend/"
         exit 1